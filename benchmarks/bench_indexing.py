@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Benchmark de indexação e consulta do ContextManager com corpora sintéticos.
+
+Para cada tamanho de corpus (gerado a partir de PROJECT_TEMPLATES), executa em um
+processo separado a construção do índice, a atualização após editar parte dos
+documentos e uma série de consultas, e mede:
+
+- tempo de construção do índice e chunks por segundo
+- tempo de atualização do índice após editar 1% dos arquivos
+- pico de memória residente (RSS) do processo
+- tamanho do índice em disco
+- percentis de latência das consultas e de cada etapa da consulta
+
+Uso:
+    python benchmarks/bench_indexing.py --sizes 10 1000 100000 --embed-model fake \\
+        --output resultados.json --compare resultados-anteriores.json
+
+Com "--embed-model fake" o custo do modelo de embeddings é eliminado e o benchmark
+mede apenas o pipeline de leitura, divisão em chunks e armazenamento.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from context_guide import __version__  # noqa: E402
+from context_guide.corpus import generate_corpus, modify_corpus, template_queries  # noqa: E402
+from context_guide.timing import summarize_latencies  # noqa: E402
+
+# Métricas comparadas entre execuções (nome, menor é melhor)
+COMPARED_METRICS = [
+    ("build_seconds", True),
+    ("chunks_per_second", False),
+    ("update_seconds", True),
+    ("peak_rss_bytes", True),
+    ("index_size_bytes", True),
+    ("query_latency.p50", True),
+    ("query_latency.p99", True),
+]
+
+
+def peak_rss_bytes() -> int:
+    """Retorna o pico de memória residente do processo atual, em bytes."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # No Linux o valor é reportado em KB; no macOS, em bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_size(size: int, embed_model: str, num_queries: int, num_results: int, seed: int) -> dict:
+    """
+    Executa o benchmark para um tamanho de corpus (em um processo dedicado).
+
+    Args:
+        size: Número de arquivos do corpus
+        embed_model: Modelo de embeddings a utilizar
+        num_queries: Número de consultas executadas
+        num_results: Resultados por consulta
+        seed: Semente do gerador de corpus
+
+    Returns:
+        Dicionário com as medidas do benchmark
+    """
+    from context_guide.context import ContextManager
+
+    with tempfile.TemporaryDirectory(prefix="context-guide-bench-") as work_dir:
+        docs_dir = Path(work_dir) / "docs"
+        db_dir = Path(work_dir) / "db"
+
+        start = time.perf_counter()
+        files = generate_corpus(str(docs_dir), size, seed=seed)
+        corpus_seconds = time.perf_counter() - start
+        corpus_bytes = sum(path.stat().st_size for path in files)
+
+        # A construção inicial acontece dentro do construtor (_create_index)
+        manager = ContextManager(docs_dir=str(docs_dir), db_dir=str(db_dir), embed_model=embed_model)
+        if not manager.llama_available:
+            raise RuntimeError("LlamaIndex/ChromaDB não disponíveis; o benchmark requer as dependências completas")
+        build_stats = manager.get_index_stats()
+
+        modify_corpus(files, fraction=0.01, seed=seed)
+        start = time.perf_counter()
+        manager.update_index()
+        update_seconds = time.perf_counter() - start
+
+        queries = template_queries()
+        latencies = []
+        stage_samples = {}
+        for i in range(num_queries):
+            query = queries[i % len(queries)]
+            start = time.perf_counter()
+            result = manager.get_relevant_context(query, num_results)
+            latencies.append(time.perf_counter() - start)
+            for stage, seconds in result.get("timings", {}).items():
+                stage_samples.setdefault(stage, []).append(seconds)
+
+        index_stats = manager.get_index_stats()
+        return {
+            "size": size,
+            "corpus_bytes": corpus_bytes,
+            "corpus_generation_seconds": corpus_seconds,
+            "documents": build_stats["last_build_documents"],
+            "chunks": build_stats["last_build_chunks"],
+            "build_seconds": build_stats["last_build_seconds"],
+            "chunks_per_second": build_stats["chunks_per_second"],
+            "update_seconds": update_seconds,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "index_size_bytes": index_stats["size_bytes"],
+            "query_latency": summarize_latencies(latencies),
+            "stage_latency": {stage: summarize_latencies(values) for stage, values in stage_samples.items()},
+        }
+
+
+def _metric_value(result: dict, metric: str):
+    """Obtém uma métrica (possivelmente aninhada, ex: query_latency.p50) de um resultado."""
+    value = result
+    for key in metric.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare_results(current: dict, previous: dict) -> None:
+    """
+    Imprime a variação de cada métrica em relação a uma execução anterior.
+
+    Args:
+        current: Resultados da execução atual
+        previous: Resultados carregados do JSON anterior
+    """
+    previous_by_size = {result["size"]: result for result in previous.get("results", [])}
+    print("\nComparação com a execução anterior:")
+    for result in current["results"]:
+        baseline = previous_by_size.get(result["size"])
+        if not baseline:
+            print(f"  {result['size']} arquivos: sem resultado anterior")
+            continue
+        print(f"  {result['size']} arquivos:")
+        for metric, lower_is_better in COMPARED_METRICS:
+            new, old = _metric_value(result, metric), _metric_value(baseline, metric)
+            if not new or not old:
+                continue
+            change = (new - old) / old * 100
+            improved = change < 0 if lower_is_better else change > 0
+            marker = "igual" if abs(change) < 1 else "melhor" if improved else "pior"
+            print(f"    {metric:<22} {old:>14.4f} -> {new:>14.4f} ({change:+.1f}%, {marker})")
+
+
+def print_summary(results: list) -> None:
+    """Imprime um resumo legível dos resultados."""
+    header = f"{'arquivos':>9} {'chunks':>9} {'build(s)':>9} {'chunks/s':>9} {'update(s)':>9} " \
+             f"{'RSS(MB)':>9} {'disco(MB)':>9} {'p50(ms)':>9} {'p99(ms)':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['size']:>9} {r['chunks']:>9} {r['build_seconds']:>9.2f} {r['chunks_per_second']:>9.1f} "
+              f"{r['update_seconds']:>9.2f} {r['peak_rss_bytes'] / 2**20:>9.1f} "
+              f"{r['index_size_bytes'] / 2**20:>9.1f} {r['query_latency']['p50'] * 1000:>9.2f} "
+              f"{r['query_latency']['p99'] * 1000:>9.2f}")
+
+
+def parse_arguments():
+    """
+    Processa argumentos da linha de comando.
+
+    Returns:
+        Argumentos processados
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de indexação e consulta do Context Guide")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000],
+                        help="Tamanhos de corpus (número de arquivos) (padrão: 10 1000 100000)")
+    parser.add_argument("--embed-model", default="fake",
+                        help="Modelo de embeddings (padrão: fake; ex: local:BAAI/bge-small-en-v1.5)")
+    parser.add_argument("--queries", type=int, default=100, help="Número de consultas por tamanho (padrão: 100)")
+    parser.add_argument("--num-results", type=int, default=5, help="Resultados por consulta (padrão: 5)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador de corpus (padrão: 42)")
+    parser.add_argument("--output", help="Arquivo JSON onde os resultados serão gravados")
+    parser.add_argument("--compare", help="Arquivo JSON de uma execução anterior para comparação")
+    return parser.parse_args()
+
+
+def main():
+    """Executa o benchmark para cada tamanho de corpus."""
+    args = parse_arguments()
+    results = []
+
+    for size in args.sizes:
+        print(f"⏱️  Executando benchmark com {size} arquivos...")
+        # Processo novo por tamanho para que o pico de RSS de um não contamine o outro
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(run_size, size, args.embed_model, args.queries,
+                                     args.num_results, args.seed).result()
+        results.append(result)
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "context_guide_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embed_model": args.embed_model,
+            "seed": args.seed,
+            "queries": args.queries,
+            "num_results": args.num_results,
+        },
+        "results": results,
+    }
+
+    print_summary(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Resultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialização e compressão das respostas de `/context`.
+
+Monta respostas realistas (chunks extraídos de um corpus sintético) para diferentes
+valores de `num_results` e compara:
+
+- o caminho padrão do FastAPI: validação pelo response_model, jsonable_encoder e
+  JSONResponse (módulo json)
+- o caminho otimizado: FastJSONResponse (orjson, quando disponível) sem response_model
+- bytes trafegados sem compressão, com gzip e com zstd (quando disponível), e o
+  tempo gasto em cada compressão
+
+Uso:
+    python benchmarks/bench_serialization.py --num-results 5 20 50 --output resultados.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from context_guide.corpus import generate_corpus  # noqa: E402
+from context_guide.mcp_server.responses import (  # noqa: E402
+    FastJSONResponse, ORJSON_AVAILABLE, ZSTD_AVAILABLE, available_encodings, compress
+)
+from context_guide.mcp_server.server import ContextResponse  # noqa: E402
+from context_guide.timing import summarize_latencies  # noqa: E402
+
+# Tamanho aproximado (em caracteres) de um chunk de 512 tokens
+CHUNK_CHARS = 2000
+
+
+def build_chunks(count: int, seed: int) -> list:
+    """Extrai `count` chunks de texto de um corpus sintético."""
+    chunks = []
+    with tempfile.TemporaryDirectory(prefix="context-guide-bench-") as docs_dir:
+        for path in generate_corpus(docs_dir, max(count, 10), seed=seed):
+            text = path.read_text(encoding="utf-8")
+            chunks.extend(text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS))
+            if len(chunks) >= count:
+                break
+    return chunks[:count]
+
+
+def build_payload(num_results: int, seed: int) -> dict:
+    """Monta uma resposta de `/context` com `num_results` fontes."""
+    chunks = build_chunks(num_results, seed)
+    sources = [
+        {
+            "content": chunk,
+            "metadata": {"file_path": f"/projeto/docs/arquivo-{i:03d}.md", "file_name": f"arquivo-{i:03d}.md",
+                         "file_size": len(chunk), "creation_date": "2024-01-01"},
+            "score": 1.0 / (i + 1),
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+    return {
+        "context": "\n\n".join(chunks),
+        "sources": sources,
+        "retrieval_time": 0.0123,
+        "timings": None,
+    }
+
+
+def default_path(payload: dict) -> bytes:
+    """Serialização pelo caminho padrão do FastAPI com response_model."""
+    validated = ContextResponse.model_validate(payload)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_path(payload: dict) -> bytes:
+    """Serialização pelo caminho otimizado."""
+    return FastJSONResponse(payload).body
+
+
+def measure(function, *args, repeat: int) -> dict:
+    """Executa a função `repeat` vezes e resume as latências."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - start)
+    return summarize_latencies(durations)
+
+
+def run(num_results: int, repeat: int, seed: int) -> dict:
+    """
+    Executa o benchmark para um valor de `num_results`.
+
+    Args:
+        num_results: Número de fontes na resposta
+        repeat: Repetições de cada medida
+        seed: Semente do gerador de corpus
+
+    Returns:
+        Dicionário com tempos e tamanhos
+    """
+    payload = build_payload(num_results, seed)
+    body = fast_path(payload)
+    result = {
+        "num_results": num_results,
+        "serialization": {
+            "default": measure(default_path, payload, repeat=repeat),
+            "fast": measure(fast_path, payload, repeat=repeat),
+        },
+        "bytes": {"identity": len(default_path(payload)), "fast": len(body)},
+        "compression": {},
+    }
+    for encoding in available_encodings():
+        result["bytes"][encoding] = len(compress(body, encoding))
+        result["compression"][encoding] = measure(compress, body, encoding, repeat=repeat)
+    return result
+
+
+def print_summary(results: list) -> None:
+    """Imprime um resumo legível dos resultados."""
+    encodings = available_encodings()
+    header = f"{'fontes':>7} {'padrão(ms)':>11} {'rápido(ms)':>11} {'ganho':>7} {'bytes':>9} " + \
+        " ".join(f"{encoding + '(B)':>9} {encoding + '(ms)':>10}" for encoding in encodings)
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        default = r["serialization"]["default"]["p50"] * 1000
+        fast = r["serialization"]["fast"]["p50"] * 1000
+        line = f"{r['num_results']:>7} {default:>11.3f} {fast:>11.3f} {default / fast if fast else 0:>6.1f}x " \
+               f"{r['bytes']['identity']:>9}"
+        for encoding in encodings:
+            line += f" {r['bytes'][encoding]:>9} {r['compression'][encoding]['p50'] * 1000:>10.3f}"
+        print(line)
+
+
+def parse_arguments():
+    """
+    Processa argumentos da linha de comando.
+
+    Returns:
+        Argumentos processados
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de serialização e compressão do Context Guide")
+    parser.add_argument("--num-results", type=int, nargs="+", default=[5, 20, 50],
+                        help="Números de fontes por resposta (padrão: 5 20 50)")
+    parser.add_argument("--repeat", type=int, default=200, help="Repetições de cada medida (padrão: 200)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador de corpus (padrão: 42)")
+    parser.add_argument("--output", help="Arquivo JSON onde os resultados serão gravados")
+    return parser.parse_args()
+
+
+def main():
+    """Executa o benchmark para cada número de fontes."""
+    args = parse_arguments()
+    results = [run(num_results, args.repeat, args.seed) for num_results in args.num_results]
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "orjson": ORJSON_AVAILABLE,
+            "zstd": ZSTD_AVAILABLE,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    print_summary(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Resultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
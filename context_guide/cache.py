@@ -0,0 +1,108 @@
+"""
+Cache LRU em memória com limite de entradas e de tamanho.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """Cache LRU thread-safe limitado pela quantidade de entradas e pelo tamanho total."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_entries: Quantidade máxima de entradas (0 desativa o cache)
+            max_bytes: Tamanho máximo somado das entradas, medido por `sizeof`
+            sizeof: Função que estima o tamanho de um valor (padrão: 1 por entrada)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 1)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se o cache armazena entradas."""
+        return self.max_entries > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retorna o valor associado à chave, marcando-o como usado recentemente.
+
+        Args:
+            key: Chave procurada
+            default: Valor retornado se a chave não estiver no cache
+
+        Returns:
+            Valor armazenado ou `default`
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Armazena um valor, descartando as entradas menos usadas se necessário.
+
+        Valores maiores que o limite de tamanho não são armazenados.
+
+        Args:
+            key: Chave do valor
+            value: Valor a armazenar
+        """
+        if not self.enabled:
+            return
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._total > self.max_bytes):
+                oldest, _ = self._entries.popitem(last=False)
+                self._total -= self._sizes.pop(oldest)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Retorna o estado do cache para monitoramento.
+
+        Returns:
+            Dicionário com entradas, tamanho total, limites e contadores
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self._total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
@@ -14,8 +14,10 @@ from pathlib import Path
 
 from context_guide.context import ContextManager
 from context_guide.watcher import FileWatcher
+from context_guide.indexing import IndexingExecutor
+from context_guide.metadata import FILTER_KEYS
 from context_guide.prompt_generator import PromptGenerator
-from context_guide.project_templates import PROJECT_TEMPLATES
+from context_guide.project_templates import GROUP_DIRECTORIES, PROJECT_TEMPLATES
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, 
@@ -48,12 +50,55 @@ def parse_arguments():
         choices=["react", "node", "django", "flask", "vue", "spring"],
         help="Tecnologia específica para contextualização especializada"
     )
+    generate_parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Orçamento de tokens do prompt; as fontes menos relevantes são descartadas "
+             "(padrão: CONTEXT_GUIDE_MAX_PROMPT_TOKENS, sem limite se ausente)"
+    )
+    generate_parser.add_argument(
+        "--compress",
+        action="store_true",
+        default=None,
+        help="Manter apenas as frases de cada fonte mais relevantes para a solicitação"
+    )
+    generate_parser.add_argument(
+        "--path",
+        dest="path_prefix",
+        help="Buscar apenas no documento ou diretório informado, relativo ao diretório de "
+             "documentos (ex: tracking/ ou development/api-docs.md)"
+    )
+    generate_parser.add_argument(
+        "--group",
+        dest="template_group",
+        help="Buscar apenas no grupo de templates (basic, tracking, development, app_types)"
+    )
+    generate_parser.add_argument(
+        "--file",
+        dest="file_name",
+        help="Buscar apenas em arquivos com este nome (ex: tasks.md)"
+    )
+    generate_parser.add_argument(
+        "--heading",
+        help="Buscar apenas na seção com este título"
+    )
     
     # Comando para iniciar modo servidor (monitoramento)
     server_parser = subparsers.add_parser(
         "serve", 
         help="Iniciar modo servidor para monitorar alterações nos documentos"
     )
+    server_parser.add_argument(
+        "--polling",
+        action="store_true",
+        default=None,
+        help="Monitorar por varreduras periódicas em vez de eventos do sistema (ex: sistemas de arquivos de rede)"
+    )
+    server_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        help="Intervalo entre varreduras no modo polling em segundos (padrão: 2)"
+    )
     
     # Comando para iniciar servidor MCP
     mcp_parser = subparsers.add_parser(
@@ -76,12 +121,76 @@ def parse_arguments():
         action="store_true",
         help="Ativa o reload automático durante desenvolvimento"
     )
+    mcp_parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("CONTEXT_GUIDE_WORKERS", "1")),
+        help="Número de processos worker; acima de 1 o índice é compartilhado via mmap (padrão: 1)"
+    )
+    
+    # Comando para teste de carga do servidor MCP
+    loadtest_parser = subparsers.add_parser(
+        "loadtest",
+        help="Executar teste de carga contra o servidor MCP"
+    )
+    loadtest_parser.add_argument(
+        "--url",
+        help="URL de um servidor MCP já em execução (padrão: iniciar um servidor local)"
+    )
+    loadtest_parser.add_argument(
+        "--duration",
+        type=float,
+        default=30.0,
+        help="Duração do teste em segundos (padrão: 30)"
+    )
+    loadtest_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Número de clientes simultâneos (padrão: 10)"
+    )
+    loadtest_parser.add_argument(
+        "--mix",
+        default="context=75,prompt=24,update-index=1",
+        help="Pesos de cada endpoint (padrão: context=75,prompt=24,update-index=1)"
+    )
+    loadtest_parser.add_argument(
+        "--rebuild-at",
+        type=float,
+        help="Segundo do teste em que uma reconstrução do índice é disparada"
+    )
+    loadtest_parser.add_argument(
+        "--fake-embedder",
+        action="store_true",
+        help="Usar embedder determinístico no servidor local (sem carregar modelo)"
+    )
+    loadtest_parser.add_argument(
+        "--corpus-size",
+        type=int,
+        help="Gerar um corpus sintético com N arquivos para o servidor local"
+    )
+    loadtest_parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Porta do servidor local (padrão: 8765)"
+    )
+    loadtest_parser.add_argument(
+        "--output",
+        help="Arquivo JSON para gravar o relatório"
+    )
     
     # Comando para atualizar índice
     update_parser = subparsers.add_parser(
         "update", 
         help="Atualizar manualmente o índice de documentos"
     )
+    update_parser.add_argument(
+        "--git",
+        action="store_true",
+        help="Reindexar apenas os documentos alterados desde o último commit indexado "
+             "(fora de um repositório, compara o hash do conteúdo)"
+    )
     
     # Comando para inicializar estrutura em um projeto
     init_parser = subparsers.add_parser(
@@ -138,7 +247,7 @@ def initialize_project(docs_dir, project_type="standard"):
         # Incluir todos os templates mais o específico para web
         template_groups = ["basic", "tracking", "development"]
         # Adicionar o template específico para web apps
-        file_path = docs_path / "architecture" / "web-app.md"
+        file_path = docs_path / GROUP_DIRECTORIES["app_types"] / "web-app.md"
         file_path.parent.mkdir(exist_ok=True)
         if not file_path.exists():
             with open(file_path, 'w') as f:
@@ -148,7 +257,7 @@ def initialize_project(docs_dir, project_type="standard"):
         # Incluir todos os templates mais o específico para mobile
         template_groups = ["basic", "tracking", "development"]
         # Adicionar o template específico para mobile apps
-        file_path = docs_path / "architecture" / "mobile-app.md"
+        file_path = docs_path / GROUP_DIRECTORIES["app_types"] / "mobile-app.md"
         file_path.parent.mkdir(exist_ok=True)
         if not file_path.exists():
             with open(file_path, 'w') as f:
@@ -158,7 +267,7 @@ def initialize_project(docs_dir, project_type="standard"):
         # Incluir todos os templates mais o específico para desktop
         template_groups = ["basic", "tracking", "development"]
         # Adicionar o template específico para desktop apps
-        file_path = docs_path / "architecture" / "desktop-app.md"
+        file_path = docs_path / GROUP_DIRECTORIES["app_types"] / "desktop-app.md"
         file_path.parent.mkdir(exist_ok=True)
         if not file_path.exists():
             with open(file_path, 'w') as f:
@@ -169,15 +278,9 @@ def initialize_project(docs_dir, project_type="standard"):
     for group in template_groups:
         if group in PROJECT_TEMPLATES:
             for filename, content in PROJECT_TEMPLATES[group].items():
-                # Para melhor organização, colocar templates de desenvolvimento em subpasta
-                if group == "development":
-                    file_path = docs_path / "development" / filename
-                    file_path.parent.mkdir(exist_ok=True)
-                elif group == "tracking":
-                    file_path = docs_path / "tracking" / filename
-                    file_path.parent.mkdir(exist_ok=True)
-                else:
-                    file_path = docs_path / filename
+                # Para melhor organização, cada grupo (exceto o básico) fica em sua subpasta
+                file_path = docs_path / GROUP_DIRECTORIES[group] / filename
+                file_path.parent.mkdir(exist_ok=True)
                 
                 if not file_path.exists():
                     with open(file_path, 'w') as f:
@@ -222,6 +325,83 @@ def initialize_project(docs_dir, project_type="standard"):
     print("3. Use 'context-guide generate \"Sua solicitação\"' para gerar prompts com contexto")
     print("\n📚 Documentação completa disponível em: https://github.com/seuusuario/context-guide")
 
+def run_loadtest(args):
+    """
+    Executa o teste de carga, iniciando um servidor local se nenhuma URL for informada.
+    
+    Args:
+        args: Argumentos processados da linha de comando
+    """
+    import asyncio
+    import json
+    import shutil
+    import tempfile
+    
+    try:
+        from context_guide.mcp_server.loadtest import (
+            run_load_test, start_local_server, parse_mix, format_report, HTTPX_AVAILABLE
+        )
+        if not HTTPX_AVAILABLE:
+            raise ImportError("httpx")
+    except ImportError:
+        print("\n❌ Erro: Dependências para o teste de carga não encontradas.")
+        print("Por favor, instale as dependências necessárias:")
+        print("pip install \"context-guide[mcp]\"")
+        sys.exit(1)
+    
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"❌ Mistura de requisições inválida: {e}")
+        sys.exit(1)
+    
+    server_process = None
+    work_dir = None
+    base_url = args.url
+    try:
+        if not base_url:
+            # O servidor local sempre usa um banco temporário para não alterar o índice do projeto
+            work_dir = tempfile.mkdtemp(prefix="context-guide-loadtest-")
+            docs_dir = args.docs_dir
+            if args.corpus_size:
+                from context_guide.corpus import generate_corpus
+                docs_dir = os.path.join(work_dir, "docs")
+                generate_corpus(docs_dir, args.corpus_size)
+                print(f"📝 Corpus sintético com {args.corpus_size} arquivos gerado em {docs_dir}")
+            
+            print(f"🚀 Iniciando servidor local na porta {args.port}...")
+            server_process = start_local_server(
+                docs_dir=docs_dir,
+                db_dir=os.path.join(work_dir, "db"),
+                port=args.port,
+                embed_model="fake" if args.fake_embedder else None
+            )
+            base_url = f"http://127.0.0.1:{args.port}"
+        
+        print(f"⏱️  Teste de carga contra {base_url}: {args.concurrency} clientes por {args.duration:.0f}s")
+        report = asyncio.run(run_load_test(
+            base_url,
+            duration=args.duration,
+            concurrency=args.concurrency,
+            mix=mix,
+            rebuild_at=args.rebuild_at
+        ))
+        
+        print("\n" + format_report(report))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"\n✅ Relatório gravado em {args.output}")
+    except Exception as e:
+        logger.error(f"Erro no teste de carga: {e}")
+        sys.exit(1)
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.join(timeout=10)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
 def main():
     """Função principal do Context Guide."""
     args = parse_arguments()
@@ -245,7 +425,7 @@ def main():
             os.environ["CONTEXT_GUIDE_DB_DIR"] = args.db_dir
             
             # Iniciar o servidor MCP
-            run_server(host=args.host, port=args.port, reload=args.reload)
+            run_server(host=args.host, port=args.port, reload=args.reload, workers=args.workers)
         except ImportError:
             print("\n❌ Erro: Dependências para o servidor MCP não encontradas.")
             print("Por favor, instale as dependências necessárias:")
@@ -256,6 +436,11 @@ def main():
             sys.exit(1)
         return
     
+    # Comando para teste de carga
+    if args.command == "loadtest":
+        run_loadtest(args)
+        return
+    
     # Criar instância do gerenciador de contexto
     try:
         context_manager = ContextManager(docs_dir=args.docs_dir, db_dir=args.db_dir)
@@ -274,13 +459,17 @@ def main():
             technology = getattr(args, "technology", None)
             if technology:
                 print(f"⚙️ Usando contextualização especializada para: {technology}")
-                # Adicionar contexto de tecnologia à solicitação
-                request_with_tech = f"{request} (technology: {technology})"
-            else:
-                request_with_tech = request
+            
+            # Restringir a busca às seções e documentos informados (a tecnologia é tratada à parte)
+            filters = {key: getattr(args, key) for key in FILTER_KEYS
+                       if key != "technology" and getattr(args, key)}
             
             # Gerar prompt e copiar para área de transferência
-            prompt = prompt_generator.generate_and_copy_to_clipboard(request_with_tech)
+            prompt = prompt_generator.generate_and_copy_to_clipboard(request,
+                                                                     max_tokens=args.max_tokens,
+                                                                     compress=args.compress,
+                                                                     filters=filters,
+                                                                     technology=technology)
             
             # Exibir resumo do prompt
             print("\n" + "="*50)
@@ -289,6 +478,8 @@ def main():
             print(f"Solicitação: {request}")
             if technology:
                 print(f"Tecnologia: {technology}")
+            if filters:
+                print("Filtros: " + ", ".join(f"{key}={value}" for key, value in filters.items()))
             
             # Oferecer opção para mostrar o prompt completo
             show_full = input("\nMostrar prompt completo? (s/N): ").lower() == 's'
@@ -308,13 +499,37 @@ def main():
     elif args.command == "serve":
         print(f"🔍 Iniciando servidor de monitoramento para '{args.docs_dir}'...")
         
+        file_watcher = None
+        
+        # As atualizações rodam no executor de indexação, fora da thread do observador
+        def report_update(last_run):
+            # O callback do observador só agenda a atualização; a janela de agrupamento
+            # se adapta à duração real, medida pelo executor
+            if file_watcher and last_run["kind"] == "paths" and last_run["status"] == "success":
+                file_watcher.observe_update(last_run["seconds"])
+            if last_run["status"] == "success":
+                print(f"✅ Índice atualizado em {time.strftime('%H:%M:%S')} ({last_run['seconds']:.1f}s)")
+            elif last_run["status"] == "cancelled":
+                print("⏭️  Atualização interrompida por uma solicitação mais recente")
+            else:
+                print(f"❌ Erro ao atualizar índice: {last_run['error']}")
+        
+        indexing_executor = IndexingExecutor(context_manager, on_complete=report_update)
+        
+        # Aplicar em segundo plano as alterações feitas enquanto o servidor estava parado
+        offline_changes = indexing_executor.reconcile()
+        if offline_changes is None:
+            print("🔁 Índice sem manifesto; reconstruindo em segundo plano")
+        elif offline_changes:
+            print(f"🔁 {offline_changes} documento(s) alterado(s) desde a última execução; atualizando em segundo plano")
+        
         # Criar e iniciar observador de arquivos
-        def update_callback():
-            print(f"\n📝 Detectada alteração em documentos. Atualizando índice...")
-            context_manager.update_index()
-            print(f"✅ Índice atualizado em {time.strftime('%H:%M:%S')}")
+        def update_callback(changed_paths):
+            print(f"\n📝 Detectada alteração em {len(changed_paths)} documento(s). Atualizando índice...")
+            indexing_executor.submit_paths(changed_paths)
         
-        file_watcher = FileWatcher(args.docs_dir, update_callback)
+        file_watcher = FileWatcher(args.docs_dir, update_callback, poll_interval=args.poll_interval,
+                                   force_polling=args.polling, time_callback=False)
         
         try:
             file_watcher.start()
@@ -331,16 +546,24 @@ def main():
         except Exception as e:
             logger.error(f"Erro no servidor: {e}")
         finally:
-            # Garantir que o observador seja encerrado
+            # Garantir que o observador e o executor sejam encerrados
             if file_watcher:
                 file_watcher.stop()
+            indexing_executor.stop()
             print("👋 Servidor encerrado")
     
     elif args.command == "update":
         print(f"📚 Atualizando índice para documentos em '{args.docs_dir}'...")
         
         try:
-            context_manager.update_index()
+            if args.git:
+                result = context_manager.update_incremental(use_git=True)
+                if result["mode"] == "full":
+                    print("🔁 Índice sem manifesto; reconstruído por completo")
+                else:
+                    print(f"🔁 {result['changed']} documento(s) alterado(s) desde a última indexação")
+            else:
+                context_manager.update_index()
             print("✅ Índice atualizado com sucesso!")
         except Exception as e:
             logger.error(f"Erro ao atualizar índice: {e}")
@@ -0,0 +1,195 @@
+"""
+Compressão extrativa do contexto antes da montagem do prompt.
+
+Muitos chunks recuperados são, em sua maior parte, texto padrão dos templates com uma
+ou duas frases realmente relevantes. Este módulo divide cada fonte em frases, pontua
+cada frase pela similaridade com o embedding da consulta (o mesmo calculado na busca)
+e mantém apenas as melhores frases de cada fonte, na ordem original.
+
+Os embeddings das frases são calculados em um único lote por prompt e memorizados:
+frases de template se repetem entre documentos e são embutidas uma única vez. Sem
+numpy, ou se o modelo de embeddings falhar, as frases são pontuadas pelas palavras
+em comum com a consulta.
+"""
+
+import logging
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from context_guide.cache import LRUCache
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Fração das frases mantida em cada fonte
+DEFAULT_KEEP_RATIO = 0.3
+
+# Quantidade mínima de frases mantidas por fonte
+DEFAULT_MIN_SENTENCES = 2
+
+# Quantidade de embeddings de frases memorizados
+DEFAULT_CACHE_SIZE = 4096
+
+# Fim de frase seguido de espaço; quebras de linha também separam frases
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+# Função que recebe textos e retorna um embedding para cada um
+EmbedBatch = Callable[[List[str]], List[List[float]]]
+
+
+def split_sentences(text: str) -> List[Tuple[int, str]]:
+    """
+    Divide um texto em frases, preservando a linha de origem de cada uma.
+
+    Args:
+        text: Texto de uma fonte
+
+    Returns:
+        Lista de (índice da linha, frase), sem frases vazias
+    """
+    sentences = []
+    for line_number, line in enumerate(text.splitlines()):
+        for sentence in _SENTENCE_BOUNDARY.split(line.strip()):
+            if sentence:
+                sentences.append((line_number, sentence))
+    return sentences
+
+
+def _join_sentences(sentences: Sequence[Tuple[int, str]]) -> str:
+    """Reconstrói o texto: frases da mesma linha separadas por espaço, linhas por quebra."""
+    parts = []
+    previous_line = None
+    for line_number, sentence in sentences:
+        if previous_line is not None:
+            parts.append(" " if line_number == previous_line else "\n")
+        parts.append(sentence)
+        previous_line = line_number
+    return "".join(parts)
+
+
+def _lexical_scores(query: str, sentences: List[str]) -> List[float]:
+    """Pontua frases pela fração das palavras da consulta que elas contêm."""
+    query_words = {word.lower() for word in _WORD.findall(query) if len(word) > 2}
+    if not query_words:
+        return [0.0] * len(sentences)
+    scores = []
+    for sentence in sentences:
+        words = {word.lower() for word in _WORD.findall(sentence)}
+        scores.append(len(query_words & words) / math.sqrt(len(words) or 1))
+    return scores
+
+
+class SentenceCompressor:
+    """Mantém, em cada fonte, as frases mais similares à consulta."""
+
+    def __init__(self, embed_batch: Optional[EmbedBatch] = None, keep_ratio: float = DEFAULT_KEEP_RATIO,
+                 min_sentences: int = DEFAULT_MIN_SENTENCES, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Inicializa o compressor.
+
+        Args:
+            embed_batch: Função que calcula os embeddings de uma lista de textos (ex:
+                `embed_model.get_text_embedding_batch`); sem ela, a pontuação é lexical
+            keep_ratio: Fração das frases mantida em cada fonte
+            min_sentences: Quantidade mínima de frases mantidas por fonte
+            cache_size: Quantidade de embeddings de frases memorizados
+        """
+        self.embed_batch = embed_batch
+        self.keep_ratio = keep_ratio
+        self.min_sentences = min_sentences
+        self.cache_size = cache_size
+        self._cache = LRUCache(max_entries=cache_size)
+        # Acertos e faltas contados por frase
+        self.stats = self._cache.stats
+
+    def _embed(self, sentences: List[str]) -> "np.ndarray":
+        """
+        Retorna os embeddings normalizados das frases, calculando apenas os ausentes do cache.
+
+        Args:
+            sentences: Frases distintas
+
+        Returns:
+            Matriz (frases x dimensão) com vetores de norma 1
+        """
+        vectors = {}
+        for sentence in sentences:
+            vector = self._cache.get(sentence)
+            if vector is not None:
+                vectors[sentence] = vector
+        missing = [sentence for sentence in sentences if sentence not in vectors]
+
+        if missing:
+            computed = np.asarray(self.embed_batch(missing), dtype=np.float32)
+            norms = np.linalg.norm(computed, axis=1, keepdims=True)
+            computed /= np.where(norms == 0, 1, norms)
+            vectors.update(zip(missing, computed))
+            for sentence, vector in zip(missing, computed):
+                self._cache.put(sentence, vector)
+
+        return np.stack([vectors[sentence] for sentence in sentences])
+
+    def _score(self, query: str, query_embedding: Optional[Sequence[float]],
+               sentences: List[str]) -> Tuple[List[float], str]:
+        """
+        Pontua as frases distintas em relação à consulta.
+
+        Returns:
+            Tupla (scores na ordem das frases, método usado: "embedding" ou "lexical")
+        """
+        if NUMPY_AVAILABLE and self.embed_batch is not None and query_embedding is not None:
+            try:
+                query_vector = np.asarray(query_embedding, dtype=np.float32)
+                query_vector /= np.linalg.norm(query_vector) or 1
+                return (self._embed(sentences) @ query_vector).tolist(), "embedding"
+            except Exception as e:
+                logger.warning(f"Falha ao pontuar frases por embedding, usando pontuação lexical: {e}")
+        return _lexical_scores(query, sentences), "lexical"
+
+    def compress(self, query: str, sources: List[Dict[str, Any]],
+                 query_embedding: Optional[Sequence[float]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Reduz cada fonte às frases mais relevantes para a consulta.
+
+        Args:
+            query: Consulta do usuário
+            sources: Fontes retornadas por `get_relevant_context`
+            query_embedding: Embedding da consulta calculado na busca
+
+        Returns:
+            Tupla (fontes comprimidas, relatório com frases e caracteres mantidos); os
+            metadados e o score de cada fonte são preservados
+        """
+        split = [split_sentences(source.get("content", "")) for source in sources]
+        distinct = list(dict.fromkeys(sentence for sentences in split for _, sentence in sentences))
+        scores, method = self._score(query, query_embedding, distinct) if distinct else ([], "none")
+        score_of = dict(zip(distinct, scores))
+
+        compressed = []
+        kept_total = 0
+        for source, sentences in zip(sources, split):
+            keep = max(self.min_sentences, math.ceil(len(sentences) * self.keep_ratio))
+            if keep >= len(sentences):
+                compressed.append(source)
+                kept_total += len(sentences)
+                continue
+            ranked = sorted(range(len(sentences)), key=lambda i: score_of[sentences[i][1]], reverse=True)
+            kept = sorted(ranked[:keep])
+            compressed.append({**source, "content": _join_sentences([sentences[i] for i in kept])})
+            kept_total += len(kept)
+
+        report = {
+            "method": method,
+            "sentences_total": sum(len(sentences) for sentences in split),
+            "sentences_kept": kept_total,
+            "chars_before": sum(len(source.get("content", "")) for source in sources),
+            "chars_after": sum(len(source["content"]) for source in compressed),
+        }
+        return compressed, report
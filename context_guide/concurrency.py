@@ -0,0 +1,73 @@
+"""
+Deduplicação de chamadas concorrentes idênticas (single-flight).
+
+Usada pelo servidor MCP para que várias requisições iguais recebidas ao mesmo tempo
+(ex: vários clientes abrindo o mesmo workspace) compartilhem um único embedding da
+consulta e uma única busca no índice. A deduplicação é feita no loop de eventos:
+apenas a primeira requisição ocupa uma thread do threadpool, e as idênticas aguardam
+o resultado sem bloquear nenhuma thread.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplica chamadas concorrentes idênticas no loop de eventos.
+
+    Enquanto uma chamada para uma chave estiver em andamento, chamadas com a mesma
+    chave aguardam o seu término e recebem o mesmo resultado (ou a mesma exceção), em
+    vez de repetirem o trabalho. O resultado não é guardado depois do término: chamadas
+    posteriores executam novamente (o cache, quando existe, fica a cargo de quem chama).
+
+    Deve ser usado a partir de um único loop de eventos.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.stats = {"executions": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Executa a função, ou aguarda a execução em andamento para a mesma chave.
+
+        A execução roda em uma tarefa própria: se a requisição que a iniciou for
+        cancelada (ex: cliente desconectado), as demais continuam aguardando o resultado.
+        O resultado é compartilhado entre todos os chamadores e não deve ser alterado.
+
+        Args:
+            key: Chave que identifica chamadas equivalentes
+            function: Função sem argumentos que retorna o awaitable que produz o
+                resultado (ex: `lambda: run_in_threadpool(busca)`)
+
+        Returns:
+            Tupla (resultado, compartilhado); `compartilhado` é True se o resultado veio
+            da execução iniciada por outro chamador
+
+        Raises:
+            Exception: A exceção levantada pela função, repassada a todos os chamadores
+        """
+        call = self._calls.get(key)
+        shared = call is not None and not call.done()
+        if shared:
+            self.stats["coalesced"] += 1
+        else:
+            call = self._calls[key] = asyncio.ensure_future(function())
+            self.stats["executions"] += 1
+            call.add_done_callback(lambda finished: self._finish(key, finished))
+        return await asyncio.shield(call), shared
+
+    def _finish(self, key: Hashable, call: "asyncio.Future[Any]") -> None:
+        """Remove a execução terminada e marca sua exceção como tratada."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled() and call.exception() is not None:
+            logger.debug(f"Execução compartilhada falhou: {call.exception()}")
+
+    def in_flight(self) -> int:
+        """Quantidade de chaves em execução."""
+        return sum(1 for call in self._calls.values() if not call.done())
@@ -3,19 +3,45 @@ Módulo de gerenciamento de contexto usando LlamaIndex e ChromaDB.
 """
 
 import os
+import json
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterable
 from pathlib import Path
 
+from context_guide.timing import StageTimer
+from context_guide.embeddings import resolve_embed_model
+from context_guide.indexing import BuildThrottle, IndexingCancelled
+from context_guide.metadata import (
+    tag_section_metadata, normalize_filters, matching_paths, to_metadata_filters, without_technology
+)
+from context_guide.technologies import tag_technologies
+from context_guide.watcher import scan_markdown_files
+from context_guide.git_changes import (
+    repository_root, head_commit, changed_markdown_files, working_tree_markdown_files
+)
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Arquivo, no diretório do banco, com o estado dos documentos indexados
+MANIFEST_FILENAME = "index_manifest.json"
+# Versão 2: chunks com metadados de seção (doc_path, template_group, heading); versão 3:
+# marcações de tecnologia (tech_<nome>); versão 4: marcações sem palavras ambíguas.
+# Índices anteriores não têm manifesto válido e são reconstruídos
+MANIFEST_VERSION = 4
+
+# Arquivo, no diretório do banco, com o último commit indexado (update --git)
+INDEXED_COMMIT_FILENAME = "last_indexed_commit"
+
 class ContextManager:
     """Gerencia a indexação e consulta de documentos markdown para fornecer contexto."""
     
-    def __init__(self, docs_dir: str = "docs", db_dir: str = "chroma_db", collection_name: str = "markdown_docs"):
+    def __init__(self, docs_dir: str = "docs", db_dir: str = "chroma_db", collection_name: str = "markdown_docs",
+                 embed_model: Optional[Any] = None):
         """
         Inicializa o gerenciador de contexto.
         
@@ -23,32 +49,54 @@ class ContextManager:
             docs_dir: Diretório contendo os arquivos markdown
             db_dir: Diretório para armazenar o banco de dados ChromaDB
             collection_name: Nome da coleção no ChromaDB
+            embed_model: Instância ou nome do modelo de embeddings (padrão: variável
+                CONTEXT_GUIDE_EMBED_MODEL ou "local:BAAI/bge-small-en-v1.5"); "fake"
+                usa um embedder determinístico para benchmarks e testes de carga
         """
         self.docs_dir = Path(docs_dir)
         self.db_dir = Path(db_dir)
         self.collection_name = collection_name
         
+        # Estatísticas da última construção do índice
+        self.index_stats = {
+            "last_build_seconds": 0.0,
+            "last_build_documents": 0,
+            "last_build_chunks": 0,
+            "last_build_timestamp": 0.0,
+        }
+        
         # Garantir que os diretórios existam
         self.docs_dir.mkdir(exist_ok=True)
         self.db_dir.mkdir(exist_ok=True)
         
+        # Estado (mtime, tamanho e hash) de cada documento indexado; None se desconhecido
+        self.manifest = self._load_manifest()
+        
+        # Incrementada a cada alteração do índice; invalida resultados derivados (ex: prompts em cache)
+        self.index_version = 0
+        
+        # Lotes da construção do índice, que cedem a vez às consultas em andamento
+        self.build_throttle = BuildThrottle.from_env()
+        
         try:
             # Importações que podem falhar
             from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex
             from llama_index.vector_stores.chroma import ChromaVectorStore
-            from llama_index.core.embeddings import resolve_embed_model
             from llama_index.core.node_parser import SentenceSplitter
             import chromadb
             
             # Configurar o modelo de embeddings
-            embed_model = resolve_embed_model("local:BAAI/bge-small-en-v1.5")
+            if embed_model is None:
+                embed_model = os.environ.get("CONTEXT_GUIDE_EMBED_MODEL")
+            embed_model = resolve_embed_model(embed_model)
             Settings.embed_model = embed_model
+            self.embed_model = embed_model
             Settings.chunk_size = 512
             
             # Inicializar ChromaDB
             self.client = chromadb.PersistentClient(path=str(self.db_dir))
-            self._initialize_index()
             self.llama_available = True
+            self._initialize_index()
         except ImportError as e:
             logger.error(f"Erro ao importar dependências: {e}")
             logger.warning("Funcionando em modo limitado sem LlamaIndex e ChromaDB")
@@ -83,49 +131,104 @@ class ContextManager:
             logger.error(f"Erro ao inicializar índice: {e}")
             raise
     
-    def _create_index(self, vector_store) -> None:
+    def _create_index(self, vector_store, should_stop: Optional[Callable[[], bool]] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> None:
         """
         Cria um novo índice a partir dos documentos markdown.
         
+        Os chunks são inseridos em lotes de `build_throttle.batch_size`; entre os
+        lotes a construção cede a vez às consultas em andamento e pode ser
+        interrompida por `should_stop`.
+        
         Args:
             vector_store: ChromaVectorStore para armazenar os embeddings
+            should_stop: Função consultada entre os lotes; se retornar True, a
+                construção é interrompida com IndexingCancelled
+            progress: Função chamada com (chunks inseridos, total de chunks)
+            
+        Raises:
+            IndexingCancelled: Se `should_stop` solicitar a interrupção
         """
         if not self.llama_available:
             return None
             
-        from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
-        from llama_index.core.node_parser import SentenceSplitter
+        from llama_index.core import SimpleDirectoryReader, StorageContext, VectorStoreIndex
+        
+        start_time = time.perf_counter()
         
-        if not any(self.docs_dir.glob("*.md")):
+        if not any(self.docs_dir.rglob("*.md")):
             logger.warning(f"Nenhum arquivo markdown encontrado em '{self.docs_dir}'")
             # Criar um índice vazio para evitar erros
             self.index = VectorStoreIndex.from_vector_store(vector_store)
+            self.manifest = {}
+            self._save_manifest()
+            self.index_version += 1
             return
         
+        # O manifesto é gerado antes da leitura: alterações feitas durante a construção
+        # mudam o mtime e serão detectadas na próxima reconciliação
+        manifest = self._build_manifest()
+        
         # Carregar documentos do diretório
         documents = SimpleDirectoryReader(
             input_dir=str(self.docs_dir),
-            required_exts=[".md"]
+            required_exts=[".md"],
+            recursive=True
         ).load_data()
         
         logger.info(f"Carregados {len(documents)} documentos markdown")
         
         # Dividir documentos em chunks menores
-        parser = SentenceSplitter(chunk_size=512, chunk_overlap=50)
-        nodes = parser.get_nodes_from_documents(documents)
+        nodes = self._split_documents(documents)
+        
+        # Criar índice (os embeddings são gravados no vector store via StorageContext)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        self.index = VectorStoreIndex([], storage_context=storage_context)
+        batch_size = self.build_throttle.batch_size
+        for start in range(0, len(nodes), batch_size):
+            if start:
+                self.build_throttle.checkpoint()
+            if should_stop and should_stop():
+                logger.warning(f"Construção do índice interrompida após {start} de {len(nodes)} nodes")
+                raise IndexingCancelled()
+            self.index.insert_nodes(nodes[start:start + batch_size])
+            if progress:
+                progress(min(start + batch_size, len(nodes)), len(nodes))
         
-        # Criar índice
-        self.index = VectorStoreIndex(nodes, vector_store=vector_store)
-        logger.info(f"Índice criado com {len(nodes)} nodes")
+        self.manifest = manifest
+        self._save_manifest()
+        self.index_version += 1
+        
+        self.index_stats.update({
+            "last_build_seconds": time.perf_counter() - start_time,
+            "last_build_documents": len(documents),
+            "last_build_chunks": len(nodes),
+            "last_build_timestamp": time.time(),
+        })
+        logger.info(f"Índice criado com {len(nodes)} nodes em {self.index_stats['last_build_seconds']:.2f}s")
     
-    def update_index(self) -> None:
-        """Atualiza o índice com novos documentos ou alterações."""
+    def update_index(self, should_stop: Optional[Callable[[], bool]] = None,
+                     progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Atualiza o índice com novos documentos ou alterações.
+        
+        Args:
+            should_stop: Função consultada entre os lotes de inserção para interromper a reconstrução
+            progress: Função chamada com (chunks inseridos, total de chunks)
+        """
         if not self.llama_available:
             logger.info("Método update_index chamado (stub)")
             return None
             
         logger.info("Atualizando índice de documentos...")
         
+        # Até a reconstrução terminar o manifesto não representa a coleção; sem ele,
+        # uma reconstrução interrompida é refeita por completo na próxima inicialização
+        self.manifest = None
+        self._manifest_path().unlink(missing_ok=True)
+        self._indexed_commit_path().unlink(missing_ok=True)
+        self.index_version += 1
+        
         # Deletar coleção existente e recriar
         self.client.delete_collection(self.collection_name)
         self.chroma_collection = self.client.create_collection(self.collection_name)
@@ -133,55 +236,433 @@ class ContextManager:
         # Reconfigurar vector store e recriar índice
         from llama_index.vector_stores.chroma import ChromaVectorStore
         vector_store = ChromaVectorStore(chroma_collection=self.chroma_collection)
-        self._create_index(vector_store)
+        self._create_index(vector_store, should_stop=should_stop, progress=progress)
         
         logger.info("Índice atualizado com sucesso")
     
-    def get_relevant_context(self, query: str, num_results: int = 5) -> Dict[str, Any]:
+    def _split_documents(self, documents: List[Any]) -> List[Any]:
+        """Divide documentos em chunks (nodes) para indexação, com os metadados de seção e de tecnologia."""
+        from llama_index.core.node_parser import SentenceSplitter
+        
+        parser = SentenceSplitter(chunk_size=512, chunk_overlap=50)
+        nodes = []
+        for document in documents:
+            document_nodes = parser.get_nodes_from_documents([document])
+            file_path = document.metadata.get("file_path")
+            doc_path = self._relative_path(Path(file_path)) if file_path else None
+            tag_section_metadata(document, document_nodes, doc_path)
+            tag_technologies(document_nodes)
+            nodes.extend(document_nodes)
+        return nodes
+    
+    def _manifest_path(self) -> Path:
+        """Caminho do manifesto do índice."""
+        return self.db_dir / MANIFEST_FILENAME
+    
+    def _load_manifest(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Carrega o manifesto dos documentos indexados.
+        
+        Returns:
+            Dicionário caminho relativo -> {mtime_ns, size, sha1}, ou None se o
+            manifesto não existir ou for inválido
+        """
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifesto do índice inválido, será reconstruído: {e}")
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return data.get("files", {})
+    
+    def _save_manifest(self) -> None:
+        """Grava o manifesto de forma atômica."""
+        path = self._manifest_path()
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.manifest or {}}, f)
+        os.replace(temporary, path)
+    
+    def _relative_path(self, path: Path) -> Optional[str]:
+        """Caminho relativo ao diretório de documentos (None se estiver fora dele ou oculto)."""
+        try:
+            relative = Path(path).resolve().relative_to(self.docs_dir.resolve())
+        except ValueError:
+            return None
+        if any(part.startswith(".") for part in relative.parts):
+            return None
+        return relative.as_posix()
+    
+    def _document_paths(self) -> List[str]:
+        """Caminhos relativos dos documentos indexados (do manifesto ou, sem ele, do diretório)."""
+        if self.manifest is not None:
+            return list(self.manifest)
+        relatives = (self._relative_path(Path(path)) for path in scan_markdown_files(str(self.docs_dir)))
+        return [relative for relative in relatives if relative is not None]
+    
+    @staticmethod
+    def _file_sha1(path: Path) -> str:
+        """Hash SHA-1 do conteúdo de um arquivo."""
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _manifest_entry(self, path: Path, mtime_ns: int, size: int) -> Dict[str, Any]:
+        """Entrada do manifesto para um arquivo."""
+        return {"mtime_ns": mtime_ns, "size": size, "sha1": self._file_sha1(path)}
+    
+    def _build_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Gera o manifesto de todos os documentos markdown do diretório."""
+        manifest = {}
+        for path, (_, mtime_ns, size) in scan_markdown_files(str(self.docs_dir)).items():
+            relative = self._relative_path(Path(path))
+            if relative is not None:
+                manifest[relative] = self._manifest_entry(Path(path), mtime_ns, size)
+        return manifest
+    
+    def detect_offline_changes(self, candidates: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+        """
+        Compara os documentos em disco com o manifesto do índice.
+        
+        O hash do conteúdo só é calculado para arquivos cujo mtime ou tamanho mudou,
+        de modo que arquivos apenas "tocados" não são reindexados.
+        
+        Args:
+            candidates: Caminhos a verificar (ex: obtidos do git); se omitido, toda a
+                árvore de documentos é varrida
+        
+        Returns:
+            Lista ordenada de caminhos criados, alterados ou removidos desde a última
+            indexação, ou None se não houver manifesto (índice de uma versão anterior)
+        """
+        if self.manifest is None:
+            return None
+        
+        if candidates is None:
+            files = scan_markdown_files(str(self.docs_dir))
+            missing = set(self.manifest)
+        else:
+            files, missing = {}, set()
+            for candidate in candidates:
+                path = Path(candidate).resolve()
+                try:
+                    stat = path.stat()
+                    files[str(path)] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    relative = self._relative_path(path)
+                    if relative is not None:
+                        missing.add(relative)
+        
+        changed = []
+        refreshed = False
+        for path, (_, mtime_ns, size) in files.items():
+            relative = self._relative_path(Path(path))
+            if relative is None:
+                continue
+            missing.discard(relative)
+            entry = self.manifest.get(relative)
+            if entry and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+                continue
+            try:
+                if entry and entry["sha1"] == self._file_sha1(Path(path)):
+                    # Conteúdo igual: apenas atualizar os metadados do manifesto
+                    entry.update(mtime_ns=mtime_ns, size=size)
+                    refreshed = True
+                    continue
+            except OSError:
+                pass
+            changed.append(str(Path(path).resolve()))
+        
+        changed.extend(
+            str((self.docs_dir / relative).resolve()) for relative in missing if relative in self.manifest
+        )
+        if refreshed:
+            self._save_manifest()
+        return sorted(changed)
+    
+    def _indexed_commit_path(self) -> Path:
+        """Caminho do arquivo com o último commit indexado."""
+        return self.db_dir / INDEXED_COMMIT_FILENAME
+    
+    def detect_git_changes(self) -> Optional[List[str]]:
+        """
+        Lista os documentos alterados desde a última indexação usando o git.
+        
+        Os candidatos vêm de `git diff --name-status` entre o último commit indexado
+        e o HEAD, mais os arquivos alterados ou não versionados da árvore de trabalho;
+        o manifesto descarta os que não mudaram de conteúdo. Fora de um repositório,
+        ou sem um commit registrado, todos os documentos são comparados pelo hash.
+        
+        Returns:
+            Lista ordenada de caminhos alterados, ou None se não houver manifesto
+        """
+        if self.manifest is None:
+            return None
+        
+        repository = repository_root(self.docs_dir)
+        try:
+            # Primeira linha: commit; demais: arquivos que tinham alterações locais
+            commit, *dirty = self._indexed_commit_path().read_text(encoding="utf-8").splitlines()
+        except (FileNotFoundError, ValueError):
+            commit, dirty = None, []
+        
+        if repository is not None and commit:
+            candidates = changed_markdown_files(repository, commit, self.docs_dir)
+            if candidates is not None:
+                # Alterações locais indexadas podem ter sido desfeitas sem aparecer no git
+                candidates = sorted(set(candidates) | set(dirty))
+                logger.info(f"git: {len(candidates)} documento(s) candidato(s) desde {commit[:12]}")
+                return self.detect_offline_changes(candidates)
+        
+        logger.info("Último commit indexado indisponível; comparando documentos pelo hash do conteúdo")
+        return self.detect_offline_changes()
+    
+    def _record_indexed_commit(self) -> None:
+        """Registra o commit HEAD como o último indexado (removendo o registro fora do git)."""
+        repository = repository_root(self.docs_dir)
+        commit = head_commit(repository) if repository is not None else None
+        dirty = working_tree_markdown_files(repository, self.docs_dir) if commit else None
+        path = self._indexed_commit_path()
+        if commit and dirty is not None:
+            path.write_text("\n".join([commit] + dirty) + "\n", encoding="utf-8")
+        else:
+            path.unlink(missing_ok=True)
+    
+    def update_incremental(self, use_git: bool = True) -> Dict[str, Any]:
+        """
+        Atualiza o índice aplicando apenas os documentos alterados desde a última indexação.
+        
+        Args:
+            use_git: Se deve usar o git para encontrar os candidatos (ver detect_git_changes)
+            
+        Returns:
+            Dicionário com o modo usado ("incremental" ou "full") e as estatísticas
+            da atualização
+        """
+        changes = self.detect_git_changes() if use_git else self.detect_offline_changes()
+        if changes is None:
+            self.update_index()
+            result = {"mode": "full", "changed": None}
+        else:
+            result = {"mode": "incremental", "changed": len(changes)}
+            if changes:
+                result.update(self.update_documents(changes))
+        if use_git:
+            self._record_indexed_commit()
+        return result
+    
+    def update_documents(self, paths: Iterable[str], should_stop: Optional[Callable[[], bool]] = None,
+                         progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """
+        Atualiza no índice apenas os documentos informados.
+        
+        Os chunks de cada arquivo são removidos do ChromaDB e, se o arquivo ainda
+        existir, ele é lido, dividido e inserido novamente.
+        
+        Args:
+            paths: Caminhos dos arquivos criados, alterados ou removidos
+            should_stop: Função consultada entre os arquivos; se retornar True, a
+                atualização é interrompida com IndexingCancelled
+            progress: Função chamada com (arquivos processados, total de arquivos)
+            
+        Returns:
+            Dicionário com a quantidade de arquivos atualizados e removidos e de chunks inseridos
+            
+        Raises:
+            IndexingCancelled: Se `should_stop` solicitar a interrupção
+        """
+        stats = {"updated": 0, "removed": 0, "chunks": 0}
+        if not self.llama_available:
+            logger.info("Método update_documents chamado (stub)")
+            return stats
+        
+        from llama_index.core import SimpleDirectoryReader
+        
+        # Sem manifesto (índice de uma versão anterior) a reconstrução completa continua
+        # pendente; um manifesto parcial a esconderia
+        manifest = self.manifest
+        # O índice deixa de corresponder ao último commit registrado (update --git)
+        self._indexed_commit_path().unlink(missing_ok=True)
+        targets = sorted({Path(path).resolve() for path in paths})
+        try:
+            for i, path in enumerate(targets):
+                if i:
+                    self.build_throttle.checkpoint()
+                if should_stop and should_stop():
+                    logger.warning(f"Atualização interrompida após {i} de {len(targets)} arquivos")
+                    raise IndexingCancelled()
+                
+                relative = self._relative_path(path)
+                if relative is None or path.suffix != ".md":
+                    continue
+                
+                self.chroma_collection.delete(where={"file_path": str(path)})
+                if path.is_file():
+                    stat = path.stat()
+                    documents = SimpleDirectoryReader(input_files=[str(path)]).load_data()
+                    nodes = self._split_documents(documents)
+                    self.index.insert_nodes(nodes)
+                    if manifest is not None:
+                        manifest[relative] = self._manifest_entry(path, stat.st_mtime_ns, stat.st_size)
+                    stats["updated"] += 1
+                    stats["chunks"] += len(nodes)
+                else:
+                    if manifest is not None:
+                        manifest.pop(relative, None)
+                    stats["removed"] += 1
+                
+                if progress:
+                    progress(i + 1, len(targets))
+        finally:
+            if targets:
+                self.index_version += 1
+            if manifest is not None:
+                self._save_manifest()
+        
+        logger.info(f"Índice atualizado incrementalmente: {stats['updated']} arquivos atualizados, "
+                    f"{stats['removed']} removidos, {stats['chunks']} chunks inseridos")
+        return stats
+    
+    def close(self) -> None:
+        """Libera o índice e o cliente do ChromaDB (o gerenciador não deve mais ser usado)."""
+        if not self.llama_available:
+            return
+        for attribute in ("index", "chroma_collection"):
+            if hasattr(self, attribute):
+                delattr(self, attribute)
+        # Client.close() existe apenas nas versões mais recentes do ChromaDB
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+        logger.info(f"Índice em '{self.db_dir}' liberado")
+    
+    def get_index_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do índice para monitoramento.
+        
+        Returns:
+            Dicionário com número de chunks, tamanho em disco e dados da última construção
+        """
+        stats = dict(self.index_stats)
+        build_seconds = stats["last_build_seconds"]
+        stats["chunks_per_second"] = stats["last_build_chunks"] / build_seconds if build_seconds > 0 else 0.0
+        
+        chunks = 0
+        if self.llama_available and hasattr(self, "chroma_collection"):
+            try:
+                chunks = self.chroma_collection.count()
+            except Exception as e:
+                logger.warning(f"Não foi possível contar os chunks do índice: {e}")
+        stats["chunks"] = chunks
+        
+        size_bytes = 0
+        for root, _, files in os.walk(self.db_dir):
+            for name in files:
+                try:
+                    size_bytes += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        stats["size_bytes"] = size_bytes
+        return stats
+    
+    def _search(self, bundle: Any, num_results: int, filters: Dict[str, str],
+                doc_paths: Optional[List[str]]) -> List[Any]:
+        """Busca os nós mais similares; os filtros são aplicados pelo ChromaDB antes da busca."""
+        retriever = self.index.as_retriever(similarity_top_k=num_results,
+                                            filters=to_metadata_filters(filters, doc_paths))
+        return retriever.retrieve(bundle)
+    
+    def get_relevant_context(self, query: str, num_results: int = 5,
+                             include_query_embedding: bool = False,
+                             filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Consulta o índice para obter contexto relevante para uma consulta.
         
         Args:
             query: A consulta para buscar contexto relevante
             num_results: Número máximo de resultados a retornar
+            include_query_embedding: Se deve incluir no resultado o embedding da
+                consulta ("query_embedding"), para reaproveitá-lo após a busca
+            filters: Restringe a busca aos chunks com os metadados informados:
+                path_prefix (documento ou diretório relativo ao diretório de
+                documentos), template_group, file_name e heading. Com technology, os
+                chunks que mencionam a tecnologia vêm primeiro e, se não bastarem, o
+                resultado é completado com os demais
             
         Returns:
-            Dicionário com o contexto relevante
+            Dicionário com o contexto relevante, as fontes e o tempo de cada etapa
+            da consulta (query_embedding, vector_search, result_formatting)
+            
+        Raises:
+            ValueError: Se houver um filtro desconhecido
         """
+        filters = normalize_filters(filters)
         if not self.llama_available:
             logger.info(f"Consulta recebida: {query} (stub)")
             return {
                 "context": f"Contexto simulado para a consulta: {query}",
-                "sources": [{"content": "Conteúdo de teste", "metadata": {"file_path": "docs/test.md"}}]
+                "sources": [{"content": "Conteúdo de teste", "metadata": {"file_path": "docs/test.md"}}],
+                "timings": {}
             }
             
         if not hasattr(self, 'index') or self.chroma_collection.count() == 0:
             logger.warning("Índice vazio ou não inicializado. Retornando contexto vazio.")
-            return {"context": "", "sources": []}
+            return {"context": "", "sources": [], "timings": {}}
+        
+        doc_paths = None
+        if "path_prefix" in filters:
+            doc_paths = matching_paths(self._document_paths(), filters["path_prefix"])
+            if not doc_paths:
+                logger.info(f"Nenhum documento em '{filters['path_prefix']}'. Retornando contexto vazio.")
+                return {"context": "", "sources": [], "timings": {}}
         
+        timer = StageTimer()
         try:
-            # Criar query engine e realizar consulta
-            query_engine = self.index.as_query_engine(similarity_top_k=num_results)
-            response = query_engine.query(query)
+            from llama_index.core import QueryBundle
             
-            # Extrair nós fonte
-            source_nodes = response.source_nodes
-            sources = []
+            # Consultas têm precedência: a construção do índice espera entre seus lotes
+            with self.build_throttle.query():
+                # Gerar o embedding da consulta separadamente para medir cada etapa
+                with timer.stage("query_embedding"):
+                    query_embedding = self.embed_model.get_query_embedding(query)
+                
+                # Buscar os nós mais similares no vector store
+                with timer.stage("vector_search"):
+                    bundle = QueryBundle(query_str=query, embedding=query_embedding)
+                    source_nodes = self._search(bundle, num_results, filters, doc_paths)
+                    if "technology" in filters and len(source_nodes) < num_results:
+                        seen = {node.node.node_id for node in source_nodes}
+                        others = self._search(bundle, num_results, without_technology(filters), doc_paths)
+                        source_nodes += [node for node in others
+                                         if node.node.node_id not in seen][:num_results - len(source_nodes)]
             
             # Processar fontes para incluir nome do arquivo e conteúdo
-            for node in source_nodes:
-                source_info = {
-                    "content": node.text,
-                    "metadata": node.metadata,
-                    "score": node.score if hasattr(node, 'score') else None
-                }
-                sources.append(source_info)
+            with timer.stage("result_formatting"):
+                sources = []
+                for node in source_nodes:
+                    source_info = {
+                        "content": node.text,
+                        "metadata": node.metadata,
+                        "score": node.score if hasattr(node, 'score') else None
+                    }
+                    sources.append(source_info)
+                context = "\n\n".join(source["content"] for source in sources)
             
             # Retornar contexto formatado
-            return {
-                "context": str(response),
-                "sources": sources
+            result = {
+                "context": context,
+                "sources": sources,
+                "timings": timer.as_dict()
             }
+            if include_query_embedding:
+                result["query_embedding"] = query_embedding
+            return result
         except Exception as e:
             logger.error(f"Erro ao consultar contexto: {e}")
-            return {"context": "", "sources": [], "error": str(e)} 
\ No newline at end of file
+            return {"context": "", "sources": [], "error": str(e), "timings": timer.as_dict()}
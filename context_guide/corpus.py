@@ -0,0 +1,112 @@
+"""
+Geração de corpora sintéticos de documentação markdown para benchmarks e testes de carga.
+
+Os arquivos são derivados dos templates de PROJECT_TEMPLATES e seguem a mesma
+organização de diretórios criada por `context-guide init`.
+"""
+
+import random
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+from context_guide.project_templates import GROUP_DIRECTORIES, PROJECT_TEMPLATES
+
+# Quantidade máxima de arquivos por subdiretório em corpora grandes
+FILES_PER_BATCH_DIR = 1000
+
+_PLACEHOLDER_PATTERN = re.compile(r"\[[^\]\n]+\]")
+_WORD_PATTERN = re.compile(r"[A-Za-zÀ-ÿ]{4,}")
+_HEADING_PATTERN = re.compile(r"^#{1,3} (.+)$", re.MULTILINE)
+
+
+def _template_entries() -> List[Tuple[str, str, str]]:
+    """Lista (grupo, nome do arquivo, conteúdo) de todos os templates."""
+    return [
+        (group, filename, content)
+        for group, templates in PROJECT_TEMPLATES.items()
+        for filename, content in templates.items()
+    ]
+
+
+def _vocabulary() -> List[str]:
+    """Vocabulário usado para preencher os placeholders dos templates."""
+    words = set()
+    for _, _, content in _template_entries():
+        words.update(word.lower() for word in _WORD_PATTERN.findall(content))
+    return sorted(words)
+
+
+def template_queries() -> List[str]:
+    """
+    Retorna consultas realistas extraídas dos títulos das seções dos templates.
+
+    Returns:
+        Lista de títulos (sem os marcadores `#`)
+    """
+    queries = []
+    for _, _, content in _template_entries():
+        queries.extend(heading.strip() for heading in _HEADING_PATTERN.findall(content))
+    return sorted(set(queries))
+
+
+def generate_corpus(docs_dir: str, num_files: int, seed: int = 42) -> List[Path]:
+    """
+    Gera um corpus sintético de arquivos markdown.
+
+    Cada arquivo é uma cópia de um template com os placeholders (`[...]`) preenchidos
+    por palavras sorteadas e um parágrafo próprio, para que os chunks não sejam idênticos.
+
+    Args:
+        docs_dir: Diretório onde os arquivos serão criados
+        num_files: Quantidade de arquivos a gerar
+        seed: Semente para geração determinística
+
+    Returns:
+        Lista com os caminhos dos arquivos criados
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary()
+    entries = _template_entries()
+    docs_path = Path(docs_dir)
+    created = []
+
+    for i in range(num_files):
+        group, filename, content = entries[i % len(entries)]
+        directory = docs_path / GROUP_DIRECTORIES.get(group, group)
+        if num_files > len(entries):
+            directory = directory / f"lote-{i // FILES_PER_BATCH_DIR:03d}"
+        directory.mkdir(parents=True, exist_ok=True)
+
+        body = _PLACEHOLDER_PATTERN.sub(
+            lambda _: " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))),
+            content
+        )
+        paragraph = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(30, 80)))
+        path = directory / f"{Path(filename).stem}-{i:06d}.md"
+        path.write_text(f"{body}\n\n## Notas {i}\n{paragraph}\n", encoding="utf-8")
+        created.append(path)
+
+    return created
+
+
+def modify_corpus(files: List[Path], fraction: float, seed: int = 42) -> List[Path]:
+    """
+    Altera uma fração dos arquivos de um corpus, simulando edições de documentação.
+
+    Args:
+        files: Arquivos do corpus
+        fraction: Fração dos arquivos a alterar (0.0 a 1.0)
+        seed: Semente para escolha determinística dos arquivos
+
+    Returns:
+        Lista com os arquivos alterados
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary()
+    count = max(1, int(len(files) * fraction)) if files else 0
+    modified = rng.sample(files, count)
+    for path in modified:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n## Atualização\n" + " ".join(rng.choice(vocabulary) for _ in range(40)) + "\n")
+    return modified
@@ -0,0 +1,102 @@
+"""
+Resolução do modelo de embeddings usado pelo ContextManager.
+
+Além dos modelos suportados pelo LlamaIndex (ex: "local:BAAI/bge-small-en-v1.5"),
+aceita "fake" ou "fake:<dimensão>" para um embedder determinístico baseado em
+hashing de tokens, útil em benchmarks e testes de carga sem carregar um modelo real.
+"""
+
+import math
+import re
+import zlib
+from typing import Any, List
+
+try:
+    from llama_index.core.embeddings import BaseEmbedding
+    LLAMA_INDEX_AVAILABLE = True
+except ImportError:
+    BaseEmbedding = object
+    LLAMA_INDEX_AVAILABLE = False
+
+# Modelo de embeddings padrão
+DEFAULT_EMBED_MODEL = "local:BAAI/bge-small-en-v1.5"
+
+# Dimensão padrão do embedder determinístico (igual à do bge-small)
+FAKE_EMBED_DIM = 384
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def hash_embedding_vector(text: str, dim: int = FAKE_EMBED_DIM) -> List[float]:
+    """
+    Gera um vetor determinístico por feature hashing dos tokens do texto.
+
+    Textos com tokens em comum geram vetores próximos, então a busca por similaridade
+    continua produzindo resultados plausíveis.
+
+    Args:
+        text: Texto a ser convertido
+        dim: Dimensão do vetor
+
+    Returns:
+        Vetor normalizado (norma L2 igual a 1, ou zeros para texto vazio)
+    """
+    vector = [0.0] * dim
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        digest = zlib.crc32(token.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % dim] += sign
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        return vector
+    return [value / norm for value in vector]
+
+
+if LLAMA_INDEX_AVAILABLE:
+
+    class HashEmbedding(BaseEmbedding):
+        """Embedder determinístico e sem dependências externas (não semântico)."""
+
+        embed_dim: int = FAKE_EMBED_DIM
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "HashEmbedding"
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return hash_embedding_vector(query, self.embed_dim)
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return hash_embedding_vector(text, self.embed_dim)
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            return [hash_embedding_vector(text, self.embed_dim) for text in texts]
+
+
+def resolve_embed_model(embed_model: Any = None) -> Any:
+    """
+    Resolve o modelo de embeddings a partir de um nome ou instância.
+
+    Args:
+        embed_model: Instância já carregada, nome aceito pelo LlamaIndex, "fake",
+            "fake:<dimensão>" ou None para o modelo padrão
+
+    Returns:
+        Instância do modelo de embeddings
+    """
+    if embed_model is None:
+        embed_model = DEFAULT_EMBED_MODEL
+    if not isinstance(embed_model, str):
+        return embed_model
+    if not LLAMA_INDEX_AVAILABLE:
+        raise ImportError("llama-index não está instalado")
+
+    if embed_model == "fake" or embed_model.startswith("fake:"):
+        _, _, dim = embed_model.partition(":")
+        return HashEmbedding(embed_dim=int(dim) if dim else FAKE_EMBED_DIM)
+
+    from llama_index.core.embeddings import resolve_embed_model as llama_resolve_embed_model
+    return llama_resolve_embed_model(embed_model)
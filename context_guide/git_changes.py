@@ -0,0 +1,147 @@
+"""
+Detecção de documentos alterados a partir do histórico do git.
+
+Usado pela atualização incremental (`context-guide update --git`): em vez de calcular
+o hash de toda a árvore de documentos, o conjunto de candidatos é obtido com
+`git diff --name-status` entre o último commit indexado e o HEAD, somado aos
+arquivos alterados ou não versionados da árvore de trabalho.
+"""
+
+import logging
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo de cada comando git
+GIT_TIMEOUT = 30.0
+
+
+def _git(repository: Path, *args: str) -> Optional[str]:
+    """
+    Executa um comando git no repositório.
+
+    Returns:
+        Saída do comando, ou None se o git não estiver disponível ou o comando falhar
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(repository), *args],
+            capture_output=True, text=True, timeout=GIT_TIMEOUT,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"git indisponível: {e}")
+        return None
+    if result.returncode != 0:
+        logger.debug(f"git {' '.join(args)} falhou: {result.stderr.strip()}")
+        return None
+    return result.stdout
+
+
+def repository_root(path: Path) -> Optional[Path]:
+    """
+    Retorna a raiz do repositório git que contém `path`.
+
+    Args:
+        path: Diretório dentro do repositório
+
+    Returns:
+        Caminho absoluto da raiz, ou None fora de um repositório
+    """
+    output = _git(path, "rev-parse", "--show-toplevel")
+    return Path(output.strip()).resolve() if output else None
+
+
+def head_commit(repository: Path) -> Optional[str]:
+    """Retorna o hash do commit HEAD, ou None se o repositório não tiver commits."""
+    output = _git(repository, "rev-parse", "--verify", "-q", "HEAD")
+    return output.strip() if output else None
+
+
+def _parse_name_status(output: str) -> List[str]:
+    """Extrai os caminhos da saída de `git diff --name-status -z`."""
+    fields = output.split("\0")
+    paths = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        # Renomeações e cópias trazem o caminho de origem e o de destino
+        count = 2 if status[0] in "RC" else 1
+        paths.extend(fields[i + 1:i + 1 + count])
+        i += 1 + count
+    return paths
+
+
+def _parse_porcelain(output: str) -> List[str]:
+    """Extrai os caminhos da saída de `git status --porcelain -z`."""
+    fields = output.split("\0")
+    paths = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        entry = fields[i]
+        paths.append(entry[3:])
+        # Em renomeações o caminho de origem vem no campo seguinte
+        if entry[0] in "RC":
+            paths.append(fields[i + 1])
+            i += 1
+        i += 1
+    return paths
+
+
+def _pathspec(repository: Path, directory: Path) -> Optional[str]:
+    """Caminho do diretório relativo à raiz do repositório (None se estiver fora dele)."""
+    try:
+        return Path(directory).resolve().relative_to(repository).as_posix() or "."
+    except ValueError:
+        return None
+
+
+def _markdown_paths(repository: Path, relatives: List[str]) -> List[str]:
+    """Converte caminhos relativos à raiz em caminhos absolutos, mantendo apenas markdown."""
+    return sorted({str((repository / relative).resolve()) for relative in relatives if relative.endswith(".md")})
+
+
+def working_tree_markdown_files(repository: Path, directory: Path) -> Optional[List[str]]:
+    """
+    Lista os arquivos markdown de `directory` modificados, adicionados, removidos ou
+    não versionados na árvore de trabalho.
+
+    Args:
+        repository: Raiz do repositório
+        directory: Diretório de documentos (dentro do repositório)
+
+    Returns:
+        Lista ordenada de caminhos absolutos, ou None se o git falhar
+    """
+    pathspec = _pathspec(repository, directory)
+    if pathspec is None:
+        return None
+    output = _git(repository, "status", "--porcelain", "-z", "--untracked-files=all", "--", pathspec)
+    return _markdown_paths(repository, _parse_porcelain(output)) if output is not None else None
+
+
+def changed_markdown_files(repository: Path, since_commit: str, directory: Path) -> Optional[List[str]]:
+    """
+    Lista os arquivos markdown de `directory` alterados desde um commit.
+
+    Inclui os arquivos alterados entre `since_commit` e o HEAD e os arquivos
+    modificados, adicionados, removidos ou não versionados da árvore de trabalho.
+
+    Args:
+        repository: Raiz do repositório
+        since_commit: Último commit indexado
+        directory: Diretório de documentos (dentro do repositório)
+
+    Returns:
+        Lista ordenada de caminhos absolutos, ou None se o git não conseguir comparar
+        (ex: commit inexistente após um rebase)
+    """
+    pathspec = _pathspec(repository, directory)
+    if pathspec is None:
+        return None
+    committed = _git(repository, "diff", "--name-status", "-z", since_commit, "HEAD", "--", pathspec)
+    working_tree = working_tree_markdown_files(repository, directory)
+    if committed is None or working_tree is None:
+        return None
+    return sorted(set(_markdown_paths(repository, _parse_name_status(committed))) | set(working_tree))
@@ -0,0 +1,456 @@
+"""
+Executor dedicado às atualizações do índice.
+
+As solicitações de atualização (do monitoramento de arquivos, da API ou da CLI) são
+enfileiradas e executadas por uma única thread consumidora, de modo que quem as
+solicita nunca fica bloqueado por uma reconstrução. Solicitações pendentes são
+mescladas em um único trabalho, e uma reconstrução completa mais recente interrompe
+o trabalho em andamento.
+
+As construções rodam em uma faixa de prioridade baixa (BuildThrottle): o trabalho é
+dividido em lotes pequenos, e entre um lote e outro a construção espera as consultas
+em andamento terminarem, opcionalmente faz uma pausa e pode ter a prioridade da thread
+reduzida (nice) e o número de threads do embedding limitado.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Acima desta quantidade de arquivos pendentes, o trabalho vira uma reconstrução completa
+DEFAULT_MAX_PENDING_PATHS = 10000
+
+# Quantidade padrão de chunks embutidos e inseridos por lote na construção do índice
+DEFAULT_BUILD_BATCH_SIZE = 64
+
+# Tempo máximo padrão (segundos) que um lote espera as consultas em andamento terminarem
+DEFAULT_QUERY_WAIT = 0.5
+
+
+class IndexingCancelled(Exception):
+    """A construção do índice foi interrompida antes de terminar."""
+
+
+class IndexingJob:
+    """
+    Acompanhamento de uma reconstrução solicitada ao executor.
+
+    Solicitações mescladas em um mesmo trabalho recebem o resultado desse trabalho;
+    se ele for interrompido por uma reconstrução mais recente, recebem o resultado
+    da que o substituiu.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+    def done(self) -> bool:
+        """Indica se o trabalho já terminou."""
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Aguarda o fim do trabalho.
+
+        Args:
+            timeout: Tempo máximo de espera em segundos
+
+        Returns:
+            Estatísticas da execução (mesmo formato de `stats["last_run"]`), ou None
+            se o tempo limite foi atingido
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def _resolve(self, result: Dict[str, Any]) -> None:
+        self.result = result
+        self._done.set()
+
+
+class BuildThrottle:
+    """
+    Faixa de prioridade baixa para a construção do índice.
+
+    As consultas marcam seu trecho mais pesado (embedding da consulta e busca) com
+    `query()`; a construção chama `checkpoint()` entre os lotes e, enquanto houver
+    consultas em andamento, espera (até `query_wait` segundos) antes de continuar.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BUILD_BATCH_SIZE, pause: float = 0.0,
+                 query_wait: float = DEFAULT_QUERY_WAIT, nice: int = 0, threads: int = 0):
+        """
+        Inicializa a faixa de prioridade.
+
+        Args:
+            batch_size: Chunks por lote na construção completa (na atualização
+                incremental, cada arquivo é um lote)
+            pause: Pausa em segundos após cada lote, limitando o uso de CPU da construção
+            query_wait: Tempo máximo de espera pelas consultas em andamento a cada lote
+            nice: Incremento de niceness aplicado à thread de indexação (0 mantém)
+            threads: Threads do PyTorch durante a construção (0 mantém o padrão)
+        """
+        self.batch_size = max(batch_size, 1)
+        self.pause = pause
+        self.query_wait = query_wait
+        self.nice = nice
+        self.threads = threads
+        self._active_queries = 0
+        self._condition = threading.Condition()
+        self.stats = {"checkpoints": 0, "yields": 0, "yield_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "BuildThrottle":
+        """
+        Cria a faixa a partir das variáveis de ambiente.
+
+        Variáveis: CONTEXT_GUIDE_INDEX_BATCH_SIZE, CONTEXT_GUIDE_INDEX_PAUSE,
+        CONTEXT_GUIDE_INDEX_QUERY_WAIT, CONTEXT_GUIDE_INDEX_NICE e
+        CONTEXT_GUIDE_INDEX_THREADS.
+        """
+        return cls(
+            batch_size=int(os.environ.get("CONTEXT_GUIDE_INDEX_BATCH_SIZE", DEFAULT_BUILD_BATCH_SIZE)),
+            pause=float(os.environ.get("CONTEXT_GUIDE_INDEX_PAUSE", "0")),
+            query_wait=float(os.environ.get("CONTEXT_GUIDE_INDEX_QUERY_WAIT", DEFAULT_QUERY_WAIT)),
+            nice=int(os.environ.get("CONTEXT_GUIDE_INDEX_NICE", "0")),
+            threads=int(os.environ.get("CONTEXT_GUIDE_INDEX_THREADS", "0")),
+        )
+
+    @contextmanager
+    def query(self) -> Iterator[None]:
+        """Marca uma consulta em andamento, que tem precedência sobre a construção."""
+        with self._condition:
+            self._active_queries += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active_queries -= 1
+                if not self._active_queries:
+                    self._condition.notify_all()
+
+    def checkpoint(self) -> None:
+        """Cede a vez às consultas entre dois lotes da construção."""
+        start = time.perf_counter()
+        with self._condition:
+            self.stats["checkpoints"] += 1
+            if self._active_queries:
+                self.stats["yields"] += 1
+                self._condition.wait_for(lambda: not self._active_queries, self.query_wait)
+        if self.pause > 0:
+            time.sleep(self.pause)
+        self.stats["yield_seconds"] += time.perf_counter() - start
+
+    def lower_thread_priority(self) -> None:
+        """Aplica o incremento de niceness à thread atual (Linux; ignorado se não suportado)."""
+        if self.nice <= 0:
+            return
+        try:
+            # No Linux, setpriority com o id nativo da thread afeta apenas essa thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(),
+                           os.getpriority(os.PRIO_PROCESS, threading.get_native_id()) + self.nice)
+            logger.info(f"Prioridade da thread de indexação reduzida (nice +{self.nice})")
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Não foi possível reduzir a prioridade da thread de indexação: {e}")
+
+    @contextmanager
+    def limited_threads(self) -> Iterator[None]:
+        """
+        Limita as threads do PyTorch (usado pelos modelos de embedding locais) durante o bloco.
+
+        O limite vale para o processo inteiro; as consultas feitas durante a construção
+        também o respeitam, o que é aceitável porque embutem um único texto curto.
+        """
+        torch = sys.modules.get("torch")
+        if self.threads <= 0 or torch is None:
+            yield
+            return
+        previous = torch.get_num_threads()
+        torch.set_num_threads(self.threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+
+    def status(self) -> Dict[str, Any]:
+        """Retorna a configuração e os contadores para monitoramento."""
+        with self._condition:
+            active = self._active_queries
+        return {
+            "batch_size": self.batch_size,
+            "pause": self.pause,
+            "query_wait": self.query_wait,
+            "nice": self.nice,
+            "threads": self.threads,
+            "active_queries": active,
+            **self.stats,
+        }
+
+
+class IndexingExecutor:
+    """Executa atualizações do índice em uma única thread consumidora."""
+
+    def __init__(self, context_manager: Any, max_pending_paths: int = DEFAULT_MAX_PENDING_PATHS,
+                 on_complete: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Inicializa o executor e sua thread consumidora.
+
+        Args:
+            context_manager: ContextManager cujo índice será atualizado
+            max_pending_paths: Limite de arquivos pendentes; ao ser excedido, os
+                arquivos são descartados em favor de uma reconstrução completa
+            on_complete: Função chamada com as estatísticas de cada execução
+        """
+        self.context_manager = context_manager
+        self.max_pending_paths = max_pending_paths
+        self.on_complete = on_complete
+
+        self._pending_paths: Set[str] = set()
+        self._pending_full = False
+        self._pending_jobs: List[IndexingJob] = []
+        self._running: Optional[Dict[str, Any]] = None
+        self._cancel = threading.Event()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        self.stats = {
+            "submitted": 0,
+            "runs": 0,
+            "merged": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "last_run": None,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="context-guide-indexing", daemon=True)
+        self._thread.start()
+
+    def submit_paths(self, paths: Iterable[str]) -> None:
+        """
+        Solicita a atualização do índice para arquivos alterados.
+
+        Args:
+            paths: Caminhos dos arquivos criados, alterados ou removidos
+        """
+        with self._condition:
+            self.stats["submitted"] += 1
+            if self._has_pending():
+                self.stats["merged"] += 1
+            if not self._pending_full:
+                self._pending_paths.update(str(path) for path in paths)
+                if len(self._pending_paths) > self.max_pending_paths:
+                    logger.info(f"Mais de {self.max_pending_paths} arquivos pendentes; agendando reconstrução completa")
+                    self._pending_paths.clear()
+                    self._pending_full = True
+            self._condition.notify()
+
+    def submit_full_rebuild(self, preempt: bool = True) -> IndexingJob:
+        """
+        Solicita a reconstrução completa do índice.
+
+        Args:
+            preempt: Se deve interromper o trabalho em andamento, que será substituído
+                pela reconstrução completa
+
+        Returns:
+            IndexingJob para aguardar o resultado da reconstrução
+        """
+        with self._condition:
+            self.stats["submitted"] += 1
+            if self._has_pending():
+                self.stats["merged"] += 1
+            # A reconstrução completa inclui qualquer atualização pendente
+            self._pending_paths.clear()
+            self._pending_full = True
+            job = IndexingJob()
+            self._pending_jobs.append(job)
+            if preempt and self._running is not None:
+                logger.info("Interrompendo a atualização em andamento em favor de uma reconstrução completa")
+                self._cancel.set()
+            self._condition.notify()
+            return job
+
+    def reconcile(self) -> Optional[int]:
+        """
+        Agenda a aplicação das alterações feitas nos documentos enquanto o índice
+        não estava sendo monitorado (ex: com o servidor parado).
+        
+        Sem manifesto (índice criado por uma versão anterior), agenda uma reconstrução
+        completa. Em ambos os casos o índice existente continua sendo consultado
+        enquanto a atualização roda em segundo plano.
+        
+        Returns:
+            Quantidade de arquivos alterados agendados, ou None se uma reconstrução
+            completa foi agendada
+        """
+        changes = self.context_manager.detect_offline_changes()
+        if changes is None:
+            logger.info("Índice sem manifesto; agendando reconstrução completa em segundo plano")
+            self.submit_full_rebuild(preempt=False)
+            return None
+        if changes:
+            logger.info(f"{len(changes)} documento(s) alterado(s) desde a última indexação; atualizando em segundo plano")
+            self.submit_paths(changes)
+        return len(changes)
+    
+    def cancel(self) -> None:
+        """Descarta o trabalho pendente e interrompe o trabalho em andamento."""
+        with self._condition:
+            self._pending_paths.clear()
+            self._pending_full = False
+            self._resolve_pending("cancelled")
+            if self._running is not None:
+                self._cancel.set()
+
+    def _has_pending(self) -> bool:
+        """Indica se há trabalho aguardando execução (chamado com o lock adquirido)."""
+        return self._pending_full or bool(self._pending_paths)
+
+    def _resolve_pending(self, status: str) -> None:
+        """Conclui as solicitações pendentes que não serão executadas (chamado com o lock adquirido)."""
+        result = {"kind": "full", "paths": 0, "status": status, "error": None, "seconds": 0.0,
+                  "finished_at": time.time()}
+        for job in self._pending_jobs:
+            job._resolve(result)
+        self._pending_jobs = []
+
+    def _run(self) -> None:
+        """Laço da thread consumidora."""
+        throttle = getattr(self.context_manager, "build_throttle", None)
+        if isinstance(throttle, BuildThrottle):
+            throttle.lower_thread_priority()
+        while True:
+            with self._condition:
+                while not self._stopped and not self._has_pending():
+                    self._condition.wait()
+                if self._stopped:
+                    self._resolve_pending("cancelled")
+                    return
+                job = {
+                    "kind": "full" if self._pending_full else "paths",
+                    "files": sorted(self._pending_paths),
+                    "paths": len(self._pending_paths),
+                    "started_at": time.time(),
+                    "progress": {"done": 0, "total": 0},
+                    "jobs": self._pending_jobs,
+                }
+                self._pending_jobs = []
+                self._pending_paths.clear()
+                self._pending_full = False
+                self._cancel.clear()
+                self._running = job
+
+            last_run = self._execute(job)
+
+            with self._condition:
+                self._running = None
+                if last_run["status"] == "cancelled" and self._pending_full:
+                    # Interrompido por uma reconstrução mais recente: quem aguardava este
+                    # trabalho recebe o resultado da que o substitui
+                    self._pending_jobs.extend(job["jobs"])
+                else:
+                    for waiting in job["jobs"]:
+                        waiting._resolve(last_run)
+                self._condition.notify_all()
+
+    def _execute(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Executa um trabalho, registra e retorna suas estatísticas."""
+        def progress(done: int, total: int) -> None:
+            job["progress"] = {"done": done, "total": total}
+
+        logger.info(f"Iniciando atualização do índice ({job['kind']}, {job['paths']} arquivos)")
+        start_time = time.perf_counter()
+        status, error = "success", None
+        throttle = getattr(self.context_manager, "build_throttle", None)
+        try:
+            with throttle.limited_threads() if isinstance(throttle, BuildThrottle) else nullcontext():
+                if job["kind"] == "full":
+                    self.context_manager.update_index(should_stop=self._cancel.is_set, progress=progress)
+                else:
+                    self.context_manager.update_documents(job["files"], should_stop=self._cancel.is_set,
+                                                          progress=progress)
+        except IndexingCancelled:
+            status = "cancelled"
+            self.stats["cancelled"] += 1
+        except Exception as e:
+            logger.error(f"Erro ao atualizar índice: {e}")
+            status, error = "error", str(e)
+            self.stats["failed"] += 1
+
+        last_run = {
+            "kind": job["kind"],
+            "paths": job["paths"],
+            "status": status,
+            "error": error,
+            "seconds": time.perf_counter() - start_time,
+            "finished_at": time.time(),
+        }
+        self.stats["runs"] += 1
+        self.stats["last_run"] = last_run
+        logger.info(f"Atualização do índice {status} em {last_run['seconds']:.2f}s")
+
+        if self.on_complete:
+            try:
+                self.on_complete(last_run)
+            except Exception as e:
+                logger.error(f"Erro no callback de conclusão da indexação: {e}")
+        return last_run
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retorna o estado do executor para monitoramento.
+
+        Returns:
+            Dicionário com profundidade da fila, trabalho em andamento e estatísticas
+        """
+        with self._condition:
+            running = None
+            if self._running is not None:
+                running = {
+                    "kind": self._running["kind"],
+                    "paths": self._running["paths"],
+                    "seconds": time.time() - self._running["started_at"],
+                    "progress": dict(self._running["progress"]),
+                }
+            throttle = getattr(self.context_manager, "build_throttle", None)
+            return {
+                "throttle": throttle.status() if isinstance(throttle, BuildThrottle) else None,
+                "queue_depth": len(self._pending_paths) + (1 if self._pending_full else 0),
+                "pending_full_rebuild": self._pending_full,
+                "running": running,
+                **self.stats,
+            }
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda até não haver trabalho pendente nem em andamento.
+
+        Args:
+            timeout: Tempo máximo de espera em segundos
+
+        Returns:
+            True se o executor ficou ocioso dentro do tempo limite
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._running is None and not self._has_pending(), timeout
+            )
+
+    def stop(self, cancel: bool = True) -> None:
+        """
+        Encerra a thread consumidora.
+
+        Args:
+            cancel: Se deve interromper o trabalho em andamento em vez de aguardá-lo
+        """
+        with self._condition:
+            self._stopped = True
+            if cancel and self._running is not None:
+                self._cancel.set()
+            self._condition.notify_all()
+        self._thread.join()
@@ -0,0 +1,257 @@
+"""
+Controle de admissão das requisições do servidor MCP.
+
+Cada endpoint controlado tem um limite de requisições em execução e uma fila de
+espera limitada. Quando ambos estão cheios, ou quando uma requisição espera na fila
+mais que o tempo máximo, ela é rejeitada imediatamente com 429 e um cabeçalho
+Retry-After estimado a partir do tempo de atendimento recente, em vez de aumentar a
+latência de todas as outras.
+
+Os limites são configurados pela variável CONTEXT_GUIDE_ADMISSION, com entradas
+"caminho=limite:fila" separadas por vírgula (ex: "/context=16:64,/prompt=4:16");
+"off" desativa o controle. O tempo máximo de espera na fila vem de
+CONTEXT_GUIDE_ADMISSION_TIMEOUT (segundos).
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from context_guide.mcp_server.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Limites padrão por endpoint: (requisições em execução, requisições na fila)
+DEFAULT_LIMITS = {
+    "/context": (16, 64),
+    "/prompt": (4, 16),
+    "/prompt/stream": (4, 16),
+    "/prompt/send": (4, 16),
+}
+
+# Tempo máximo padrão de espera na fila (segundos)
+DEFAULT_QUEUE_TIMEOUT = 5.0
+
+# Peso da última requisição na média móvel do tempo de atendimento
+_SERVICE_TIME_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """A requisição não foi admitida (fila cheia ou tempo de espera esgotado)."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(f"Requisição para {endpoint} rejeitada ({reason})")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Converte a configuração de limites em limites por endpoint.
+
+    Args:
+        spec: Entradas "caminho=limite:fila" separadas por vírgula; "off" desativa
+
+    Returns:
+        Dicionário caminho -> (limite de execução, tamanho da fila)
+
+    Raises:
+        ValueError: Se alguma entrada for inválida
+    """
+    spec = spec.strip()
+    if spec.lower() in ("off", "0", "false"):
+        return {}
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        path, separator, values = item.partition("=")
+        concurrency, _, queue = values.partition(":")
+        try:
+            limit = (int(concurrency), int(queue or 0))
+        except ValueError:
+            raise ValueError(f"Limite de admissão inválido: '{item}' (use caminho=limite:fila)")
+        if not separator or not path.strip().startswith("/") or limit[0] < 1 or limit[1] < 0:
+            raise ValueError(f"Limite de admissão inválido: '{item}' (use caminho=limite:fila)")
+        limits[path.strip()] = limit
+    return limits
+
+
+class _Lane:
+    """Estado de admissão de um endpoint."""
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiters: Deque["asyncio.Future[bool]"] = deque()
+        self.service_time = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    def release(self) -> None:
+        """Libera uma vaga, entregando-a diretamente ao primeiro da fila."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def observe(self, seconds: float) -> None:
+        """Atualiza a média móvel do tempo de atendimento."""
+        if self.service_time == 0.0:
+            self.service_time = seconds
+        else:
+            self.service_time += _SERVICE_TIME_SMOOTHING * (seconds - self.service_time)
+
+    def retry_after(self) -> int:
+        """Estimativa, em segundos inteiros, de quando haverá vaga."""
+        pending = len(self.waiters) + 1
+        return max(1, math.ceil(self.service_time * pending / self.max_concurrent))
+
+
+class AdmissionController:
+    """Limita as requisições em execução e em espera de cada endpoint."""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        """
+        Inicializa o controlador.
+
+        Args:
+            limits: Dicionário caminho -> (limite de execução, tamanho da fila)
+                (padrão: DEFAULT_LIMITS); caminhos ausentes não são controlados
+            queue_timeout: Tempo máximo de espera na fila em segundos
+        """
+        limits = DEFAULT_LIMITS if limits is None else limits
+        self.queue_timeout = queue_timeout
+        self._lanes = {path: _Lane(*limit) for path, limit in limits.items()}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Cria o controlador a partir de CONTEXT_GUIDE_ADMISSION e CONTEXT_GUIDE_ADMISSION_TIMEOUT."""
+        spec = os.environ.get("CONTEXT_GUIDE_ADMISSION")
+        limits = parse_limits(spec) if spec is not None else None
+        timeout = float(os.environ.get("CONTEXT_GUIDE_ADMISSION_TIMEOUT", DEFAULT_QUEUE_TIMEOUT))
+        return cls(limits, queue_timeout=timeout)
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se algum endpoint é controlado."""
+        return bool(self._lanes)
+
+    def controls(self, path: str) -> bool:
+        """Indica se o caminho tem limite de admissão."""
+        return path in self._lanes
+
+    @asynccontextmanager
+    async def admit(self, path: str) -> AsyncIterator[None]:
+        """
+        Ocupa uma vaga do endpoint durante o bloco, aguardando na fila se necessário.
+
+        Args:
+            path: Caminho do endpoint
+
+        Raises:
+            AdmissionRejected: Se a fila estiver cheia ou a espera exceder o tempo máximo
+        """
+        lane = self._lanes.get(path)
+        if lane is None:
+            yield
+            return
+
+        await self._acquire(path, lane)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            lane.observe(time.perf_counter() - start)
+            lane.release()
+
+    async def _acquire(self, path: str, lane: _Lane) -> None:
+        """Obtém uma vaga, diretamente ou pela fila."""
+        if lane.active < lane.max_concurrent and not lane.waiters:
+            lane.active += 1
+            lane.stats["admitted"] += 1
+            return
+        if len(lane.waiters) >= lane.max_queue:
+            lane.stats["rejected_queue_full"] += 1
+            raise AdmissionRejected(path, "queue_full", lane.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        lane.stats["queued"] += 1
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Cliente desconectado enquanto esperava: devolve a vaga se já a tinha recebido
+            if waiter.done() and not waiter.cancelled():
+                lane.release()
+            else:
+                waiter.cancel()
+                lane.waiters.remove(waiter)
+            raise
+        if not done:
+            waiter.cancel()
+            lane.waiters.remove(waiter)
+            lane.stats["rejected_timeout"] += 1
+            raise AdmissionRejected(path, "timeout", lane.retry_after())
+        # A vaga foi transferida por quem a liberou; `active` não muda
+        lane.stats["admitted"] += 1
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna o estado de cada endpoint controlado para monitoramento.
+
+        Returns:
+            Dicionário caminho -> limites, ocupação, fila, tempo médio e contadores
+        """
+        return {
+            path: {
+                "max_concurrent": lane.max_concurrent,
+                "max_queue": lane.max_queue,
+                "active": lane.active,
+                "queue_depth": len(lane.waiters),
+                "avg_service_time": lane.service_time,
+                **lane.stats,
+            }
+            for path, lane in self._lanes.items()
+        }
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica o controle de admissão pelo caminho da requisição."""
+
+    def __init__(self, app: Any, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not self.controller.controls(path):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with self.controller.admit(path):
+                await self.app(scope, receive, send)
+        except AdmissionRejected as e:
+            logger.warning(f"{e}; Retry-After: {e.retry_after}s")
+            body = dumps({"detail": "Servidor sobrecarregado, tente novamente mais tarde",
+                          "reason": e.reason})
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", str(e.retry_after).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
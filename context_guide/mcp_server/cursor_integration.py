@@ -3,14 +3,26 @@ Módulo para integração com o Cursor IDE via MCP.
 Fornece funções para enviar contexto diretamente para o Cursor IDE.
 """
 
+import asyncio
 import logging
 import json
 import os
+import random
 import time
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Optional, Iterator, Tuple
 from pathlib import Path
 import requests
 
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from context_guide.cache import LRUCache
+# Reexportados para compatibilidade: definidos em context_guide.technologies
+from context_guide.technologies import TECH_CONTEXTS, technology_context
+
 # Configuração de logging
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 log_level = os.environ.get('CONTEXT_GUIDE_LOG_LEVEL', 'INFO')
@@ -23,84 +35,78 @@ if log_file:
 logging.basicConfig(level=getattr(logging, log_level), format=log_format, handlers=handlers)
 logger = logging.getLogger(__name__)
 
-# Tecnologias suportadas e seus contextos especiais
-TECH_CONTEXTS = {
-    "react": {
-        "description": "Biblioteca JavaScript para construção de interfaces de usuário",
-        "common_patterns": ["componentes funcionais", "hooks", "props", "estado", "contexto"],
-        "best_practices": [
-            "Utilizar componentes funcionais com hooks",
-            "Evitar renderizações desnecessárias",
-            "Separar lógica de UI da lógica de negócios",
-            "Utilizar gerenciamento de estado apropriado para o tamanho da aplicação"
-        ]
-    },
-    "node": {
-        "description": "Ambiente de execução JavaScript do lado do servidor",
-        "common_patterns": ["middleware", "rotas", "controladores", "modelos", "serviços"],
-        "best_practices": [
-            "Organizar o código em camadas (controllers, services, models)",
-            "Usar async/await para operações assíncronas",
-            "Implementar tratamento de erros centralizado",
-            "Validar entradas e sanitizar saídas"
-        ]
-    },
-    "django": {
-        "description": "Framework web Python de alto nível",
-        "common_patterns": ["views", "models", "templates", "forms", "admin"],
-        "best_practices": [
-            "Seguir o padrão MVT (Model-View-Template)",
-            "Utilizar ORM para abstração do banco de dados",
-            "Manter views pequenas e focadas",
-            "Usar Django REST Framework para APIs"
-        ]
-    },
-    "flask": {
-        "description": "Microframework web Python",
-        "common_patterns": ["rotas", "blueprints", "extensões", "contexto"],
-        "best_practices": [
-            "Estruturar aplicação com blueprints para escalabilidade",
-            "Usar extensões para funcionalidades comuns",
-            "Centralizar configuração",
-            "Implementar padrão de fábrica de aplicação"
-        ]
-    },
-    "vue": {
-        "description": "Framework JavaScript progressivo para UIs",
-        "common_patterns": ["componentes", "diretivas", "props", "emits", "composition API"],
-        "best_practices": [
-            "Utilizar Single-File Components",
-            "Preferir Composition API para componentes complexos",
-            "Organizar código por funcionalidade em vez de tipo",
-            "Utilizar Pinia para gerenciamento de estado"
-        ]
-    },
-    "spring": {
-        "description": "Framework Java para desenvolvimento de aplicações",
-        "common_patterns": ["controladores", "serviços", "repositórios", "entidades", "DTOs"],
-        "best_practices": [
-            "Seguir arquitetura em camadas",
-            "Usar injeção de dependências",
-            "Implementar testes de unidade e integração",
-            "Utilizar Spring Data para acesso a dados"
-        ]
+# Quantidade padrão de respostas do servidor MCP mantidas para revalidação
+DEFAULT_RESPONSE_CACHE_SIZE = 128
+
+# Configuração padrão do cliente assíncrono
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_CONCURRENCY = 10
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.25
+DEFAULT_MAX_BACKOFF = 5.0
+
+# Respostas que indicam sobrecarga ou indisponibilidade temporária
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+# Para requisições não idempotentes, apenas respostas que garantem que o pedido não foi
+# processado; um 502/504 ou timeout de leitura pode chegar depois de o servidor executá-lo
+NON_IDEMPOTENT_RETRY_STATUS_CODES = frozenset({429, 503})
+
+
+def _cursor_message(api_base: str, context: str, file_path: Optional[str],
+                    conversation_id: Optional[str], technology: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """Monta a URL e o payload de uma mensagem de contexto para a API do Cursor."""
+    # Enriquecer contexto com informações específicas da tecnologia
+    tech_context = technology_context(technology)
+    if tech_context:
+        logger.info(f"Contexto enriquecido com informações específicas de {technology}")
+    
+    payload = {
+        "content": context + tech_context,
+        "role": "system"
     }
-}
+    if file_path:
+        payload["file_path"] = str(Path(file_path).absolute())
+    
+    url = f"{api_base}/chat/message"
+    if conversation_id:
+        url = f"{url}?conversation_id={conversation_id}"
+    return url, payload
+
+
+
+def _send_payload(user_request: str, technology: Optional[str], include_best_practices: bool,
+                  file_path: Optional[str], conversation_id: Optional[str]) -> Dict[str, Any]:
+    """Monta o payload do endpoint `/prompt/send`."""
+    payload = {"request": user_request, "include_best_practices": include_best_practices}
+    if technology:
+        payload["technology_context"] = technology
+    if file_path:
+        payload["file_path"] = str(Path(file_path).absolute())
+    if conversation_id:
+        payload["conversation_id"] = conversation_id
+    return payload
 
 class CursorIntegration:
     """Classe para interagir com o Cursor IDE via MCP."""
     
-    def __init__(self, mcp_url: str = "http://localhost:8000"):
+    def __init__(self, mcp_url: str = "http://localhost:8000",
+                 cache_size: int = DEFAULT_RESPONSE_CACHE_SIZE):
         """
         Inicializa a integração com o Cursor.
         
         Args:
             mcp_url: URL base para o servidor MCP
+            cache_size: Quantidade de respostas de `/context` e `/prompt` mantidas
+                localmente e revalidadas com ETag (0 desativa)
         """
         self.mcp_url = mcp_url
         self.token = os.environ.get("CURSOR_API_TOKEN", "")
         self.api_base = "https://api.cursor.sh/v1"
         self.session = requests.Session()
+        self.response_cache = LRUCache(max_entries=cache_size)
+        self.cache_stats = {"not_modified": 0, "downloaded": 0}
         
         # Configurar cabeçalhos padrão
         if self.token:
@@ -115,6 +121,41 @@ class CursorIntegration:
                 "Visite https://cursor.sh/docs/api-tokens para obter seu token."
             )
     
+    def _post_revalidated(self, url: str, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        """
+        Envia um POST ao servidor MCP reaproveitando a resposta anterior se não mudou.
+        
+        A última resposta de cada URL e payload é guardada com seu ETag, enviado em
+        If-None-Match na próxima chamada idêntica; com 304, a cópia local é usada e
+        o corpo não é transferido nem decodificado novamente.
+        
+        Args:
+            url: URL do endpoint
+            payload: Corpo JSON da requisição
+            
+        Returns:
+            Tupla (status HTTP, JSON da resposta se 200 ou texto do erro)
+        """
+        key = (url, json.dumps(payload, sort_keys=True))
+        cached = self.response_cache.get(key) if self.response_cache.enabled else None
+        if cached:
+            response = self.session.post(url, json=payload, headers={"If-None-Match": cached[0]})
+        else:
+            response = self.session.post(url, json=payload)
+        
+        if response.status_code == 304 and cached:
+            self.cache_stats["not_modified"] += 1
+            return 200, dict(cached[1])
+        if response.status_code != 200:
+            return response.status_code, response.text
+        
+        data = response.json()
+        self.cache_stats["downloaded"] += 1
+        etag = response.headers.get("ETag")
+        if etag:
+            self.response_cache.put(key, (etag, data))
+        return 200, dict(data)
+    
     def send_context_to_cursor(self, 
                               context: str, 
                               file_path: Optional[str] = None, 
@@ -136,34 +177,7 @@ class CursorIntegration:
             logger.error("Token de API do Cursor não configurado")
             return False
         
-        # Enriquecer contexto com informações específicas da tecnologia
-        enhanced_context = context
-        if technology and technology.lower() in TECH_CONTEXTS:
-            tech_info = TECH_CONTEXTS[technology.lower()]
-            tech_context = f"\n\n## Contexto Específico: {technology}\n"
-            tech_context += f"- {tech_info['description']}\n"
-            tech_context += "- Padrões comuns: " + ", ".join(tech_info['common_patterns']) + "\n"
-            tech_context += "- Melhores práticas:\n"
-            for practice in tech_info['best_practices']:
-                tech_context += f"  - {practice}\n"
-            
-            enhanced_context = context + tech_context
-            logger.info(f"Contexto enriquecido com informações específicas de {technology}")
-        
-        # Preparar payload
-        payload = {
-            "content": enhanced_context,
-            "role": "system"
-        }
-        
-        # Adicionar file_path se fornecido
-        if file_path:
-            payload["file_path"] = str(Path(file_path).absolute())
-        
-        # Adicionar conversation_id se fornecido
-        url = f"{self.api_base}/chat/message"
-        if conversation_id:
-            url = f"{url}?conversation_id={conversation_id}"
+        url, payload = _cursor_message(self.api_base, context, file_path, conversation_id, technology)
         
         try:
             start_time = time.time()
@@ -209,14 +223,13 @@ class CursorIntegration:
                 logger.info(f"Consultando contexto para '{query}'")
             
             start_time = time.time()
-            response = self.session.post(url, json=payload)
+            status_code, result = self._post_revalidated(url, payload)
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
                 logger.info(f"Contexto obtido em {time.time() - start_time:.4f}s com {len(result.get('sources', []))} fontes")
                 return result
             else:
-                logger.error(f"Falha ao obter contexto: {response.status_code} - {response.text}")
+                logger.error(f"Falha ao obter contexto: {status_code} - {result}")
                 return {"context": "", "sources": []}
                 
         except Exception as e:
@@ -252,15 +265,13 @@ class CursorIntegration:
             else:
                 logger.info(f"Gerando prompt para '{user_request}'")
             
-            start_time = time.time()
-            response = self.session.post(url, json=payload)
+            status_code, prompt_data = self._post_revalidated(url, payload)
             
-            if response.status_code != 200:
-                logger.error(f"Falha ao gerar prompt: {response.status_code} - {response.text}")
+            if status_code != 200:
+                logger.error(f"Falha ao gerar prompt: {status_code} - {prompt_data}")
                 return False
             
             # Extrair prompt formatado
-            prompt_data = response.json()
             formatted_prompt = prompt_data.get("prompt", "")
             generation_time = prompt_data.get("generation_time", 0)
             
@@ -270,13 +281,96 @@ class CursorIntegration:
             
             logger.info(f"Prompt gerado em {generation_time}s, enviando para o Cursor IDE")
             
-            # Enviar para o Cursor
-            return self.send_context_to_cursor(formatted_prompt, technology=technology)
+            # Enviar para o Cursor (o prompt já traz a seção da tecnologia)
+            return self.send_context_to_cursor(formatted_prompt)
                 
         except Exception as e:
             logger.error(f"Erro ao melhorar prompt para o Cursor: {e}")
             return False
     
+    def send_prompt_to_cursor(self,
+                              user_request: str,
+                              technology: Optional[str] = None,
+                              include_best_practices: bool = True,
+                              file_path: Optional[str] = None,
+                              conversation_id: Optional[str] = None) -> bool:
+        """
+        Melhora o prompt do usuário e o envia ao Cursor em uma única requisição.
+        
+        Usa o endpoint `/prompt/send`: o servidor gera o prompt, o enriquece com as
+        informações da tecnologia e o encaminha ao Cursor em segundo plano, com o token
+        configurado no servidor. Equivale a `enhance_cursor_prompt` com metade das
+        idas e voltas.
+        
+        Args:
+            user_request: A solicitação do usuário
+            technology: Tecnologia específica para ajustar o contexto
+            include_best_practices: Se deve incluir melhores práticas no prompt
+            file_path: Caminho do arquivo em foco (opcional)
+            conversation_id: ID da conversa no Cursor (opcional)
+            
+        Returns:
+            bool: True se o servidor aceitou o encaminhamento, False caso contrário
+        """
+        try:
+            payload = _send_payload(user_request, technology, include_best_practices, file_path, conversation_id)
+            response = self.session.post(f"{self.mcp_url}/prompt/send", json=payload)
+            
+            if response.status_code == 202:
+                logger.info(f"Prompt com {response.json().get('prompt_chars', 0)} caracteres agendado para o Cursor IDE")
+                return True
+            logger.error(f"Falha ao encaminhar prompt: {response.status_code} - {response.text}")
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao encaminhar prompt para o Cursor: {e}")
+            return False
+    
+    def stream_prompt(self,
+                      user_request: str,
+                      technology: Optional[str] = None,
+                      include_best_practices: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Gera um prompt com contexto recebendo suas partes à medida que ficam prontas.
+        
+        Consome o endpoint `/prompt/stream` (Server-Sent Events), permitindo exibir o
+        cabeçalho e cada seção de contexto antes de o prompt estar completo.
+        
+        Args:
+            user_request: A solicitação do usuário
+            technology: Tecnologia específica para ajustar o contexto
+            include_best_practices: Se deve incluir melhores práticas no prompt
+            
+        Yields:
+            Dicionários com "event" e os dados do evento (ex: "text" nas partes do prompt)
+        """
+        url = f"{self.mcp_url}/prompt/stream"
+        payload = {
+            "request": user_request,
+            "include_best_practices": include_best_practices
+        }
+        if technology:
+            payload["technology_context"] = technology
+        
+        with self.session.post(url, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                logger.error(f"Falha ao gerar prompt em streaming: {response.status_code} - {response.text}")
+                return
+            
+            event, data_lines = None, []
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    field, _, value = line.partition(":")
+                    if field == "event":
+                        event = value.strip()
+                    elif field == "data":
+                        data_lines.append(value[1:] if value.startswith(" ") else value)
+                    continue
+                
+                # Linha em branco encerra o evento
+                if event and data_lines:
+                    yield {"event": event, **json.loads("\n".join(data_lines))}
+                event, data_lines = None, []
+    
     def update_index(self) -> bool:
         """
         Solicita atualização do índice de documentos no servidor MCP.
@@ -354,4 +448,402 @@ class CursorIntegration:
                 
         except Exception as e:
             logger.error(f"Erro ao verificar saúde do servidor MCP: {e}")
-            return False 
\ No newline at end of file
+            return False
+
+
+class AsyncCursorIntegration:
+    """
+    Versão assíncrona da integração com o Cursor, para orquestrar muitas requisições.
+    
+    Usa um único `httpx.AsyncClient` com pool de conexões configurável, timeout por
+    chamada, novas tentativas com backoff exponencial e jitter para falhas de rede e
+    respostas 429/502/503/504 (nos envios, que não são idempotentes, apenas falhas de
+    conexão e 429/503), e um limite de requisições simultâneas. Os métodos têm os
+    mesmos nomes e retornos de `CursorIntegration`.
+    """
+    
+    def __init__(self, mcp_url: str = "http://localhost:8000",
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF,
+                 cache_size: int = DEFAULT_RESPONSE_CACHE_SIZE,
+                 client: Optional["httpx.AsyncClient"] = None):
+        """
+        Inicializa o cliente assíncrono.
+        
+        Args:
+            mcp_url: URL base para o servidor MCP
+            max_connections: Tamanho do pool de conexões
+            max_concurrency: Máximo de requisições em andamento ao mesmo tempo
+            timeout: Timeout padrão de cada requisição em segundos
+            retries: Quantidade de novas tentativas após uma falha temporária
+            backoff: Espera base entre tentativas em segundos (dobra a cada tentativa)
+            max_backoff: Espera máxima entre tentativas em segundos
+            cache_size: Quantidade de respostas de `/context` e `/prompt` mantidas
+                localmente e revalidadas com ETag (0 desativa)
+            client: Cliente httpx já configurado (opcional, usado em testes)
+            
+        Raises:
+            ImportError: Se o httpx não estiver instalado
+        """
+        if not HTTPX_AVAILABLE and client is None:
+            raise ImportError("httpx é necessário para o cliente assíncrono: pip install httpx")
+        
+        self.mcp_url = mcp_url
+        self.token = os.environ.get("CURSOR_API_TOKEN", "")
+        self.api_base = "https://api.cursor.sh/v1"
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.response_cache = LRUCache(max_entries=cache_size)
+        self.cache_stats = {"not_modified": 0, "downloaded": 0}
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        headers = {}
+        if self.token:
+            headers = {
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/json"
+            }
+        else:
+            logger.warning(
+                "Token de API do Cursor não encontrado. Configure a variável CURSOR_API_TOKEN. "
+                "Visite https://cursor.sh/docs/api-tokens para obter seu token."
+            )
+        
+        if client is None:
+            limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            client = httpx.AsyncClient(timeout=timeout, limits=limits, headers=headers)
+        else:
+            client.headers.update(headers)
+        self.client = client
+    
+    async def __aenter__(self) -> "AsyncCursorIntegration":
+        return self
+    
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Fecha o cliente e as conexões do pool."""
+        await self.client.aclose()
+    
+    def _retry_delay(self, attempt: int, response: Optional["httpx.Response"]) -> float:
+        """
+        Calcula a espera antes da próxima tentativa.
+        
+        Respeita o cabeçalho Retry-After quando presente; caso contrário usa backoff
+        exponencial com jitter completo, para que clientes rejeitados ao mesmo tempo
+        não voltem todos juntos.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            try:
+                return min(max(float(retry_after), 0.0), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+    
+    async def _request(self, method: str, url: str, timeout: Any = None,
+                       idempotent: bool = True, **kwargs: Any) -> "httpx.Response":
+        """
+        Envia uma requisição respeitando o limite de concorrência e repetindo falhas temporárias.
+        
+        A vaga no limite de concorrência é liberada durante a espera entre tentativas.
+        Requisições não idempotentes só são repetidas quando certamente não chegaram a
+        ser processadas: falha de conexão ou resposta 429/503.
+        
+        Args:
+            method: Método HTTP
+            url: URL completa
+            timeout: Timeout desta chamada em segundos ou httpx.Timeout (padrão: o do cliente)
+            idempotent: Se a requisição pode ser repetida sem efeitos duplicados
+            **kwargs: Argumentos repassados ao httpx (json, headers, ...)
+            
+        Returns:
+            Resposta da última tentativa
+            
+        Raises:
+            httpx.HTTPError: Se todas as tentativas falharem por erro de rede ou timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if idempotent:
+            retry_errors, retry_status_codes = (httpx.TransportError,), RETRY_STATUS_CODES
+        else:
+            retry_errors = (httpx.ConnectError, httpx.ConnectTimeout)
+            retry_status_codes = NON_IDEMPOTENT_RETRY_STATUS_CODES
+        attempt = 0
+        while True:
+            response, error = None, None
+            async with self._semaphore:
+                self.stats["requests"] += 1
+                try:
+                    response = await self.client.request(method, url, timeout=timeout, **kwargs)
+                except retry_errors as e:
+                    error = e
+            
+            if response is not None and response.status_code not in retry_status_codes:
+                return response
+            if attempt >= self.retries:
+                self.stats["failures"] += 1
+                if error is not None:
+                    raise error
+                return response
+            
+            delay = self._retry_delay(attempt, response)
+            reason = type(error).__name__ if error is not None else response.status_code
+            logger.warning(f"Falha temporária em {method} {url} ({reason}); nova tentativa em {delay:.2f}s")
+            self.stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def _post_revalidated(self, url: str, payload: Dict[str, Any],
+                                timeout: Optional[float] = None) -> Tuple[int, Any]:
+        """
+        Envia um POST ao servidor MCP reaproveitando a resposta anterior se não mudou.
+        
+        Mesmo comportamento de `CursorIntegration._post_revalidated`.
+        
+        Returns:
+            Tupla (status HTTP, JSON da resposta se 200 ou texto do erro)
+        """
+        key = (url, json.dumps(payload, sort_keys=True))
+        cached = self.response_cache.get(key) if self.response_cache.enabled else None
+        headers = {"If-None-Match": cached[0]} if cached else None
+        response = await self._request("POST", url, timeout=timeout, json=payload, headers=headers)
+        
+        if response.status_code == 304 and cached:
+            self.cache_stats["not_modified"] += 1
+            return 200, dict(cached[1])
+        if response.status_code != 200:
+            return response.status_code, response.text
+        
+        data = response.json()
+        self.cache_stats["downloaded"] += 1
+        etag = response.headers.get("ETag")
+        if etag:
+            self.response_cache.put(key, (etag, data))
+        return 200, dict(data)
+    
+    async def send_context_to_cursor(self,
+                                     context: str,
+                                     file_path: Optional[str] = None,
+                                     conversation_id: Optional[str] = None,
+                                     technology: Optional[str] = None,
+                                     timeout: Optional[float] = None) -> bool:
+        """
+        Envia contexto diretamente para uma conversa no Cursor IDE.
+        
+        Args:
+            context: O contexto a ser enviado
+            file_path: Caminho do arquivo em foco (opcional)
+            conversation_id: ID da conversa no Cursor (opcional)
+            technology: Tecnologia específica para enriquecer o contexto (opcional)
+            timeout: Timeout desta chamada em segundos (opcional)
+            
+        Returns:
+            bool: True se o envio foi bem-sucedido, False caso contrário
+        """
+        if not self.token:
+            logger.error("Token de API do Cursor não configurado")
+            return False
+        
+        url, payload = _cursor_message(self.api_base, context, file_path, conversation_id, technology)
+        
+        try:
+            start_time = time.time()
+            response = await self._request("POST", url, timeout=timeout, idempotent=False, json=payload)
+            
+            if response.status_code == 200:
+                logger.info(f"Contexto enviado com sucesso para o Cursor IDE em {time.time() - start_time:.4f}s")
+                return True
+            logger.error(f"Falha ao enviar contexto: {response.status_code} - {response.text}")
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao enviar contexto para o Cursor: {e}")
+            return False
+    
+    async def get_context_for_query(self,
+                                    query: str,
+                                    num_results: int = 5,
+                                    technology: Optional[str] = None,
+                                    timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Consulta o servidor MCP para obter contexto para uma consulta.
+        
+        Args:
+            query: A consulta para buscar contexto
+            num_results: Número de resultados a retornar
+            technology: Tecnologia específica para aprimorar a busca de contexto
+            timeout: Timeout desta chamada em segundos (opcional)
+            
+        Returns:
+            Dict com o contexto e fontes
+        """
+        try:
+            payload = {"query": query, "num_results": num_results}
+            if technology:
+                payload["technology_context"] = technology
+            
+            start_time = time.time()
+            status_code, result = await self._post_revalidated(f"{self.mcp_url}/context", payload, timeout)
+            
+            if status_code == 200:
+                logger.info(f"Contexto obtido em {time.time() - start_time:.4f}s com {len(result.get('sources', []))} fontes")
+                return result
+            logger.error(f"Falha ao obter contexto: {status_code} - {result}")
+            return {"context": "", "sources": []}
+        except Exception as e:
+            logger.error(f"Erro ao consultar servidor MCP: {e}")
+            return {"context": "", "sources": []}
+    
+    async def enhance_cursor_prompt(self,
+                                    user_request: str,
+                                    technology: Optional[str] = None,
+                                    include_best_practices: bool = True,
+                                    timeout: Optional[float] = None) -> bool:
+        """
+        Melhora o prompt do usuário no Cursor com contexto relevante.
+        
+        Args:
+            user_request: A solicitação do usuário
+            technology: Tecnologia específica para ajustar o contexto
+            include_best_practices: Se deve incluir melhores práticas no prompt
+            timeout: Timeout de cada chamada em segundos (opcional)
+            
+        Returns:
+            bool: True se o processo foi bem-sucedido, False caso contrário
+        """
+        try:
+            payload = {"request": user_request, "include_best_practices": include_best_practices}
+            if technology:
+                payload["technology_context"] = technology
+            
+            status_code, prompt_data = await self._post_revalidated(f"{self.mcp_url}/prompt", payload, timeout)
+            if status_code != 200:
+                logger.error(f"Falha ao gerar prompt: {status_code} - {prompt_data}")
+                return False
+            
+            formatted_prompt = prompt_data.get("prompt", "")
+            if not formatted_prompt:
+                logger.warning("Prompt gerado está vazio")
+                return False
+            
+            logger.info(f"Prompt gerado em {prompt_data.get('generation_time', 0)}s, enviando para o Cursor IDE")
+            # O prompt já traz a seção da tecnologia
+            return await self.send_context_to_cursor(formatted_prompt, timeout=timeout)
+        except Exception as e:
+            logger.error(f"Erro ao melhorar prompt para o Cursor: {e}")
+            return False
+    
+    async def send_prompt_to_cursor(self,
+                                    user_request: str,
+                                    technology: Optional[str] = None,
+                                    include_best_practices: bool = True,
+                                    file_path: Optional[str] = None,
+                                    conversation_id: Optional[str] = None,
+                                    timeout: Optional[float] = None) -> bool:
+        """
+        Melhora o prompt do usuário e o envia ao Cursor em uma única requisição.
+        
+        Mesmo comportamento de `CursorIntegration.send_prompt_to_cursor`.
+        
+        Args:
+            user_request: A solicitação do usuário
+            technology: Tecnologia específica para ajustar o contexto
+            include_best_practices: Se deve incluir melhores práticas no prompt
+            file_path: Caminho do arquivo em foco (opcional)
+            conversation_id: ID da conversa no Cursor (opcional)
+            timeout: Timeout desta chamada em segundos (opcional)
+            
+        Returns:
+            bool: True se o servidor aceitou o encaminhamento, False caso contrário
+        """
+        try:
+            payload = _send_payload(user_request, technology, include_best_practices, file_path, conversation_id)
+            response = await self._request("POST", f"{self.mcp_url}/prompt/send", timeout=timeout,
+                                           idempotent=False, json=payload)
+            
+            if response.status_code == 202:
+                return True
+            logger.error(f"Falha ao encaminhar prompt: {response.status_code} - {response.text}")
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao encaminhar prompt para o Cursor: {e}")
+            return False
+    
+    async def update_index(self, timeout: Optional[float] = None) -> bool:
+        """
+        Solicita atualização do índice de documentos no servidor MCP.
+        
+        Args:
+            timeout: Timeout de conexão e envio em segundos; a espera pela resposta,
+                que só chega ao fim da reconstrução, não tem limite (opcional)
+            
+        Returns:
+            bool: True se a atualização foi bem-sucedida, False caso contrário
+        """
+        try:
+            logger.info("Solicitando atualização do índice")
+            # A resposta só chega ao fim da reconstrução: sem limite de leitura, e sem
+            # repetir o pedido (uma nova reconstrução cancelaria a que está em andamento)
+            timeout = httpx.Timeout(self.timeout if timeout is None else timeout, read=None)
+            response = await self._request("POST", f"{self.mcp_url}/update-index", timeout=timeout,
+                                           idempotent=False)
+            
+            if response.status_code == 200:
+                update_time = response.json().get("update_time", 0)
+                logger.info(f"Índice atualizado com sucesso em {update_time:.2f}s")
+                return True
+            logger.error(f"Falha ao atualizar índice: {response.status_code} - {response.text}")
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao solicitar atualização do índice: {e}")
+            return False
+    
+    async def get_server_stats(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Obtém estatísticas do servidor MCP.
+        
+        Args:
+            timeout: Timeout desta chamada em segundos (opcional)
+            
+        Returns:
+            Dict com estatísticas do servidor
+        """
+        try:
+            response = await self._request("GET", f"{self.mcp_url}/stats", timeout=timeout)
+            
+            if response.status_code == 200:
+                return response.json()
+            logger.error(f"Falha ao obter estatísticas: {response.status_code} - {response.text}")
+            return {}
+        except Exception as e:
+            logger.error(f"Erro ao consultar estatísticas do servidor: {e}")
+            return {}
+    
+    async def check_server_health(self, timeout: Optional[float] = None) -> bool:
+        """
+        Verifica se o servidor MCP está funcionando corretamente.
+        
+        Args:
+            timeout: Timeout desta chamada em segundos (opcional)
+            
+        Returns:
+            bool: True se o servidor está saudável, False caso contrário
+        """
+        try:
+            response = await self._request("GET", f"{self.mcp_url}/health", timeout=timeout)
+            
+            if response.status_code == 200 and response.json().get("status") == "healthy":
+                return True
+            logger.warning(f"Servidor MCP não está saudável: {response.status_code} - {response.text}")
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao verificar saúde do servidor MCP: {e}")
+            return False
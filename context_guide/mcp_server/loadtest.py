@@ -0,0 +1,274 @@
+"""
+Gerador de carga assíncrono para a API HTTP do servidor MCP.
+
+Dispara requisições concorrentes com uma mistura configurável de `/context`, `/prompt`
+e `/update-index`, opcionalmente contra uma instância local de `run_server` iniciada
+pelo próprio harness (com um embedder determinístico e um corpus sintético), e
+reporta vazão, percentis de latência e taxa de erros, separando as requisições que
+ocorreram durante uma reconstrução do índice.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from context_guide.corpus import template_queries
+from context_guide.timing import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+# Mistura padrão de requisições (endpoint -> peso)
+DEFAULT_MIX = {"context": 0.75, "prompt": 0.24, "update-index": 0.01}
+
+ENDPOINTS = ("context", "prompt", "update-index")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Converte uma especificação de mistura em pesos por endpoint.
+
+    Args:
+        spec: Texto no formato "context=7,prompt=2,update-index=1"
+
+    Returns:
+        Dicionário endpoint -> peso
+
+    Raises:
+        ValueError: Se o endpoint for desconhecido ou o peso inválido
+    """
+    mix = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, weight = item.partition("=")
+        endpoint = endpoint.strip().lstrip("/")
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Endpoint desconhecido na mistura: '{endpoint}'")
+        mix[endpoint] = float(weight)
+        if mix[endpoint] < 0:
+            raise ValueError(f"Peso negativo para '{endpoint}'")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("A mistura de requisições precisa de ao menos um peso positivo")
+    return mix
+
+
+def _request_for(endpoint: str, rng: random.Random, queries: List[str]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Monta o caminho e o payload de uma requisição do endpoint sorteado."""
+    query = rng.choice(queries)
+    if endpoint == "context":
+        return "/context", {"query": query, "num_results": 5}
+    if endpoint == "prompt":
+        return "/prompt", {"request": f"Implementar {query.lower()}"}
+    return "/update-index", None
+
+
+def build_report(samples: List[Dict[str, Any]], duration: float,
+                 rebuild_windows: List[Tuple[float, float]]) -> Dict[str, Any]:
+    """
+    Consolida as amostras coletadas em um relatório.
+
+    Args:
+        samples: Amostras com endpoint, start, end e ok
+        duration: Duração total do teste em segundos
+        rebuild_windows: Intervalos (início, fim) em que o índice estava sendo reconstruído
+
+    Returns:
+        Relatório com vazão, latências e erros por endpoint e por fase
+    """
+    def overlaps_rebuild(sample):
+        return any(sample["start"] < end and sample["end"] > start for start, end in rebuild_windows)
+
+    def summarize(group):
+        errors = sum(1 for sample in group if not sample["ok"])
+        return {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": errors / len(group) if group else 0.0,
+            "throughput": len(group) / duration if duration > 0 else 0.0,
+            "latency": summarize_latencies([sample["end"] - sample["start"] for sample in group if sample["ok"]]),
+        }
+
+    queries = [sample for sample in samples if sample["endpoint"] != "update-index"]
+    return {
+        "duration": duration,
+        "overall": summarize(samples),
+        "endpoints": {
+            endpoint: summarize([sample for sample in samples if sample["endpoint"] == endpoint])
+            for endpoint in ENDPOINTS
+            if any(sample["endpoint"] == endpoint for sample in samples)
+        },
+        "rebuilds": {
+            "count": len(rebuild_windows),
+            "total_seconds": sum(end - start for start, end in rebuild_windows),
+            "queries_during_rebuild": summarize([s for s in queries if overlaps_rebuild(s)]),
+            "queries_outside_rebuild": summarize([s for s in queries if not overlaps_rebuild(s)]),
+        },
+    }
+
+
+async def run_load_test(base_url: str, duration: float = 30.0, concurrency: int = 10,
+                        mix: Optional[Dict[str, float]] = None, rebuild_at: Optional[float] = None,
+                        timeout: float = 60.0, seed: int = 42,
+                        client: Optional["httpx.AsyncClient"] = None) -> Dict[str, Any]:
+    """
+    Executa o teste de carga contra um servidor MCP.
+
+    Args:
+        base_url: URL base do servidor (ex: http://127.0.0.1:8000)
+        duration: Duração do teste em segundos
+        concurrency: Número de clientes simultâneos
+        mix: Pesos por endpoint (padrão: DEFAULT_MIX)
+        rebuild_at: Segundo em que uma reconstrução do índice é disparada (opcional)
+        timeout: Timeout de cada requisição em segundos
+        seed: Semente para o sorteio de endpoints e consultas
+        client: Cliente httpx já configurado (opcional, usado em testes)
+
+    Returns:
+        Relatório gerado por `build_report`
+    """
+    if not HTTPX_AVAILABLE and client is None:
+        raise ImportError("httpx é necessário para o teste de carga: pip install httpx")
+
+    mix = mix or DEFAULT_MIX
+    endpoints = list(mix.keys())
+    weights = list(mix.values())
+    queries = template_queries()
+    samples: List[Dict[str, Any]] = []
+    rebuild_windows: List[Tuple[float, float]] = []
+
+    owns_client = client is None
+    if owns_client:
+        limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+        client = httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits)
+
+    test_start = time.perf_counter()
+    deadline = test_start + duration
+
+    async def send(endpoint: str, path: str, payload: Optional[Dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+            ok = response.status_code == 200
+            status = response.status_code
+        except httpx.HTTPError as e:
+            ok, status = False, type(e).__name__
+        end = time.perf_counter()
+        samples.append({"endpoint": endpoint, "start": start - test_start, "end": end - test_start,
+                        "ok": ok, "status": status})
+        if endpoint == "update-index":
+            rebuild_windows.append((start - test_start, end - test_start))
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(seed + worker_id)
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            path, payload = _request_for(endpoint, rng, queries)
+            await send(endpoint, path, payload)
+
+    async def scheduled_rebuild() -> None:
+        await asyncio.sleep(rebuild_at)
+        if time.perf_counter() < deadline:
+            logger.info("Disparando reconstrução do índice durante o teste de carga")
+            await send("update-index", "/update-index", None)
+
+    tasks = [worker(i) for i in range(concurrency)]
+    if rebuild_at is not None:
+        tasks.append(scheduled_rebuild())
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    return build_report(samples, time.perf_counter() - test_start, rebuild_windows)
+
+
+def _serve(host: str, port: int, environment: Dict[str, str]) -> None:
+    """Ponto de entrada do processo do servidor local."""
+    os.environ.update(environment)
+    from context_guide.mcp_server.server import run_server
+    run_server(host=host, port=port)
+
+
+def start_local_server(docs_dir: str, db_dir: str, host: str = "127.0.0.1", port: int = 8765,
+                       embed_model: Optional[str] = None, startup_timeout: float = 120.0) -> multiprocessing.Process:
+    """
+    Inicia `run_server` em um processo separado e aguarda até que esteja saudável.
+
+    Args:
+        docs_dir: Diretório de documentos do servidor
+        db_dir: Diretório do banco de dados do servidor
+        host: Endereço do servidor
+        port: Porta do servidor
+        embed_model: Modelo de embeddings (ex: "fake" para o embedder determinístico)
+        startup_timeout: Tempo máximo de espera pela inicialização em segundos
+
+    Returns:
+        Processo do servidor (encerre com `terminate()`)
+
+    Raises:
+        RuntimeError: Se o servidor não ficar saudável dentro do tempo limite
+    """
+    environment = {"CONTEXT_GUIDE_DOCS_DIR": docs_dir, "CONTEXT_GUIDE_DB_DIR": db_dir}
+    if embed_model:
+        environment["CONTEXT_GUIDE_EMBED_MODEL"] = embed_model
+
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(host, port, environment), daemon=True
+    )
+    process.start()
+
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if not process.is_alive():
+            raise RuntimeError("O servidor local encerrou durante a inicialização")
+        try:
+            if httpx.get(f"http://{host}:{port}/health", timeout=1.0).status_code == 200:
+                logger.info(f"Servidor local pronto em http://{host}:{port}")
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError(f"O servidor local não ficou saudável em {startup_timeout:.0f}s")
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Formata o relatório do teste de carga para exibição no terminal.
+
+    Args:
+        report: Relatório gerado por `run_load_test`
+
+    Returns:
+        Texto com uma linha por endpoint e por fase
+    """
+    def line(name, summary):
+        latency = summary["latency"]
+        return (f"{name:<26} {summary['requests']:>8} {summary['throughput']:>9.1f} "
+                f"{summary['error_rate']:>7.1%} {latency['p50'] * 1000:>9.1f} "
+                f"{latency['p90'] * 1000:>9.1f} {latency['p99'] * 1000:>9.1f}")
+
+    header = f"{'':<26} {'reqs':>8} {'req/s':>9} {'erros':>7} {'p50(ms)':>9} {'p90(ms)':>9} {'p99(ms)':>9}"
+    lines = [header, "-" * len(header), line("total", report["overall"])]
+    for endpoint, summary in report["endpoints"].items():
+        lines.append(line(f"/{endpoint}", summary))
+    rebuilds = report["rebuilds"]
+    if rebuilds["count"]:
+        lines.append("")
+        lines.append(f"Reconstruções do índice: {rebuilds['count']} ({rebuilds['total_seconds']:.2f}s no total)")
+        lines.append(line("consultas durante rebuild", rebuilds["queries_during_rebuild"]))
+        lines.append(line("consultas fora do rebuild", rebuilds["queries_outside_rebuild"]))
+    return "\n".join(lines)
@@ -0,0 +1,258 @@
+"""
+Métricas do servidor MCP no formato de exposição de texto do Prometheus/OpenMetrics.
+
+As métricas por requisição são atualizadas somente a partir do loop de eventos do
+servidor (middleware e endpoints assíncronos), portanto os incrementos não usam locks.
+Valores caros ou mantidos por outros componentes (tamanho do índice, caches) são
+coletados apenas no momento do scrape, através de funções de coleta.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Limites padrão (em segundos) para histogramas de latência
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape_label_value(value: str) -> str:
+    """Escapa um valor de label conforme o formato de exposição."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """Formata um valor numérico conforme o formato de exposição."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Monta o bloco de labels `{a="1",b="2"}` (ou string vazia)."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base para as métricas do registro."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+
+    def labels(self, *values: str):
+        """
+        Retorna a série correspondente aos valores de label informados.
+
+        A série é criada na primeira chamada e reutilizada nas seguintes, de modo que
+        o caminho quente é apenas uma consulta em dicionário.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"Métrica {self.name} espera labels {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Renderiza a métrica em linhas do formato de exposição."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for suffix, names, values, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class _ValueChild:
+    """Série simples com um único valor numérico."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Incrementa a série sem labels."""
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield "", self.labelnames, values, child.value
+
+
+class Gauge(_Metric):
+    """Valor que pode subir e descer."""
+
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Incrementa a série sem labels."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrementa a série sem labels."""
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        """Define o valor da série sem labels."""
+        self.labels().set(value)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield "", self.labelnames, values, child.value
+
+
+class _HistogramChild:
+    """Série de um histograma com contagens por bucket (não cumulativas)."""
+
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos; as contagens são acumuladas apenas na renderização."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Registra uma observação na série sem labels."""
+        self.labels().observe(value)
+
+    def _samples(self):
+        bucket_labels = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                yield "_bucket", bucket_labels, values + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, values, child.sum
+            yield "_count", self.labelnames, values, child.count
+
+
+class CallbackMetric(_Metric):
+    """
+    Métrica cujos valores são obtidos de uma função no momento do scrape.
+
+    A função deve retornar um dicionário {tupla_de_labels: valor}. Erros na coleta
+    são ignorados para que uma fonte indisponível não derrube o endpoint inteiro.
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 collect: Callable[[], Dict[LabelValues, float]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.metric_type = metric_type
+        self.collect = collect
+
+    def _samples(self):
+        try:
+            samples = self.collect() or {}
+        except Exception:
+            return
+        for values, value in samples.items():
+            try:
+                yield "", self.labelnames, tuple(str(v) for v in values), float(value)
+            except (TypeError, ValueError):
+                continue
+
+
+class MetricsRegistry:
+    """Registro de métricas que produz o texto de exposição."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Registra uma métrica e a retorna."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, metric_type: str,
+                 collect: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, metric_type, collect, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Retorna uma métrica registrada pelo nome."""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Renderiza todas as métricas registradas."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,255 @@
+"""
+Modo multi-worker do servidor MCP com um índice compartilhado via mmap.
+
+O processo mestre é o único escritor: carrega o modelo de embeddings e o ChromaDB,
+constrói o índice, exporta um snapshot somente leitura (ver `context_guide.snapshot`)
+e só então abre o socket e cria os workers com fork. Os workers herdam o modelo já
+carregado (copy-on-write) e consultam o snapshot mapeado em memória, cujas páginas
+são compartilhadas entre todos eles pelo page cache.
+
+Reconstruções solicitadas por um worker (`/update-index`) recebem um número de
+sequência compartilhado e são encaminhadas ao mestre com SIGUSR1. O mestre reconstrói
+o índice, publica uma nova versão do snapshot e a maior sequência atendida; cada
+worker remapeia o snapshot na próxima consulta.
+"""
+
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Any, Dict, Optional
+
+import uvicorn
+
+from context_guide.context import ContextManager
+from context_guide.prompt_generator import PromptGenerator
+from context_guide.snapshot import SNAPSHOT_DIRNAME, SnapshotContextManager, export_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo que um worker aguarda uma reconstrução solicitada ao mestre
+REBUILD_TIMEOUT = 3600.0
+
+# Intervalo do laço de supervisão do mestre
+SUPERVISOR_INTERVAL = 0.5
+
+
+class SharedIndexState:
+    """Estado do índice compartilhado entre o mestre e os workers (memória compartilhada)."""
+
+    def __init__(self):
+        """Cria os valores compartilhados; deve ser instanciado antes do fork."""
+        self.version = multiprocessing.RawValue("q", 0)
+        # Sequência da última solicitação de reconstrução, da maior atendida pela
+        # reconstrução em andamento e da maior atendida por uma reconstrução concluída
+        self.requested_seq = multiprocessing.RawValue("q", 0)
+        self.serving_seq = multiprocessing.RawValue("q", 0)
+        self.completed_seq = multiprocessing.RawValue("q", 0)
+        self.last_rebuild_ok = multiprocessing.RawValue("b", 1)
+        self.lock = multiprocessing.Lock()
+
+    def next_request(self) -> int:
+        """Registra uma solicitação de reconstrução e retorna sua sequência."""
+        with self.lock:
+            self.requested_seq.value += 1
+            return self.requested_seq.value
+
+    def start_rebuild(self) -> int:
+        """Marca como atendidas as solicitações feitas até agora e retorna a maior delas."""
+        with self.lock:
+            self.serving_seq.value = self.requested_seq.value
+            return self.serving_seq.value
+
+    def pending(self) -> bool:
+        """Indica se há solicitações ainda não atendidas por uma reconstrução."""
+        with self.lock:
+            return self.requested_seq.value > self.serving_seq.value
+
+
+def _request_rebuild(state: SharedIndexState, master_pid: int, timeout: float = REBUILD_TIMEOUT) -> int:
+    """
+    Solicita uma reconstrução ao mestre e aguarda sua conclusão (executado no worker).
+
+    Args:
+        state: Estado compartilhado do índice
+        master_pid: PID do processo mestre
+        timeout: Tempo máximo de espera em segundos
+
+    Returns:
+        Versão do snapshot publicada pela reconstrução
+
+    Raises:
+        RuntimeError: Se a reconstrução falhar ou não terminar a tempo
+    """
+    # Só uma reconstrução iniciada depois desta solicitação inclui suas alterações:
+    # o mestre registra a sequência atendida antes de começar a reconstruir
+    ticket = state.next_request()
+    os.kill(master_pid, signal.SIGUSR1)
+
+    deadline = time.time() + timeout
+    while state.completed_seq.value < ticket:
+        if time.time() > deadline:
+            raise RuntimeError("Tempo esgotado aguardando a reconstrução do índice")
+        time.sleep(0.1)
+
+    if not state.last_rebuild_ok.value:
+        raise RuntimeError("Falha na reconstrução do índice (veja o log do processo mestre)")
+    return state.version.value
+
+
+def _publish_snapshot(manager: ContextManager, state: SharedIndexState) -> None:
+    """Exporta o índice do mestre para um novo snapshot e o torna visível aos workers."""
+    state.version.value = export_snapshot(
+        manager.chroma_collection,
+        manager.db_dir / SNAPSHOT_DIRNAME,
+        info=dict(manager.index_stats),
+    )
+
+
+def _run_worker(config: uvicorn.Config, sock, manager: ContextManager, state: SharedIndexState,
+                master_pid: int) -> None:
+    """Ponto de entrada de um worker criado com fork."""
+    from context_guide.mcp_server import server
+
+    # O uvicorn instala seus próprios handlers; o worker não atende SIGUSR1
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+    reader = SnapshotContextManager(
+        db_dir=str(manager.db_dir),
+        embed_model=manager.embed_model,
+        docs_dir=str(manager.docs_dir),
+        version_value=state.version,
+        request_rebuild=lambda: _request_rebuild(state, master_pid),
+    )
+    server.context_manager = reader
+    server.prompt_generator = PromptGenerator(reader)
+
+    logger.info(f"Worker {os.getpid()} atendendo com o snapshot {reader.index_version} do índice")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def run_multiworker_server(host: str = "0.0.0.0", port: int = 8000, workers: int = 2,
+                           docs_dir: str = "docs", db_dir: str = ".context_guide",
+                           log_config: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Inicia o servidor MCP com vários workers compartilhando um índice mapeado em memória.
+
+    Args:
+        host: Endereço para escutar
+        port: Porta para escutar
+        workers: Quantidade de processos worker
+        docs_dir: Diretório de documentos
+        db_dir: Diretório do banco de dados
+        log_config: Configuração de log do uvicorn
+
+    Raises:
+        RuntimeError: Se a plataforma não suportar fork ou as dependências estiverem ausentes
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("O modo multi-worker requer um sistema com fork (Linux ou macOS)")
+
+    # O modelo de embeddings é carregado antes do fork e compartilhado via copy-on-write
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    manager = ContextManager(docs_dir=docs_dir, db_dir=db_dir)
+    if not manager.llama_available:
+        raise RuntimeError("O modo multi-worker requer LlamaIndex e ChromaDB instalados")
+
+    state = SharedIndexState()
+    _publish_snapshot(manager, state)
+
+    config = uvicorn.Config("context_guide.mcp_server.server:app", host=host, port=port,
+                            log_config=log_config)
+    sock = config.bind_socket()
+    master_pid = os.getpid()
+
+    # Os handlers apenas marcam flags; o trabalho é feito no laço de supervisão
+    # A reconciliação das alterações feitas com o servidor parado roda já com os
+    # workers atendendo a partir do snapshot existente
+    flags = {"rebuild": False, "reconcile": True, "stop": False}
+    signal.signal(signal.SIGUSR1, lambda signum, frame: flags.update(rebuild=True))
+    signal.signal(signal.SIGTERM, lambda signum, frame: flags.update(stop=True))
+    signal.signal(signal.SIGINT, lambda signum, frame: flags.update(stop=True))
+
+    children: Dict[int, int] = {}
+
+    def spawn(slot: int) -> None:
+        # Objetos criados até aqui não serão mais tocados pelo coletor nos filhos,
+        # evitando que a contagem de referências do gc copie as páginas compartilhadas
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(config, sock, manager, state, master_pid)
+            except Exception as e:
+                logger.error(f"Erro no worker {os.getpid()}: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = slot
+        logger.info(f"Worker {slot} iniciado (pid {pid})")
+
+    for slot in range(workers):
+        spawn(slot)
+    logger.info(f"Servidor MCP multi-worker em {host}:{port} com {workers} workers (mestre pid {master_pid})")
+
+    try:
+        while not flags["stop"]:
+            # Os sinais podem se fundir; a sequência compartilhada é a fonte das solicitações
+            if flags["rebuild"] or state.pending():
+                flags["rebuild"] = False
+                serving = state.start_rebuild()
+                try:
+                    # Os workers são outros processos: o limite de threads vale só para a construção
+                    with manager.build_throttle.limited_threads():
+                        manager.update_index()
+                    _publish_snapshot(manager, state)
+                    state.last_rebuild_ok.value = 1
+                except Exception as e:
+                    logger.error(f"Erro ao reconstruir o índice: {e}")
+                    state.last_rebuild_ok.value = 0
+                finally:
+                    state.completed_seq.value = serving
+
+            elif flags["reconcile"]:
+                flags["reconcile"] = False
+                try:
+                    changes = manager.detect_offline_changes()
+                    with manager.build_throttle.limited_threads():
+                        if changes is None:
+                            manager.update_index()
+                        elif changes:
+                            manager.update_documents(changes)
+                    if changes is None or changes:
+                        _publish_snapshot(manager, state)
+                        logger.info("Alterações feitas com o servidor parado aplicadas ao snapshot")
+                except Exception as e:
+                    logger.error(f"Erro ao reconciliar o índice: {e}")
+
+            # Recriar workers que encerraram inesperadamente
+            for pid, slot in list(children.items()):
+                finished, status = os.waitpid(pid, os.WNOHANG)
+                if finished and not flags["stop"]:
+                    del children[pid]
+                    logger.warning(f"Worker {slot} (pid {pid}) encerrou com status {status}; reiniciando")
+                    spawn(slot)
+
+            if not flags["rebuild"] and not state.pending():
+                time.sleep(SUPERVISOR_INTERVAL)
+    finally:
+        logger.info("Encerrando workers...")
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
@@ -0,0 +1,195 @@
+"""
+Profiling sob demanda para o caminho quente do servidor MCP.
+
+Uma fração configurável das requisições de contexto e prompt é executada sob o
+cProfile e o resultado é gravado como arquivo `.pstats` em um diretório com rotação.
+Também permite capturar snapshots do tracemalloc e comparar com uma linha de base
+para investigar crescimento de memória.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    """Amostra requisições com cProfile e gerencia snapshots do tracemalloc."""
+
+    def __init__(self, sample_rate: float = 0.0, output_dir: str = ".context_guide/profiles",
+                 max_files: int = 50):
+        """
+        Inicializa o profiler.
+
+        Args:
+            sample_rate: Fração (0.0 a 1.0) das requisições que serão perfiladas
+            output_dir: Diretório onde os arquivos `.pstats` serão gravados
+            max_files: Número máximo de arquivos mantidos no diretório
+        """
+        self.output_dir = Path(output_dir)
+        self.sample_rate = 0.0
+        self.max_files = 1
+        self.configure(sample_rate=sample_rate, max_files=max_files)
+        self.profiled_requests = 0
+        self.last_profile_path: Optional[str] = None
+        # O cProfile não suporta perfis aninhados; apenas uma requisição é perfilada por vez
+        self._active = threading.Lock()
+        self._tracemalloc_baseline = None
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        """
+        Cria um profiler a partir das variáveis de ambiente.
+
+        Variáveis:
+            CONTEXT_GUIDE_PROFILE_RATE: Fração das requisições perfiladas (padrão: 0, desativado)
+            CONTEXT_GUIDE_PROFILE_DIR: Diretório dos arquivos `.pstats`
+            CONTEXT_GUIDE_PROFILE_MAX_FILES: Quantidade de arquivos mantidos na rotação
+        """
+        db_dir = os.environ.get("CONTEXT_GUIDE_DB_DIR", ".context_guide")
+        return cls(
+            sample_rate=float(os.environ.get("CONTEXT_GUIDE_PROFILE_RATE", "0")),
+            output_dir=os.environ.get("CONTEXT_GUIDE_PROFILE_DIR", os.path.join(db_dir, "profiles")),
+            max_files=int(os.environ.get("CONTEXT_GUIDE_PROFILE_MAX_FILES", "50")),
+        )
+
+    def configure(self, sample_rate: Optional[float] = None, max_files: Optional[int] = None) -> None:
+        """
+        Altera a configuração do profiler em tempo de execução.
+
+        Args:
+            sample_rate: Nova fração de amostragem (0.0 desativa)
+            max_files: Novo limite de arquivos mantidos
+        """
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("sample_rate deve estar entre 0.0 e 1.0")
+            self.sample_rate = sample_rate
+        if max_files is not None:
+            if max_files < 1:
+                raise ValueError("max_files deve ser maior que zero")
+            self.max_files = max_files
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se alguma requisição será amostrada."""
+        return self.sample_rate > 0.0
+
+    @contextmanager
+    def profile(self, operation: str) -> Iterator[None]:
+        """
+        Executa o bloco sob o cProfile se a requisição for sorteada.
+
+        Args:
+            operation: Nome da operação, usado no nome do arquivo gerado
+        """
+        if not self.enabled or random.random() >= self.sample_rate or not self._active.acquire(blocking=False):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+            self._dump(profiler, operation)
+        finally:
+            self._active.release()
+
+    def _dump(self, profiler: cProfile.Profile, operation: str) -> None:
+        """Grava o resultado do profile e aplica a rotação de arquivos."""
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            file_name = f"{operation}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.pstats"
+            path = self.output_dir / file_name
+            profiler.dump_stats(str(path))
+            self.profiled_requests += 1
+            self.last_profile_path = str(path)
+            self._rotate()
+            logger.info(f"Profile da operação '{operation}' gravado em {path}")
+        except OSError as e:
+            logger.error(f"Erro ao gravar profile: {e}")
+
+    def _rotate(self) -> None:
+        """Remove os arquivos mais antigos além do limite configurado."""
+        files = sorted(self.output_dir.glob("*.pstats"), key=lambda p: p.stat().st_mtime)
+        for old_file in files[:-self.max_files]:
+            try:
+                old_file.unlink()
+            except OSError as e:
+                logger.warning(f"Não foi possível remover profile antigo {old_file}: {e}")
+
+    def start_tracemalloc(self, frames: int = 25) -> None:
+        """
+        Inicia o tracemalloc (se necessário) e captura a linha de base.
+
+        Args:
+            frames: Profundidade do traceback armazenado para cada alocação
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._tracemalloc_baseline = tracemalloc.take_snapshot()
+        logger.info("Linha de base do tracemalloc capturada")
+
+    def tracemalloc_diff(self, limit: int = 20, reset_baseline: bool = False) -> List[Dict[str, Any]]:
+        """
+        Compara um novo snapshot com a linha de base.
+
+        Args:
+            limit: Número máximo de linhas retornadas (maiores crescimentos primeiro)
+            reset_baseline: Se o novo snapshot deve passar a ser a linha de base
+
+        Returns:
+            Lista com as diferenças por linha de código
+        """
+        if not tracemalloc.is_tracing() or self._tracemalloc_baseline is None:
+            raise RuntimeError("tracemalloc não iniciado")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        stats = snapshot.compare_to(self._tracemalloc_baseline, "lineno")
+        if reset_baseline:
+            self._tracemalloc_baseline = snapshot
+
+        return [
+            {
+                "location": str(stat.traceback[0]),
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in stats[:limit]
+        ]
+
+    def stop_tracemalloc(self) -> None:
+        """Interrompe o tracemalloc e descarta a linha de base."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._tracemalloc_baseline = None
+
+    def status(self) -> Dict[str, Any]:
+        """Retorna a configuração e o estado atual do profiler."""
+        traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            "sample_rate": self.sample_rate,
+            "output_dir": str(self.output_dir),
+            "max_files": self.max_files,
+            "profiled_requests": self.profiled_requests,
+            "last_profile_path": self.last_profile_path,
+            "tracemalloc_active": tracemalloc.is_tracing(),
+            "tracemalloc_current_bytes": traced[0],
+            "tracemalloc_peak_bytes": traced[1],
+        }
@@ -0,0 +1,346 @@
+"""
+Pool de projetos atendidos por um mesmo servidor MCP.
+
+Cada projeto tem seus próprios documentos e índice (um ContextManager e um
+PromptGenerator), mas todos compartilham uma única instância do modelo de
+embeddings. Os índices são carregados na primeira requisição ao projeto e os menos
+usados recentemente são descarregados quando a quantidade de projetos ou o tamanho
+estimado dos índices carregados excede o limite configurado. Cada projeto carregado
+tem seu próprio executor de indexação, encerrado quando o projeto é descarregado.
+
+Os projetos são configurados pela variável CONTEXT_GUIDE_PROJECTS, com pares
+"nome=raiz" separados por vírgula (ex: "api=/srv/api,web=/srv/web") ou com o caminho
+de um arquivo JSON que associa cada nome à raiz do projeto ou a um objeto com
+"docs_dir" e "db_dir". Para uma raiz, os documentos ficam em `<raiz>/docs` e o
+índice em `<raiz>/.context_guide`, como no servidor de projeto único.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from context_guide.context import ContextManager
+from context_guide.indexing import IndexingExecutor
+from context_guide.prompt_generator import PromptGenerator
+
+logger = logging.getLogger(__name__)
+
+# Quantidade máxima padrão de projetos carregados ao mesmo tempo
+DEFAULT_MAX_PROJECTS = 8
+
+# Orçamento padrão (em MB) para o tamanho somado dos índices carregados
+DEFAULT_MEMORY_BUDGET_MB = 1024
+
+# Função que cria o ContextManager de um projeto (docs_dir, db_dir, embed_model)
+ManagerFactory = Callable[[str, str, Any], Any]
+
+
+class UnknownProjectError(KeyError):
+    """O projeto solicitado não está configurado."""
+
+
+def parse_projects(spec: str) -> Dict[str, Dict[str, str]]:
+    """
+    Converte a configuração de projetos em diretórios de documentos e de índice.
+
+    Args:
+        spec: Pares "nome=raiz" separados por vírgula, ou caminho de um arquivo JSON
+
+    Returns:
+        Dicionário nome -> {"docs_dir": ..., "db_dir": ...}
+
+    Raises:
+        ValueError: Se a configuração for inválida
+    """
+    spec = spec.strip()
+    if not spec:
+        return {}
+
+    if "=" not in spec and Path(spec).is_file():
+        with open(spec, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, dict):
+            raise ValueError(f"O arquivo de projetos '{spec}' deve conter um objeto JSON")
+    else:
+        entries = {}
+        for item in spec.split(","):
+            if not item.strip():
+                continue
+            name, separator, root = item.partition("=")
+            if not separator or not name.strip() or not root.strip():
+                raise ValueError(f"Projeto inválido: '{item}' (use nome=raiz)")
+            entries[name.strip()] = root.strip()
+
+    projects = {}
+    for name, entry in entries.items():
+        if isinstance(entry, str):
+            root = Path(entry)
+            projects[name] = {"docs_dir": str(root / "docs"), "db_dir": str(root / ".context_guide")}
+        elif isinstance(entry, dict) and "docs_dir" in entry:
+            docs_dir = Path(entry["docs_dir"])
+            db_dir = entry.get("db_dir") or str(docs_dir.parent / ".context_guide")
+            projects[name] = {"docs_dir": str(docs_dir), "db_dir": str(db_dir)}
+        else:
+            raise ValueError(f"Configuração inválida para o projeto '{name}'")
+    return projects
+
+
+def _index_size(context_manager: Any) -> int:
+    """Tamanho estimado do índice carregado (tamanho em disco do banco do projeto)."""
+    try:
+        return int(context_manager.get_index_stats().get("size_bytes", 0))
+    except Exception as e:
+        logger.warning(f"Não foi possível estimar o tamanho do índice: {e}")
+        return 0
+
+
+class Project:
+    """Serviços carregados de um projeto."""
+
+    def __init__(self, name: str, context_manager: Any, prompt_generator: PromptGenerator, size_bytes: int):
+        self.name = name
+        self.context_manager = context_manager
+        self.prompt_generator = prompt_generator
+        self.size_bytes = size_bytes
+        # Reconstruções do índice do projeto, uma por vez e na faixa de baixa prioridade
+        self.indexing_executor = IndexingExecutor(context_manager)
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        # Requisições em andamento; um projeto descarregado só é fechado quando chega a zero
+        self.users = 0
+        self.evicted = False
+
+    def close(self) -> None:
+        """Encerra o executor de indexação e libera o índice do projeto."""
+        self.indexing_executor.stop()
+        close = getattr(self.context_manager, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar o índice do projeto '{self.name}': {e}")
+
+
+class ProjectPool:
+    """Mantém carregados os índices dos projetos usados mais recentemente."""
+
+    def __init__(self, projects: Dict[str, Dict[str, str]], embed_model: Any = None,
+                 max_projects: int = DEFAULT_MAX_PROJECTS, max_bytes: Optional[int] = None,
+                 manager_factory: Optional[ManagerFactory] = None):
+        """
+        Inicializa o pool (nenhum índice é carregado até ser solicitado).
+
+        Args:
+            projects: Dicionário nome -> {"docs_dir": ..., "db_dir": ...}
+            embed_model: Modelo de embeddings compartilhado por todos os projetos
+                (instância ou nome; resolvido uma única vez)
+            max_projects: Quantidade máxima de projetos carregados
+            max_bytes: Tamanho máximo somado dos índices carregados (None: sem limite)
+            manager_factory: Função que cria o ContextManager de um projeto
+                (padrão: ContextManager; usado em testes)
+        """
+        self.projects = dict(projects)
+        self.max_projects = max(max_projects, 1)
+        self.max_bytes = max_bytes
+        self.manager_factory = manager_factory or (
+            lambda docs_dir, db_dir, model: ContextManager(docs_dir=docs_dir, db_dir=db_dir, embed_model=model)
+        )
+        self.embed_model = embed_model
+        if manager_factory is None and (embed_model is None or isinstance(embed_model, str)):
+            from context_guide.embeddings import resolve_embed_model
+            self.embed_model = resolve_embed_model(embed_model or os.environ.get("CONTEXT_GUIDE_EMBED_MODEL"))
+
+        self._loaded: "OrderedDict[str, Project]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in self.projects}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0, "load_failures": 0}
+
+    @classmethod
+    def from_env(cls, embed_model: Any = None) -> Optional["ProjectPool"]:
+        """
+        Cria o pool a partir das variáveis de ambiente.
+
+        Variáveis: CONTEXT_GUIDE_PROJECTS (projetos), CONTEXT_GUIDE_MAX_PROJECTS
+        (projetos carregados) e CONTEXT_GUIDE_PROJECTS_MEMORY_MB (orçamento dos índices;
+        0 desativa o limite por tamanho).
+
+        Args:
+            embed_model: Modelo de embeddings já carregado pelo servidor
+
+        Returns:
+            ProjectPool, ou None se nenhum projeto estiver configurado
+        """
+        projects = parse_projects(os.environ.get("CONTEXT_GUIDE_PROJECTS", ""))
+        if not projects:
+            return None
+        max_projects = int(os.environ.get("CONTEXT_GUIDE_MAX_PROJECTS", DEFAULT_MAX_PROJECTS))
+        budget_mb = float(os.environ.get("CONTEXT_GUIDE_PROJECTS_MEMORY_MB", DEFAULT_MEMORY_BUDGET_MB))
+        max_bytes = int(budget_mb * 1024 * 1024) if budget_mb > 0 else None
+        return cls(projects, embed_model=embed_model, max_projects=max_projects, max_bytes=max_bytes)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.projects
+
+    @contextmanager
+    def acquire(self, name: str) -> Iterator[Project]:
+        """
+        Fornece os serviços de um projeto, carregando seu índice se necessário.
+
+        Enquanto o bloco estiver em execução, o projeto não é fechado, mesmo que seja
+        descarregado por outra requisição.
+
+        Args:
+            name: Nome do projeto
+
+        Yields:
+            Project com o ContextManager e o PromptGenerator do projeto
+
+        Raises:
+            UnknownProjectError: Se o projeto não estiver configurado
+        """
+        project = self.get(name)
+        try:
+            yield project
+        finally:
+            self.release(project)
+
+    def get(self, name: str) -> Project:
+        """
+        Reserva um projeto, carregando seu índice se necessário.
+
+        Cada chamada deve ser seguida de `release`; prefira `acquire`.
+
+        Args:
+            name: Nome do projeto
+
+        Returns:
+            Project reservado para o chamador
+
+        Raises:
+            UnknownProjectError: Se o projeto não estiver configurado
+        """
+        if name not in self.projects:
+            raise UnknownProjectError(name)
+
+        project = self._reserve(name)
+        if project is not None:
+            return project
+
+        # Carregamentos de projetos diferentes ocorrem em paralelo; do mesmo projeto, uma única vez
+        with self._load_locks[name]:
+            project = self._reserve(name)
+            if project is not None:
+                return project
+            project = self._load(name)
+            with self._lock:
+                project.users += 1
+                self._loaded[name] = project
+                evicted = self._evict_over_budget(keep=name)
+        for victim in evicted:
+            victim.close()
+        return project
+
+    def release(self, project: Project) -> None:
+        """Libera a reserva de um projeto, fechando-o se já tiver sido descarregado."""
+        with self._lock:
+            project.users -= 1
+            close = project.evicted and project.users == 0
+        if close:
+            project.close()
+
+    def _reserve(self, name: str) -> Optional[Project]:
+        """Marca um projeto já carregado como em uso e o torna o mais recente."""
+        with self._lock:
+            project = self._loaded.get(name)
+            if project is None:
+                return None
+            self._loaded.move_to_end(name)
+            project.users += 1
+            project.last_used = time.time()
+            self.stats["hits"] += 1
+            return project
+
+    def _load(self, name: str) -> Project:
+        """Carrega (ou cria) o índice de um projeto."""
+        config = self.projects[name]
+        logger.info(f"Carregando projeto '{name}' com documentos em '{config['docs_dir']}'")
+        start_time = time.perf_counter()
+        try:
+            context_manager = self.manager_factory(config["docs_dir"], config["db_dir"], self.embed_model)
+        except Exception:
+            self.stats["load_failures"] += 1
+            raise
+        project = Project(name, context_manager, PromptGenerator(context_manager), _index_size(context_manager))
+        self.stats["loads"] += 1
+        logger.info(f"Projeto '{name}' carregado em {time.perf_counter() - start_time:.2f}s "
+                    f"({project.size_bytes / (1024 * 1024):.1f} MB)")
+        return project
+
+    def _loaded_bytes(self) -> int:
+        return sum(project.size_bytes for project in self._loaded.values())
+
+    def _evict_over_budget(self, keep: str) -> list:
+        """
+        Descarrega os projetos menos usados até respeitar os limites (chamado com o lock).
+
+        O projeto `keep` nunca é descarregado, mesmo que sozinho exceda o orçamento.
+        Projetos com requisições em andamento saem do pool mas só são fechados
+        quando a última delas terminar.
+
+        Returns:
+            Projetos que podem ser fechados imediatamente
+        """
+        to_close = []
+        while len(self._loaded) > 1 and (
+                len(self._loaded) > self.max_projects
+                or (self.max_bytes is not None and self._loaded_bytes() > self.max_bytes)):
+            victim_name = next(name for name in self._loaded if name != keep)
+            victim = self._loaded.pop(victim_name)
+            victim.evicted = True
+            self.stats["evictions"] += 1
+            logger.info(f"Descarregando projeto '{victim_name}' (menos usado recentemente)")
+            if victim.users == 0:
+                to_close.append(victim)
+        return to_close
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Retorna o estado do pool para monitoramento.
+
+        Returns:
+            Dicionário com projetos configurados, projetos carregados, limites e contadores
+        """
+        with self._lock:
+            return {
+                "configured": sorted(self.projects),
+                "loaded": {
+                    name: {
+                        "size_bytes": project.size_bytes,
+                        "loaded_at": project.loaded_at,
+                        "last_used": project.last_used,
+                        "in_use": project.users,
+                    }
+                    for name, project in self._loaded.items()
+                },
+                "loaded_bytes": self._loaded_bytes(),
+                "max_projects": self.max_projects,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
+
+    def close(self) -> None:
+        """Descarrega todos os projetos."""
+        with self._lock:
+            projects = list(self._loaded.values())
+            self._loaded.clear()
+            for project in projects:
+                project.evicted = True
+        for project in projects:
+            if project.users == 0:
+                project.close()
@@ -0,0 +1,201 @@
+"""
+Serialização rápida de respostas JSON e compressão negociada para o servidor MCP.
+
+Respostas de `/context` carregam o texto integral de cada fonte e podem chegar a
+centenas de kilobytes; este módulo oferece uma classe de resposta baseada em orjson
+(com fallback para o módulo json) e um middleware ASGI que comprime com zstd ou gzip,
+conforme o cabeçalho Accept-Encoding, as respostas acima de um tamanho mínimo.
+"""
+
+import gzip
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Respostas menores que isso não compensam o custo da compressão
+DEFAULT_MINIMUM_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_ZSTD_LEVEL = 3
+
+# Tipos que já são comprimidos ou que precisam chegar ao cliente sem buffering
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "image/", "application/zip", "application/gzip")
+
+
+def _default(value: Any) -> Any:
+    """Converte valores não suportados nativamente (ex: escalares numpy)."""
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializa um objeto para JSON em bytes (UTF-8).
+
+    Args:
+        content: Objeto a serializar
+
+    Returns:
+        JSON compacto em bytes
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Resposta JSON serializada com orjson quando disponível."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def available_encodings() -> List[str]:
+    """Retorna as codificações suportadas, na ordem de preferência."""
+    return ["zstd", "gzip"] if ZSTD_AVAILABLE else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str, supported: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Escolhe a codificação de compressão a partir do cabeçalho Accept-Encoding.
+
+    Args:
+        accept_encoding: Valor do cabeçalho Accept-Encoding da requisição
+        supported: Codificações suportadas em ordem de preferência (padrão: available_encodings())
+
+    Returns:
+        Codificação escolhida ou None se nenhuma for aceita
+    """
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    candidates = [
+        encoding for encoding in (supported or available_encodings())
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0
+    ]
+    # Em caso de empate na qualidade, vale a ordem de preferência do servidor
+    candidates.sort(key=lambda encoding: -accepted.get(encoding, accepted.get("*", 0.0)))
+    return candidates[0] if candidates else None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = DEFAULT_GZIP_LEVEL,
+             zstd_level: int = DEFAULT_ZSTD_LEVEL) -> bytes:
+    """
+    Comprime um corpo de resposta.
+
+    Args:
+        body: Conteúdo original
+        encoding: "gzip" ou "zstd"
+        gzip_level: Nível de compressão do gzip
+        zstd_level: Nível de compressão do zstd
+
+    Returns:
+        Conteúdo comprimido
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(body)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime respostas com zstd ou gzip acima de um tamanho mínimo.
+
+    Apenas respostas enviadas em uma única mensagem são comprimidas; respostas em
+    streaming (como `/prompt/stream`) são repassadas sem alteração para não atrasar
+    a entrega de cada evento.
+    """
+
+    def __init__(self, app, minimum_size: int = DEFAULT_MINIMUM_SIZE,
+                 gzip_level: int = DEFAULT_GZIP_LEVEL, zstd_level: int = DEFAULT_ZSTD_LEVEL):
+        """
+        Inicializa o middleware.
+
+        Args:
+            app: Aplicação ASGI
+            minimum_size: Tamanho mínimo (bytes) para comprimir uma resposta
+            gzip_level: Nível de compressão do gzip
+            zstd_level: Nível de compressão do zstd
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                # Adiar o início até conhecer o corpo
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            if (message.get("more_body", False)
+                    or "content-encoding" in headers
+                    or len(body) < self.minimum_size
+                    or content_type.startswith(EXCLUDED_CONTENT_TYPES)):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding, self.gzip_level, self.zstd_level)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
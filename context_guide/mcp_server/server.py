@@ -3,20 +3,35 @@ Implementação do servidor MCP (Model Control Panel) para fornecer contexto ao
 Utiliza FastAPI para criar endpoints RESTful para consulta de contexto.
 """
 
+import hashlib
+import hmac
 import logging
 import os
 import time
 import json
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any, Optional, List
-from fastapi import FastAPI, HTTPException, Body, Query, Request
+from typing import Dict, Any, AsyncIterator, Optional, List, Tuple
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Body, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 
+from context_guide.concurrency import SingleFlight
 from context_guide.context import ContextManager
-from context_guide.prompt_generator import PromptGenerator
+from context_guide.indexing import IndexingExecutor
+from context_guide.metadata import filters_key
+from context_guide.prompt_generator import PromptGenerator, BEST_PRACTICES_SECTION
+from context_guide.timing import StageTimer
+from context_guide.packing import estimate_tokens
+from context_guide.mcp_server.admission import AdmissionController, AdmissionMiddleware
+from context_guide.mcp_server.cursor_integration import AsyncCursorIntegration
+from context_guide.mcp_server.metrics import MetricsRegistry, CONTENT_TYPE_LATEST
+from context_guide.mcp_server.profiling import RequestProfiler
+from context_guide.mcp_server.projects import ProjectPool, UnknownProjectError
+from context_guide.mcp_server.responses import FastJSONResponse, CompressionMiddleware, DEFAULT_MINIMUM_SIZE
 
 # Configuração de logging avançada
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -35,28 +50,67 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Modelos de dados
+class ContextFilters(BaseModel):
+    """Filtros de metadados que restringem a busca no índice."""
+    path_prefix: Optional[str] = None
+    template_group: Optional[str] = None
+    file_name: Optional[str] = None
+    heading: Optional[str] = None
+
 class ContextRequest(BaseModel):
     """Modelo para requisições de contexto."""
     query: str
     num_results: int = 5
     technology_context: Optional[str] = None
+    project: Optional[str] = None
+    filters: Optional[ContextFilters] = None
 
 class PromptRequest(BaseModel):
     """Modelo para requisições de geração de prompt."""
     request: str
     technology_context: Optional[str] = None
     include_best_practices: bool = True
+    max_tokens: Optional[int] = None
+    compress: Optional[bool] = None
+    project: Optional[str] = None
+    filters: Optional[ContextFilters] = None
+
+class PromptSendRequest(PromptRequest):
+    """Modelo para gerar um prompt e encaminhá-lo ao Cursor IDE em uma única requisição."""
+    file_path: Optional[str] = None
+    conversation_id: Optional[str] = None
 
 class ContextResponse(BaseModel):
     """Modelo para respostas com contexto."""
     context: str
     sources: List[Dict[str, Any]]
     retrieval_time: Optional[float] = None
+    timings: Optional[Dict[str, float]] = None
 
 class PromptResponse(BaseModel):
     """Modelo para respostas com prompt."""
     prompt: str
     generation_time: Optional[float] = None
+    cached: bool = False
+    timings: Optional[Dict[str, float]] = None
+    packing: Optional[Dict[str, Any]] = None
+    compression: Optional[Dict[str, Any]] = None
+
+class PromptSendResponse(BaseModel):
+    """Modelo para a resposta do encaminhamento de prompt (o envio ocorre em segundo plano)."""
+    status: str
+    prompt_chars: int
+    generation_time: Optional[float] = None
+    cached: bool = False
+
+class ProfilingConfigRequest(BaseModel):
+    """Modelo para alterar a configuração do profiler em tempo de execução."""
+    sample_rate: Optional[float] = None
+    max_files: Optional[int] = None
+
+class TracemallocStartRequest(BaseModel):
+    """Modelo para iniciar a captura do tracemalloc."""
+    frames: int = 25
 
 class ServerStatsResponse(BaseModel):
     """Modelo para estatísticas do servidor."""
@@ -66,6 +120,11 @@ class ServerStatsResponse(BaseModel):
     prompt_requests: int
     update_requests: int
     avg_response_time: float
+    stage_timings: Dict[str, Dict[str, float]] = {}
+    indexing: Dict[str, Any] = {}
+    projects: Dict[str, Any] = {}
+    coalesced: Dict[str, int] = {}
+    admission: Dict[str, Dict[str, Any]] = {}
 
 # Métricas do servidor
 server_metrics = {
@@ -74,14 +133,59 @@ server_metrics = {
     "context_requests": 0,
     "prompt_requests": 0, 
     "update_requests": 0,
-    "response_times": []
+    "response_times": [],
+    "stage_timings": {}
 }
 
+# Métricas no formato Prometheus/OpenMetrics (endpoint /metrics)
+metrics_registry = MetricsRegistry()
+http_requests_total = metrics_registry.counter(
+    "context_guide_http_requests_total",
+    "Total de requisições HTTP atendidas",
+    ("endpoint", "method", "status")
+)
+http_request_duration = metrics_registry.histogram(
+    "context_guide_http_request_duration_seconds",
+    "Latência das requisições HTTP por endpoint",
+    ("endpoint",)
+)
+http_requests_in_flight = metrics_registry.gauge(
+    "context_guide_http_requests_in_flight",
+    "Requisições HTTP em andamento"
+)
+cursor_forwards_total = metrics_registry.counter(
+    "context_guide_cursor_forwards_total",
+    "Prompts encaminhados ao Cursor IDE pelo servidor",
+    ("status",)
+)
+stage_duration = metrics_registry.histogram(
+    "context_guide_stage_duration_seconds",
+    "Tempo gasto em cada etapa das operações de contexto e prompt",
+    ("operation", "stage")
+)
+
+def _record_stage_timings(operation: str, timings: Dict[str, float]) -> None:
+    """
+    Agrega os tempos por etapa de uma requisição nas estatísticas do servidor.
+    
+    Args:
+        operation: Operação que gerou os tempos (context, prompt)
+        timings: Dicionário etapa -> segundos
+    """
+    aggregated = server_metrics["stage_timings"]
+    for stage, seconds in timings.items():
+        stage_duration.labels(operation, stage).observe(seconds)
+        entry = aggregated.setdefault(f"{operation}.{stage}", {"count": 0, "total": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+
 # Criar a aplicação FastAPI
 app = FastAPI(
     title="Context Guide MCP Server",
     description="Serviço de API para fornecer contexto de documentação para o Cursor IDE",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configuração de CORS
@@ -93,13 +197,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão negociada (zstd/gzip) das respostas grandes; um valor negativo desativa
+COMPRESSION_MIN_SIZE = int(os.environ.get("CONTEXT_GUIDE_COMPRESSION_MIN_SIZE", DEFAULT_MINIMUM_SIZE))
+if COMPRESSION_MIN_SIZE >= 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Limites de requisições simultâneas e em fila por endpoint (429 com Retry-After ao saturar)
+admission_controller = AdmissionController.from_env()
+if admission_controller.enabled:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
 # Middleware para métricas
 @app.middleware("http")
 async def metrics_middleware(request: Request, call_next):
     """Middleware para coletar métricas de requisições."""
     start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+    http_requests_in_flight.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        http_requests_in_flight.dec()
+        process_time = time.time() - start_time
+        # Usar o caminho da rota para evitar cardinalidade ilimitada de labels
+        route = request.scope.get("route")
+        endpoint_label = getattr(route, "path", "other")
+        http_request_duration.labels(endpoint_label).observe(process_time)
+        http_requests_total.labels(endpoint_label, request.method, str(status_code)).inc()
     
     # Atualizar métricas
     server_metrics["total_requests"] += 1
@@ -109,7 +234,7 @@ async def metrics_middleware(request: Request, call_next):
     endpoint = request.url.path
     if endpoint == "/context":
         server_metrics["context_requests"] += 1
-    elif endpoint == "/prompt":
+    elif endpoint in ("/prompt", "/prompt/stream", "/prompt/send"):
         server_metrics["prompt_requests"] += 1
     elif endpoint == "/update-index":
         server_metrics["update_requests"] += 1
@@ -122,25 +247,167 @@ async def metrics_middleware(request: Request, call_next):
 # Estado compartilhado para a aplicação
 context_manager = None
 prompt_generator = None
+indexing_executor = None
+cursor_client = None
+project_pool = None
+request_profiler = RequestProfiler()
+
+# Requisições idênticas simultâneas compartilham uma única consulta ao índice
+context_flight = SingleFlight()
+prompt_flight = SingleFlight()
+
+# Estatísticas do índice são reaproveitadas por todas as métricas de um mesmo scrape
+_index_stats_cache = {"timestamp": 0.0, "stats": {}}
+INDEX_STATS_TTL = 1.0
+
+def _collect_index_stats() -> Dict[str, Any]:
+    """Obtém estatísticas do índice no momento do scrape."""
+    if not context_manager:
+        return {}
+    now = time.time()
+    if now - _index_stats_cache["timestamp"] > INDEX_STATS_TTL:
+        _index_stats_cache["stats"] = context_manager.get_index_stats()
+        _index_stats_cache["timestamp"] = now
+    return _index_stats_cache["stats"]
+
+def _index_metric(key: str):
+    """Cria uma função de coleta para um campo das estatísticas do índice."""
+    def collect():
+        stats = _collect_index_stats()
+        return {(): stats[key]} if key in stats else {}
+    return collect
+
+def _collect_cache_stats() -> Dict[tuple, float]:
+    """Coleta contadores de acertos/falhas dos caches conhecidos pelo servidor."""
+    samples = {}
+    for cache_name, stats in _cache_stats().items():
+        samples[(cache_name, "hit")] = stats.get("hits", 0)
+        samples[(cache_name, "miss")] = stats.get("misses", 0)
+    return samples
+
+def _cache_stats() -> Dict[str, Dict[str, int]]:
+    """Retorna as estatísticas de cada cache, indexadas pelo nome do cache."""
+    if not isinstance(prompt_generator, PromptGenerator):
+        return {}
+    return {
+        "prompt": prompt_generator.cache.stats,
+        "sentence_embedding": prompt_generator.compressor.stats,
+    }
+
+metrics_registry.callback(
+    "context_guide_cache_requests_total",
+    "Consultas aos caches do servidor por resultado (hit/miss)",
+    "counter", _collect_cache_stats, ("cache", "result")
+)
+metrics_registry.callback(
+    "context_guide_coalesced_requests_total",
+    "Requisições atendidas pelo resultado de uma requisição idêntica em andamento",
+    "counter", lambda: {("context",): context_flight.stats["coalesced"],
+                        ("prompt",): prompt_flight.stats["coalesced"]},
+    ("operation",)
+)
+def _admission_metric(field: str):
+    """Cria uma função de coleta para um campo do estado de admissão de cada endpoint."""
+    def collect():
+        return {(path,): lane[field] for path, lane in admission_controller.status().items()}
+    return collect
+
+def _collect_admission_rejections() -> Dict[tuple, float]:
+    """Coleta as rejeições de cada endpoint por motivo (fila cheia ou espera esgotada)."""
+    samples = {}
+    for path, lane in admission_controller.status().items():
+        samples[(path, "queue_full")] = lane["rejected_queue_full"]
+        samples[(path, "timeout")] = lane["rejected_timeout"]
+    return samples
+
+metrics_registry.callback(
+    "context_guide_admission_in_flight", "Requisições admitidas em execução por endpoint",
+    "gauge", _admission_metric("active"), ("endpoint",)
+)
+metrics_registry.callback(
+    "context_guide_admission_queue_depth", "Requisições aguardando admissão por endpoint",
+    "gauge", _admission_metric("queue_depth"), ("endpoint",)
+)
+metrics_registry.callback(
+    "context_guide_admission_rejected_total",
+    "Requisições rejeitadas com 429 por endpoint e motivo",
+    "counter", _collect_admission_rejections, ("endpoint", "reason")
+)
+metrics_registry.callback(
+    "context_guide_index_chunks", "Número de chunks armazenados no índice",
+    "gauge", _index_metric("chunks")
+)
+metrics_registry.callback(
+    "context_guide_index_size_bytes", "Tamanho do índice em disco (bytes)",
+    "gauge", _index_metric("size_bytes")
+)
+metrics_registry.callback(
+    "context_guide_index_last_build_duration_seconds", "Duração da última construção do índice",
+    "gauge", _index_metric("last_build_seconds")
+)
+metrics_registry.callback(
+    "context_guide_index_last_build_timestamp_seconds", "Momento (epoch) da última construção do índice",
+    "gauge", _index_metric("last_build_timestamp")
+)
+metrics_registry.callback(
+    "context_guide_embedding_throughput_chunks_per_second",
+    "Chunks embutidos por segundo na última construção do índice",
+    "gauge", _index_metric("chunks_per_second")
+)
+metrics_registry.callback(
+    "context_guide_uptime_seconds", "Tempo desde a inicialização do servidor",
+    "gauge", lambda: {(): time.time() - server_metrics["start_time"]}
+)
 
 @app.on_event("startup")
 async def startup_event():
     """Inicializar serviços na inicialização do servidor."""
-    global context_manager, prompt_generator
+    global context_manager, prompt_generator, indexing_executor, request_profiler, project_pool
     
     # Obter configurações do ambiente ou usar valores padrão
     docs_dir = os.environ.get("CONTEXT_GUIDE_DOCS_DIR", "docs")
     db_dir = os.environ.get("CONTEXT_GUIDE_DB_DIR", ".context_guide")
     
+    request_profiler = RequestProfiler.from_env()
+    if request_profiler.enabled:
+        logger.info(f"Profiling ativo para {request_profiler.sample_rate:.1%} das requisições "
+                    f"em '{request_profiler.output_dir}'")
+    
+    if context_manager is not None:
+        # Serviços já fornecidos pelo processo que iniciou o servidor (modo multi-worker)
+        if os.environ.get("CONTEXT_GUIDE_PROJECTS"):
+            logger.warning("CONTEXT_GUIDE_PROJECTS é ignorado no modo multi-worker")
+        logger.info("Servidor MCP inicializado com o índice compartilhado")
+        return
+    
     try:
         logger.info(f"Inicializando ContextManager com documentos em '{docs_dir}' e DB em '{db_dir}'")
         context_manager = ContextManager(docs_dir=docs_dir, db_dir=db_dir)
         prompt_generator = PromptGenerator(context_manager)
+        if context_manager.llama_available:
+            # Alterações feitas com o servidor parado são aplicadas em segundo plano
+            # enquanto o índice existente continua atendendo as consultas
+            indexing_executor = IndexingExecutor(context_manager)
+            indexing_executor.reconcile()
+            # Projetos adicionais compartilham o modelo de embeddings já carregado
+            project_pool = ProjectPool.from_env(embed_model=context_manager.embed_model)
+            if project_pool is not None:
+                logger.info(f"Projetos disponíveis: {', '.join(project_pool.info()['configured'])}")
         logger.info("Servidor MCP inicializado com sucesso")
     except Exception as e:
         logger.error(f"Erro ao inicializar servidor MCP: {e}")
         raise e
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Encerrar o executor de indexação, descarregar os projetos e fechar o cliente do Cursor."""
+    if indexing_executor is not None:
+        indexing_executor.stop()
+    if project_pool is not None:
+        project_pool.close()
+    if cursor_client is not None:
+        await cursor_client.aclose()
+
 @app.get("/")
 async def root():
     """Endpoint raiz para verificar se o serviço está rodando."""
@@ -151,116 +418,398 @@ async def root():
         "version": "0.1.0"
     }
 
+@asynccontextmanager
+async def _project_services(
+        project: Optional[str]) -> AsyncIterator[Tuple[Any, Any, Optional[IndexingExecutor]]]:
+    """
+    Fornece o ContextManager, o PromptGenerator e o executor de indexação do projeto da requisição.
+    
+    Sem projeto, usa os serviços do diretório configurado no servidor; com projeto,
+    o índice é obtido do pool (e carregado, se necessário) e não é descarregado
+    antes de o bloco terminar. O carregamento e a liberação rodam no threadpool,
+    para que a carga de um projeto não bloqueie o loop de eventos.
+    
+    Args:
+        project: Nome do projeto (None para o projeto padrão)
+        
+    Yields:
+        Tupla (context_manager, prompt_generator, indexing_executor); o executor é None
+        no projeto padrão quando o servidor não o utiliza (ex: modo multi-worker)
+    """
+    if project is None:
+        if not context_manager or not prompt_generator:
+            raise HTTPException(status_code=503, detail="Serviço não inicializado corretamente")
+        yield context_manager, prompt_generator, indexing_executor
+        return
+    
+    if project_pool is None or project not in project_pool:
+        raise HTTPException(status_code=404, detail=f"Projeto desconhecido: '{project}'")
+    try:
+        loaded = await run_in_threadpool(project_pool.get, project)
+    except UnknownProjectError:
+        raise HTTPException(status_code=404, detail=f"Projeto desconhecido: '{project}'")
+    except Exception as e:
+        logger.error(f"Erro ao carregar o projeto '{project}': {e}")
+        raise HTTPException(status_code=503, detail=f"Não foi possível carregar o projeto '{project}': {e}")
+    try:
+        yield loaded.context_manager, loaded.prompt_generator, loaded.indexing_executor
+    finally:
+        await run_in_threadpool(project_pool.release, loaded)
+
+# Diferencia ETags de execuções distintas do servidor (a versão do índice recomeça do zero)
+_ETAG_SEED = f"{os.getpid()}-{time.time()}"
+
+def _response_etag(key: tuple) -> str:
+    """ETag fraco derivado da chave de uma resposta (parâmetros e versão do índice)."""
+    digest = hashlib.sha1(f"{_ETAG_SEED}{key!r}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _request_filters(filters: Optional[ContextFilters]) -> Dict[str, str]:
+    """Filtros de metadados informados na requisição."""
+    return filters.model_dump(exclude_none=True) if filters is not None else {}
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Verifica se o ETag consta do cabeçalho If-None-Match."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
 @app.post("/context", response_model=ContextResponse)
-async def get_context(request: ContextRequest):
+async def get_context(request: ContextRequest, http_request: Request, timings: bool = Query(False)):
     """
     Endpoint para obter contexto relevante para uma consulta.
     
+    A resposta traz um ETag derivado da consulta, dos parâmetros e da versão do
+    índice; se o cliente o reenviar em If-None-Match, a resposta é 304 sem corpo
+    enquanto o índice não mudar. A consulta roda fora do loop de eventos, e consultas
+    idênticas simultâneas compartilham uma única busca.
+    
     Args:
         request: Modelo com a consulta e número de resultados desejados
+        http_request: Requisição HTTP (cabeçalho If-None-Match)
+        timings: Se deve incluir o tempo de cada etapa na resposta (?timings=1)
         
     Returns:
         ContextResponse com o contexto e fontes encontradas
     """
-    if not context_manager:
-        raise HTTPException(status_code=503, detail="Serviço não inicializado corretamente")
-    
-    try:
-        start_time = time.time()
-        tech_context = request.technology_context
-        
-        if tech_context:
-            logger.info(f"Recebida consulta com contexto de tecnologia '{tech_context}': '{request.query}'")
-            # Ajustar a consulta para incluir o contexto tecnológico
-            enhanced_query = f"{request.query} (em contexto de {tech_context})"
-        else:
-            logger.info(f"Recebida consulta: '{request.query}'")
-            enhanced_query = request.query
+    async with _project_services(request.project) as (manager, generator, _):
+        try:
+            start_time = time.time()
+            tech_context = request.technology_context
+            filters = _request_filters(request.filters)
             
-        result = context_manager.get_relevant_context(enhanced_query, request.num_results)
-        
-        # Adicionar tempo de processamento
-        retrieval_time = time.time() - start_time
-        result["retrieval_time"] = retrieval_time
-        
-        logger.info(f"Consulta processada em {retrieval_time:.4f}s, retornado {len(result.get('sources', []))} fontes")
-        return result
-    except Exception as e:
-        logger.error(f"Erro ao processar consulta: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+            if tech_context:
+                logger.info(f"Recebida consulta com contexto de tecnologia '{tech_context}': '{request.query}'")
+                # Preferência pelos chunks marcados com a tecnologia na indexação
+                filters["technology"] = tech_context
+            else:
+                logger.info(f"Recebida consulta: '{request.query}'")
+            
+            key = ("context", request.project, request.query, request.num_results, filters_key(filters),
+                   getattr(manager, "index_version", 0))
+            etag = _response_etag(key)
+            if _etag_matches(etag, http_request.headers.get("if-none-match")):
+                return Response(status_code=304, headers={"ETag": etag})
+            
+            def retrieve():
+                with request_profiler.profile("context"):
+                    if filters:
+                        return manager.get_relevant_context(request.query, request.num_results, filters=filters)
+                    return manager.get_relevant_context(request.query, request.num_results)
+            
+            shared_result, coalesced = await context_flight.do(key, lambda: run_in_threadpool(retrieve))
+            result = dict(shared_result)
+            stage_timings = result.pop("timings", None) or {}
+            if not coalesced:
+                _record_stage_timings("context", stage_timings)
+            
+            # Adicionar tempo de processamento
+            retrieval_time = time.time() - start_time
+            response = {
+                "context": result["context"],
+                "sources": result.get("sources", []),
+                "retrieval_time": retrieval_time,
+                "timings": stage_timings if timings else None,
+            }
+            
+            logger.info(f"Consulta processada em {retrieval_time:.4f}s, retornado {len(response['sources'])} fontes")
+            # Resposta serializada diretamente, sem a validação e conversão do response_model;
+            # respostas de consultas com erro não recebem ETag para não serem revalidadas
+            return FastJSONResponse(response, headers=None if result.get("error") else {"ETag": etag})
+        except Exception as e:
+            logger.error(f"Erro ao processar consulta: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/prompt", response_model=PromptResponse)
-async def generate_prompt(request: PromptRequest):
+async def generate_prompt(request: PromptRequest, http_request: Request, timings: bool = Query(False)):
     """
     Endpoint para gerar um prompt enriquecido com contexto.
     
+    Prompts idênticos são servidos do cache do gerador até a próxima alteração do
+    índice, e solicitações idênticas simultâneas compartilham uma única geração. A
+    resposta traz um ETag; se o cliente o reenviar em If-None-Match e o prompt não
+    tiver mudado, a resposta é 304 sem corpo.
+    
     Args:
         request: Modelo com a solicitação do usuário
+        http_request: Requisição HTTP (cabeçalho If-None-Match)
+        timings: Se deve incluir o tempo de cada etapa na resposta (?timings=1)
         
     Returns:
         PromptResponse com o prompt gerado
     """
-    if not prompt_generator:
-        raise HTTPException(status_code=503, detail="Serviço não inicializado corretamente")
+    async with _project_services(request.project) as (manager, generator, _):
+        try:
+            start_time = time.time()
+            
+            if request.technology_context:
+                logger.info(f"Gerando prompt para '{request.request}' com tecnologia '{request.technology_context}'")
+            else:
+                logger.info(f"Gerando prompt para: '{request.request}'")
+            
+            options = _prompt_options(request)
+            key = ("prompt", request.project) + generator.cache_key(request.request, **options)
+            etag = _response_etag(key)
+            if _etag_matches(etag, http_request.headers.get("if-none-match")):
+                return Response(status_code=304, headers={"ETag": etag})
+            
+            timer = StageTimer()
+            
+            def build():
+                with request_profiler.profile("prompt"):
+                    return generator.build_prompt(request.request, timer=timer, **options)
+            
+            result, coalesced = await prompt_flight.do(key, lambda: run_in_threadpool(build))
+            prompt = result["prompt"]
+            
+            generation_time = time.time() - start_time
+            # Requisições atendidas pela geração de outra não têm tempos próprios por etapa
+            stage_timings = timer.as_dict()
+            if not coalesced:
+                _record_stage_timings("prompt", stage_timings)
+            
+            logger.info(f"Prompt gerado em {generation_time:.4f}s com {len(prompt)} caracteres")
+            response = {
+                "prompt": prompt,
+                "generation_time": generation_time,
+                "timings": stage_timings if timings else None,
+                "packing": result.get("packing"),
+                "compression": result.get("compression"),
+                "cached": bool(result.get("cached")),
+            }
+            return FastJSONResponse(response, headers=None if result.get("error") else {"ETag": etag})
+        except Exception as e:
+            logger.error(f"Erro ao gerar prompt: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _prompt_options(request: PromptRequest) -> Dict[str, Any]:
+    """Opções de `PromptGenerator.build_prompt` correspondentes à requisição."""
+    return {
+        "max_tokens": request.max_tokens,
+        "compress": request.compress,
+        "technology": request.technology_context,
+        "include_best_practices": request.include_best_practices,
+        "filters": _request_filters(request.filters) or None,
+    }
+
+def _get_cursor_client() -> AsyncCursorIntegration:
+    """Cliente assíncrono da API do Cursor usado pelo servidor, criado no primeiro encaminhamento."""
+    global cursor_client
+    if cursor_client is None:
+        cursor_client = AsyncCursorIntegration(cache_size=0)
+    return cursor_client
+
+async def _forward_to_cursor(prompt: str, file_path: Optional[str], conversation_id: Optional[str]) -> None:
+    """Envia o prompt ao Cursor IDE (executado no loop de eventos, após a resposta)."""
+    sent = await _get_cursor_client().send_context_to_cursor(prompt, file_path=file_path,
+                                                             conversation_id=conversation_id)
+    cursor_forwards_total.labels("success" if sent else "error").inc()
+
+@app.post("/prompt/send", response_model=PromptSendResponse, status_code=202)
+async def send_prompt(request: PromptSendRequest, background_tasks: BackgroundTasks):
+    """
+    Endpoint para gerar um prompt com contexto e encaminhá-lo ao Cursor IDE.
+    
+    Substitui a sequência `/prompt` seguida do envio pelo cliente: o prompt é gerado
+    (usando o mesmo cache de `/prompt`, já com a seção da tecnologia) e enviado à API
+    do Cursor em segundo plano, depois que a resposta 202 é devolvida.
+    O token da API do Cursor é o do servidor (CURSOR_API_TOKEN).
+    
+    Args:
+        request: Modelo com a solicitação, opções do prompt e destino no Cursor
+        background_tasks: Tarefas executadas após o envio da resposta
+        
+    Returns:
+        PromptSendResponse com o tamanho do prompt agendado para envio
+    """
+    if not _get_cursor_client().token:
+        raise HTTPException(status_code=503, detail="Token de API do Cursor não configurado no servidor")
     
     try:
         start_time = time.time()
+        logger.info(f"Gerando prompt para encaminhar ao Cursor: '{request.request}'")
         
-        # Adicionar informações de tecnologia e práticas, se disponíveis
-        user_request = request.request
-        if request.technology_context:
-            tech_info = f" (tecnologia: {request.technology_context})"
-            user_request += tech_info
-            logger.info(f"Gerando prompt para '{request.request}' com tecnologia '{request.technology_context}'")
-        else:
-            logger.info(f"Gerando prompt para: '{request.request}'")
-        
-        prompt = prompt_generator.generate_prompt(user_request)
+        timer = StageTimer()
+        async with _project_services(request.project) as (_, generator, _):
+            options = _prompt_options(request)
+            key = ("prompt", request.project) + generator.cache_key(request.request, **options)
+            
+            def build():
+                with request_profiler.profile("prompt"):
+                    return generator.build_prompt(request.request, timer=timer, **options)
+            
+            # Mesma geração fora do loop e compartilhada com `/prompt` para solicitações idênticas
+            result, coalesced = await prompt_flight.do(key, lambda: run_in_threadpool(build))
+        if not coalesced:
+            _record_stage_timings("prompt", timer.as_dict())
         
-        # Adicionar melhores práticas se solicitado
-        if request.include_best_practices:
-            prompt += "\n\n## Melhores Práticas a Considerar\n"
-            prompt += "- Garantir que o código seja testável e mantenha princípios SOLID\n"
-            prompt += "- Incluir tratamento de erros apropriado\n"
-            prompt += "- Seguir os padrões de estilo e nomenclatura do projeto\n"
-            prompt += "- Implementar logging adequado para facilitar depuração\n"
+        if not result["prompt"]:
+            raise HTTPException(status_code=500, detail="Prompt gerado está vazio")
         
-        generation_time = time.time() - start_time
+        prompt = result["prompt"]
+        background_tasks.add_task(_forward_to_cursor, prompt, request.file_path, request.conversation_id)
         
-        logger.info(f"Prompt gerado em {generation_time:.4f}s com {len(prompt)} caracteres")
-        return {"prompt": prompt, "generation_time": generation_time}
+        return {
+            "status": "scheduled",
+            "prompt_chars": len(prompt),
+            "generation_time": time.time() - start_time,
+            "cached": bool(result.get("cached")),
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erro ao gerar prompt: {e}")
+        logger.error(f"Erro ao gerar prompt para o Cursor: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/update-index")
-async def update_index():
+def _prompt_budget(request: PromptRequest, generator: PromptGenerator) -> Optional[int]:
+    """Orçamento de tokens para o gerador, descontada a seção de melhores práticas."""
+    max_tokens = request.max_tokens if request.max_tokens is not None else generator.max_tokens
+    if max_tokens is None or not request.include_best_practices:
+        return max_tokens
+    return max(max_tokens - estimate_tokens(BEST_PRACTICES_SECTION), 0)
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formata um evento Server-Sent Events com dados em JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/prompt/stream")
+async def stream_prompt(request: PromptRequest):
     """
-    Endpoint para atualizar o índice de documentos.
+    Endpoint para gerar um prompt enriquecido com contexto via Server-Sent Events.
+    
+    O cabeçalho com a solicitação é enviado antes da consulta ao índice e cada seção
+    de contexto segue como um evento próprio, permitindo que o cliente comece a
+    exibir o prompt antes de ele estar completo. Eventos emitidos: header, section
+    (uma por fonte), footer, technology (se informada), best_practices (se
+    solicitado), done e error.
     
+    Args:
+        request: Modelo com a solicitação do usuário
+        
     Returns:
-        Dict com status da operação
+        StreamingResponse com media type text/event-stream
     """
-    if not context_manager:
+    if request.project is None and not prompt_generator:
         raise HTTPException(status_code=503, detail="Serviço não inicializado corretamente")
+    if request.project is not None and (project_pool is None or request.project not in project_pool):
+        raise HTTPException(status_code=404, detail=f"Projeto desconhecido: '{request.project}'")
     
-    try:
-        start_time = time.time()
-        logger.info("Iniciando atualização do índice de documentos")
-        
-        context_manager.update_index()
+    user_request = request.request
+    logger.info(f"Gerando prompt em streaming para: '{user_request}'")
+    
+    start_time = time.time()
+    timer = StageTimer()
+    outcome = {"length": 0, "completed": False}
+    
+    def events(generator: PromptGenerator):
+        # Gerador síncrono consumido no threadpool, sem bloquear o loop
+        try:
+            for part in generator.stream_prompt(user_request, timer=timer,
+                                                max_tokens=_prompt_budget(request, generator),
+                                                compress=request.compress,
+                                                filters=_request_filters(request.filters) or None,
+                                                technology=request.technology_context):
+                outcome["length"] += len(part["text"])
+                data = {key: value for key, value in part.items() if key != "event"}
+                yield _sse_event(part["event"], data)
+            
+            if request.include_best_practices:
+                outcome["length"] += len(BEST_PRACTICES_SECTION)
+                yield _sse_event("best_practices", {"text": BEST_PRACTICES_SECTION})
+        except Exception as e:
+            logger.error(f"Erro ao gerar prompt em streaming: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+            return
+        outcome["completed"] = True
+    
+    async def stream():
+        try:
+            async with _project_services(request.project) as (_, generator, _):
+                async for event in iterate_in_threadpool(events(generator)):
+                    yield event
+        except HTTPException as e:
+            logger.error(f"Erro ao gerar prompt em streaming: {e.detail}")
+            yield _sse_event("error", {"detail": e.detail})
+            return
+        if not outcome["completed"]:
+            return
         
-        update_time = time.time() - start_time
-        logger.info(f"Índice atualizado com sucesso em {update_time:.2f}s")
+        # Métricas atualizadas no loop de eventos, após o fim da geração
+        generation_time = time.time() - start_time
+        stage_timings = timer.as_dict()
+        _record_stage_timings("prompt_stream", stage_timings)
+        logger.info(f"Prompt transmitido em {generation_time:.4f}s com {outcome['length']} caracteres")
+        yield _sse_event("done", {"generation_time": generation_time, "length": outcome["length"],
+                                  "timings": stage_timings})
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Evita buffering em proxies (ex: nginx) para que cada evento chegue imediatamente
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/update-index")
+async def update_index(project: Optional[str] = Query(None)):
+    """
+    Endpoint para atualizar o índice de documentos.
+    
+    Args:
+        project: Projeto cujo índice será atualizado (?project=nome; padrão: o do servidor)
         
-        return {
-            "status": "success", 
-            "message": "Índice atualizado com sucesso",
-            "update_time": update_time
-        }
-    except Exception as e:
-        logger.error(f"Erro ao atualizar índice: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    Returns:
+        Dict com status da operação
+    """
+    async with _project_services(project) as (manager, _, executor):
+        try:
+            start_time = time.time()
+            logger.info("Iniciando atualização do índice de documentos")
+            
+            if executor is not None:
+                # Pela fila de indexação do projeto: a reconstrução roda na faixa de baixa
+                # prioridade, cedendo às consultas, e não concorre com outras reconstruções
+                # nem com atualizações do file watcher
+                job = executor.submit_full_rebuild()
+                last_run = await run_in_threadpool(job.wait)
+                if last_run["status"] == "error":
+                    raise RuntimeError(last_run["error"])
+                if last_run["status"] == "cancelled":
+                    raise RuntimeError("Reconstrução do índice cancelada")
+            else:
+                await run_in_threadpool(manager.update_index)
+            
+            update_time = time.time() - start_time
+            logger.info(f"Índice atualizado com sucesso em {update_time:.2f}s")
+            
+            return {
+                "status": "success", 
+                "message": "Índice atualizado com sucesso",
+                "update_time": update_time
+            }
+        except Exception as e:
+            logger.error(f"Erro ao atualizar índice: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/stats", response_model=ServerStatsResponse)
 async def get_server_stats():
@@ -279,9 +828,123 @@ async def get_server_stats():
         "context_requests": server_metrics["context_requests"],
         "prompt_requests": server_metrics["prompt_requests"],
         "update_requests": server_metrics["update_requests"],
-        "avg_response_time": avg_response_time
+        "avg_response_time": avg_response_time,
+        "stage_timings": {
+            name: {
+                "count": entry["count"],
+                "avg": entry["total"] / entry["count"],
+                "max": entry["max"],
+                "total": entry["total"]
+            }
+            for name, entry in server_metrics["stage_timings"].items()
+        },
+        "indexing": indexing_executor.status() if indexing_executor is not None else {},
+        "projects": project_pool.info() if project_pool is not None else {},
+        "coalesced": {"context": context_flight.stats["coalesced"], "prompt": prompt_flight.stats["coalesced"]},
+        "admission": admission_controller.status()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Endpoint com métricas no formato de exposição de texto do Prometheus.
+    
+    Returns:
+        Response em texto com todas as métricas registradas
+    """
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE_LATEST)
+
+def _check_admin_token(request: Request) -> None:
+    """
+    Valida o token administrativo configurado em CONTEXT_GUIDE_ADMIN_TOKEN.
+    
+    Sem token configurado os endpoints administrativos ficam desativados: o servidor
+    escuta em todas as interfaces, e o profiler e o tracemalloc são caros e expõem
+    caminhos do código-fonte.
+    
+    Raises:
+        HTTPException: 404 se nenhum token estiver configurado; 403 se o token
+            informado em X-Admin-Token não confere
+    """
+    expected = os.environ.get("CONTEXT_GUIDE_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404,
+                            detail="Endpoints administrativos desativados (configure CONTEXT_GUIDE_ADMIN_TOKEN)")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), expected):
+        raise HTTPException(status_code=403, detail="Token administrativo inválido")
+
+@app.get("/admin/profiling")
+async def get_profiling_status(request: Request):
+    """
+    Endpoint para consultar a configuração e o estado do profiler.
+    
+    Returns:
+        Dict com o estado do profiler e do tracemalloc
+    """
+    _check_admin_token(request)
+    return request_profiler.status()
+
+@app.post("/admin/profiling")
+async def configure_profiling(request: Request, config: ProfilingConfigRequest):
+    """
+    Endpoint para ativar, desativar ou ajustar a amostragem do profiler.
+    
+    Args:
+        config: Nova fração de amostragem e/ou limite de arquivos
+        
+    Returns:
+        Dict com o estado atualizado do profiler
+    """
+    _check_admin_token(request)
+    try:
+        request_profiler.configure(sample_rate=config.sample_rate, max_files=config.max_files)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Profiling reconfigurado: taxa de amostragem {request_profiler.sample_rate}")
+    return request_profiler.status()
+
+@app.post("/admin/tracemalloc/start")
+async def start_tracemalloc(request: Request, config: TracemallocStartRequest = Body(TracemallocStartRequest())):
+    """
+    Endpoint para iniciar o tracemalloc e capturar a linha de base.
+    
+    Returns:
+        Dict com o estado do profiler
+    """
+    _check_admin_token(request)
+    request_profiler.start_tracemalloc(frames=config.frames)
+    return request_profiler.status()
+
+@app.get("/admin/tracemalloc/diff")
+async def get_tracemalloc_diff(request: Request, limit: int = Query(20), reset: bool = Query(False)):
+    """
+    Endpoint para comparar a memória atual com a linha de base do tracemalloc.
+    
+    Args:
+        limit: Número máximo de linhas retornadas
+        reset: Se o snapshot atual deve virar a nova linha de base
+        
+    Returns:
+        Dict com as maiores diferenças de alocação por linha de código
+    """
+    _check_admin_token(request)
+    try:
+        return {"diff": request_profiler.tracemalloc_diff(limit=limit, reset_baseline=reset)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/tracemalloc/stop")
+async def stop_tracemalloc(request: Request):
+    """
+    Endpoint para interromper o tracemalloc.
+    
+    Returns:
+        Dict com o estado do profiler
+    """
+    _check_admin_token(request)
+    request_profiler.stop_tracemalloc()
+    return request_profiler.status()
+
 @app.get("/health")
 async def health_check():
     """
@@ -298,7 +961,7 @@ async def health_check():
     
     return {"status": "healthy", "uptime": time.time() - server_metrics["start_time"]}
 
-def run_server(host: str = "0.0.0.0", port: int = 8000, reload: bool = False):
+def run_server(host: str = "0.0.0.0", port: int = 8000, reload: bool = False, workers: int = 1):
     """
     Inicia o servidor MCP.
     
@@ -306,6 +969,8 @@ def run_server(host: str = "0.0.0.0", port: int = 8000, reload: bool = False):
         host: Endereço para escutar
         port: Porta para escutar
         reload: Se deve recarregar automaticamente durante o desenvolvimento
+        workers: Quantidade de processos worker; acima de 1, os workers compartilham
+            um snapshot do índice mapeado em memória (ver multiworker)
     """
     logger.info(f"Iniciando servidor MCP em {host}:{port}")
     
@@ -345,6 +1010,20 @@ def run_server(host: str = "0.0.0.0", port: int = 8000, reload: bool = False):
         log_config["loggers"]["uvicorn.error"]["handlers"].append("file")
         log_config["loggers"]["uvicorn.access"]["handlers"].append("file")
     
+    if workers > 1:
+        if reload:
+            raise ValueError("O reload automático não é compatível com múltiplos workers")
+        from context_guide.mcp_server.multiworker import run_multiworker_server
+        run_multiworker_server(
+            host=host,
+            port=port,
+            workers=workers,
+            docs_dir=os.environ.get("CONTEXT_GUIDE_DOCS_DIR", "docs"),
+            db_dir=os.environ.get("CONTEXT_GUIDE_DB_DIR", ".context_guide"),
+            log_config=log_config
+        )
+        return
+    
     uvicorn.run(
         "context_guide.mcp_server.server:app", 
         host=host, 
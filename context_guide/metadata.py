@@ -0,0 +1,220 @@
+"""
+Metadados de seção dos chunks e filtros de busca por metadados.
+
+Na indexação, cada chunk recebe o caminho do documento relativo ao diretório de
+documentos (`doc_path`), o grupo de templates do documento conforme a estrutura
+criada por `context-guide init` (`template_group`) e o título da seção em que o
+chunk começa (`heading`). As consultas podem ser restritas por esses campos e pelo
+nome do arquivo; os filtros são repassados ao vector store, que descarta os chunks
+fora do filtro antes da busca por similaridade.
+
+O filtro `technology` usa as marcações `tech_<nome>` (ver `context_guide.technologies`)
+e é tratado pelas consultas como preferência: se houver menos chunks marcados que o
+solicitado, o resultado é completado com os demais.
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from context_guide.project_templates import GROUP_DIRECTORIES
+from context_guide.technologies import normalize_technology, technology_metadata_key
+
+# Filtros aceitos pelas consultas
+FILTER_KEYS = ("path_prefix", "template_group", "file_name", "heading", "technology")
+
+# Subdiretórios criados por `context-guide init` e o grupo de templates correspondente
+TEMPLATE_GROUP_DIRS = {directory: group for group, directory in GROUP_DIRECTORIES.items() if directory}
+
+# Grupo dos documentos na raiz do diretório de documentos
+ROOT_TEMPLATE_GROUP = "basic"
+
+# Metadados adicionados na indexação; ficam fora do texto embutido e do enviado ao LLM
+SECTION_METADATA_KEYS = ("doc_path", "template_group", "heading")
+
+_HEADING = re.compile(r"^ {0,3}#{1,6}[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$", re.MULTILINE)
+
+
+def template_group(doc_path: str) -> str:
+    """
+    Grupo de templates de um documento, pelo seu primeiro diretório.
+
+    Args:
+        doc_path: Caminho relativo ao diretório de documentos (separado por "/")
+
+    Returns:
+        Grupo de `TEMPLATE_GROUP_DIRS`, "basic" para documentos na raiz, ou o nome
+        do primeiro diretório para estruturas próprias do projeto
+    """
+    directory, separator, _ = doc_path.partition("/")
+    if not separator:
+        return ROOT_TEMPLATE_GROUP
+    return TEMPLATE_GROUP_DIRS.get(directory, directory)
+
+
+def section_headings(text: str) -> List[Tuple[int, str]]:
+    """
+    Títulos markdown (ATX) de um documento.
+
+    Args:
+        text: Texto do documento
+
+    Returns:
+        Lista de (posição do título no texto, título), em ordem
+    """
+    return [(match.start(), match.group(1).strip()) for match in _HEADING.finditer(text)]
+
+
+def heading_at(headings: List[Tuple[int, str]], start: int, chunk_text: str = "") -> str:
+    """
+    Título da seção em que um trecho do documento começa.
+
+    Args:
+        headings: Retorno de `section_headings` para o documento
+        start: Posição do início do trecho no documento
+        chunk_text: Texto do trecho, usado quando ele começa antes do primeiro título
+
+    Returns:
+        Título da seção, ou "" se o documento não tiver títulos
+    """
+    current = ""
+    for position, heading in headings:
+        if position > start:
+            break
+        current = heading
+    if not current and chunk_text:
+        first = _HEADING.search(chunk_text)
+        current = first.group(1).strip() if first else ""
+    return current
+
+
+def tag_section_metadata(document: Any, nodes: List[Any], doc_path: Optional[str]) -> None:
+    """
+    Adiciona os metadados de seção aos chunks de um documento.
+
+    Args:
+        document: Documento do LlamaIndex de onde os chunks foram extraídos
+        nodes: Chunks do documento
+        doc_path: Caminho do documento relativo ao diretório de documentos (None se
+            estiver fora dele; apenas o título é adicionado)
+    """
+    text = document.text or ""
+    headings = section_headings(text)
+    for node in nodes:
+        start = node.start_char_idx
+        if start is None:
+            start = max(text.find(node.text[:200]), 0)
+        metadata = {"heading": heading_at(headings, start, node.text)}
+        if doc_path is not None:
+            metadata.update(doc_path=doc_path, template_group=template_group(doc_path))
+        node.metadata.update(metadata)
+        for keys in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+            keys.extend(key for key in SECTION_METADATA_KEYS if key not in keys)
+
+
+def normalize_filters(filters: Optional[Dict[str, Optional[str]]]) -> Dict[str, str]:
+    """
+    Valida os filtros de uma consulta, descartando os vazios.
+
+    Args:
+        filters: Dicionário com chaves de `FILTER_KEYS`
+
+    Returns:
+        Filtros normalizados (caminhos com "/" e sem barras nas pontas; tecnologias em
+        minúsculas, e as não suportadas descartadas)
+
+    Raises:
+        ValueError: Se houver um filtro desconhecido
+    """
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if key not in FILTER_KEYS:
+            raise ValueError(f"Filtro desconhecido: '{key}' (use {', '.join(FILTER_KEYS)})")
+        if value is None or not str(value).strip():
+            continue
+        value = str(value).strip()
+        if key == "path_prefix":
+            value = value.replace("\\", "/")
+            while value.startswith("./"):
+                value = value[2:]
+            value = value.strip("/")
+            if not value:
+                continue
+        elif key == "technology":
+            value = normalize_technology(value)
+            if value is None:
+                continue
+        normalized[key] = value
+    return normalized
+
+
+def path_matches(doc_path: str, prefix: str) -> bool:
+    """Indica se o documento é o caminho informado ou está dentro do diretório informado."""
+    return doc_path == prefix or doc_path.startswith(prefix + "/")
+
+
+def matching_paths(doc_paths: Iterable[str], prefix: str) -> List[str]:
+    """Documentos que correspondem a um prefixo de caminho."""
+    return [doc_path for doc_path in doc_paths if path_matches(doc_path, prefix)]
+
+
+def to_metadata_filters(filters: Dict[str, str], doc_paths: Optional[List[str]] = None) -> Any:
+    """
+    Converte filtros normalizados em MetadataFilters do LlamaIndex.
+
+    O prefixo de caminho não é suportado diretamente pelo ChromaDB; ele é convertido
+    na lista dos documentos correspondentes (`doc_path` em ...).
+
+    Args:
+        filters: Retorno de `normalize_filters`
+        doc_paths: Documentos que correspondem a `path_prefix` (obrigatório se houver)
+
+    Returns:
+        MetadataFilters, ou None se não houver filtros
+    """
+    from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+
+    conditions = []
+    if "path_prefix" in filters:
+        conditions.append(MetadataFilter(key="doc_path", value=sorted(doc_paths or []), operator=FilterOperator.IN))
+    for key in ("template_group", "file_name", "heading"):
+        if key in filters:
+            conditions.append(MetadataFilter(key=key, value=filters[key], operator=FilterOperator.EQ))
+    if "technology" in filters:
+        conditions.append(MetadataFilter(key=technology_metadata_key(filters["technology"]), value=1,
+                                         operator=FilterOperator.EQ))
+    return MetadataFilters(filters=conditions) if conditions else None
+
+
+def metadata_predicate(filters: Dict[str, str]) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Função que verifica se os metadados de um chunk atendem aos filtros.
+
+    Usada quando a busca não é feita pelo vector store (ex: snapshots do índice).
+
+    Args:
+        filters: Retorno de `normalize_filters`
+
+    Returns:
+        Função que recebe os metadados de um chunk e retorna se ele é candidato
+    """
+    prefix = filters.get("path_prefix")
+    exact = [(key, filters[key]) for key in ("template_group", "file_name", "heading") if key in filters]
+    if "technology" in filters:
+        exact.append((technology_metadata_key(filters["technology"]), 1))
+
+    def matches(metadata: Dict[str, Any]) -> bool:
+        if prefix is not None and not path_matches(str(metadata.get("doc_path", "")), prefix):
+            return False
+        return all(metadata.get(key) == value for key, value in exact)
+
+    return matches
+
+
+def without_technology(filters: Dict[str, str]) -> Dict[str, str]:
+    """Filtros sem a preferência de tecnologia, usados para completar o resultado."""
+    return {key: value for key, value in filters.items() if key != "technology"}
+
+
+def filters_key(filters: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """Representação ordenada e imutável dos filtros, para chaves de cache e ETags."""
+    return tuple(sorted(filters.items()))
@@ -0,0 +1,201 @@
+"""
+Seleção das fontes de contexto dentro de um orçamento de tokens.
+
+As fontes recuperadas são incluídas em ordem de relevância enquanto couberem no
+orçamento. Chunks vizinhos de um mesmo arquivo compartilham até `chunk_overlap`
+tokens (50 na indexação); esse trecho repetido é removido antes da contagem.
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Função que recebe um texto e retorna sua quantidade de tokens
+TokenCounter = Callable[[str], int]
+
+# Separador entre as fontes no contexto (o mesmo de get_relevant_context)
+SOURCE_SEPARATOR = "\n\n"
+
+# Maior sobreposição procurada entre chunks (50 tokens, com folga para palavras longas)
+MAX_OVERLAP_CHARS = 600
+
+# Sobreposições menores que isso são coincidências, não repetição do chunk anterior
+MIN_OVERLAP_CHARS = 20
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima a quantidade de tokens de um texto sem depender de um tokenizador.
+
+    Cada sinal de pontuação conta como um token e cada palavra como um token a cada
+    quatro caracteres, aproximando a divisão em subpalavras dos tokenizadores BPE.
+
+    Args:
+        text: Texto a medir
+
+    Returns:
+        Quantidade estimada de tokens
+    """
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def tiktoken_counter(encoding: str = "cl100k_base") -> TokenCounter:
+    """
+    Cria um contador de tokens exato baseado no tiktoken.
+
+    Args:
+        encoding: Nome da codificação do tiktoken
+
+    Returns:
+        Função que conta os tokens de um texto
+
+    Raises:
+        ImportError: Se o tiktoken não estiver instalado
+    """
+    if not TIKTOKEN_AVAILABLE:
+        raise ImportError("tiktoken não está instalado")
+    encoder = tiktoken.get_encoding(encoding)
+    return lambda text: len(encoder.encode(text, disallowed_special=()))
+
+
+def _overlap(before: str, after: str) -> int:
+    """Tamanho do maior sufixo de `before` que também é prefixo de `after`."""
+    limit = min(len(before), len(after), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if after.startswith(before[-size:]):
+            return size
+    return 0
+
+
+def _remove_overlap(content: str, packed: List[Dict[str, Any]], file_path: Optional[str]) -> str:
+    """
+    Remove do conteúdo o trecho repetido de chunks vizinhos já incluídos.
+
+    Args:
+        content: Texto do chunk candidato
+        packed: Fontes já incluídas
+        file_path: Arquivo de origem do candidato
+
+    Returns:
+        Conteúdo sem o trecho repetido (vazio se estiver todo contido em outra fonte)
+    """
+    for source in packed:
+        if (source.get("metadata") or {}).get("file_path") != file_path:
+            continue
+        existing = source["content"]
+        if content in existing:
+            return ""
+        # Candidato posterior ao chunk incluído: o início repete o final do anterior
+        size = _overlap(existing, content)
+        if size:
+            content = content[size:].lstrip()
+            continue
+        # Candidato anterior ao chunk incluído: o final repete o início do seguinte
+        size = _overlap(content, existing)
+        if size:
+            content = content[:-size].rstrip()
+    return content
+
+
+def _truncate(content: str, budget: int, count_tokens: TokenCounter) -> str:
+    """Maior prefixo do conteúdo que cabe no orçamento (busca binária em caracteres)."""
+    low, high = 0, len(content)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(content[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return content[:low]
+
+
+def pack_sources(sources: List[Dict[str, Any]], max_tokens: int,
+                 count_tokens: Optional[TokenCounter] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Seleciona as fontes mais relevantes que cabem em um orçamento de tokens.
+
+    As fontes são percorridas por score decrescente; cada uma é incluída se couber no
+    orçamento restante (após remover a sobreposição com chunks vizinhos já incluídos),
+    e as que não cabem são descartadas sem interromper a seleção. Se nem a fonte mais
+    relevante couber, ela é truncada para que o contexto não fique vazio.
+
+    Args:
+        sources: Fontes retornadas por `get_relevant_context`
+        max_tokens: Orçamento de tokens do contexto
+        count_tokens: Contador de tokens (padrão: estimate_tokens)
+
+    Returns:
+        Tupla (fontes incluídas, relatório com tokens usados e descartados)
+    """
+    count_tokens = count_tokens or estimate_tokens
+    separator_tokens = count_tokens(SOURCE_SEPARATOR)
+    ranked = sorted(sources, key=lambda source: source.get("score") or 0.0, reverse=True)
+
+    packed: List[Dict[str, Any]] = []
+    used = 0
+    dropped_tokens = 0
+    overlap_tokens = 0
+    truncated = False
+
+    for source in ranked:
+        original = source.get("content", "")
+        file_path = (source.get("metadata") or {}).get("file_path")
+        content = _remove_overlap(original, packed, file_path)
+        original_tokens = count_tokens(original)
+        if not content.strip():
+            overlap_tokens += original_tokens
+            continue
+
+        tokens = count_tokens(content)
+        overlap_tokens += max(original_tokens - tokens, 0)
+        cost = tokens + (separator_tokens if packed else 0)
+        if used + cost <= max_tokens:
+            packed.append({**source, "content": content})
+            used += cost
+        elif not packed and max_tokens > 0:
+            content = _truncate(content, max_tokens, count_tokens)
+            packed.append({**source, "content": content})
+            used = count_tokens(content)
+            dropped_tokens += tokens - used
+            truncated = True
+        else:
+            dropped_tokens += tokens
+
+    report = {
+        "max_tokens": max_tokens,
+        "context_tokens": used,
+        "sources_total": len(sources),
+        "sources_packed": len(packed),
+        "sources_dropped": len(sources) - len(packed),
+        "tokens_dropped": dropped_tokens,
+        "overlap_tokens_removed": overlap_tokens,
+        "truncated": truncated,
+    }
+    logger.debug(f"Contexto empacotado: {report}")
+    return packed, report
+
+
+def context_budget(max_tokens: int, *fixed_parts: str, count_tokens: Optional[TokenCounter] = None) -> int:
+    """
+    Calcula quantos tokens sobram para o contexto depois das partes fixas do prompt.
+
+    Args:
+        max_tokens: Orçamento total do prompt
+        fixed_parts: Textos que sempre fazem parte do prompt (cabeçalho, rodapé, ...)
+        count_tokens: Contador de tokens (padrão: estimate_tokens)
+
+    Returns:
+        Orçamento restante para o contexto (nunca negativo)
+    """
+    count_tokens = count_tokens or estimate_tokens
+    return max(max_tokens - sum(count_tokens(part) for part in fixed_parts), 0)
@@ -957,4 +957,13 @@ PROJECT_TEMPLATES = {
         "mobile-app.md": MOBILE_APP_TEMPLATE,
         "desktop-app.md": DESKTOP_APP_TEMPLATE
     }
-} 
\ No newline at end of file
+} 
+
+# Subdiretório criado por `context-guide init` para cada grupo de templates
+# ("" para os documentos na raiz do diretório de documentos)
+GROUP_DIRECTORIES = {
+    "basic": "",
+    "tracking": "tracking",
+    "development": "development",
+    "app_types": "architecture",
+}
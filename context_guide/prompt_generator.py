@@ -3,8 +3,9 @@ Módulo para gerar prompts com contexto para envio ao Cursor IDE.
 Consulta o índice de documentos e formata prompts enriquecidos com contexto.
 """
 
+import os
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 
 try:
     import pyperclip
@@ -14,54 +15,331 @@ except ImportError:
     print("Aviso: pyperclip não disponível, função de copiar para clipboard desabilitada")
 
 from context_guide.context import ContextManager
+from context_guide.timing import StageTimer
+from context_guide.packing import TokenCounter, estimate_tokens, pack_sources, context_budget, SOURCE_SEPARATOR
+from context_guide.compression import SentenceCompressor
+from context_guide.cache import LRUCache
+from context_guide.metadata import normalize_filters, filters_key
+from context_guide.technologies import technology_context
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Seção adicionada ao prompt quando include_best_practices é verdadeiro
+BEST_PRACTICES_SECTION = (
+    "\n\n## Melhores Práticas a Considerar\n"
+    "- Garantir que o código seja testável e mantenha princípios SOLID\n"
+    "- Incluir tratamento de erros apropriado\n"
+    "- Seguir os padrões de estilo e nomenclatura do projeto\n"
+    "- Implementar logging adequado para facilitar depuração\n"
+)
+
+# Limites padrão do cache de prompts (entradas e megabytes de texto)
+DEFAULT_PROMPT_CACHE_SIZE = 256
+DEFAULT_PROMPT_CACHE_MB = 32
+
+def _with_technology(filters: Optional[Dict[str, str]], technology: Optional[str]) -> Optional[Dict[str, str]]:
+    """Filtros da busca acrescidos da preferência pela tecnologia da solicitação."""
+    if not technology:
+        return filters
+    return {**(filters or {}), "technology": technology}
+
 class PromptGenerator:
     """Gera prompts enriquecidos com contexto para o Cursor IDE."""
     
-    def __init__(self, context_manager: ContextManager):
+    def __init__(self, context_manager: ContextManager, max_tokens: Optional[int] = None,
+                 token_counter: Optional[TokenCounter] = None, compression_ratio: Optional[float] = None,
+                 cache_size: Optional[int] = None):
         """
         Inicializa o gerador de prompts.
         
         Args:
             context_manager: Instância do ContextManager para consulta de contexto
+            max_tokens: Orçamento padrão de tokens do prompt (padrão: variável de
+                ambiente CONTEXT_GUIDE_MAX_PROMPT_TOKENS; sem ela, sem limite)
+            token_counter: Função que conta os tokens de um texto (padrão: estimativa
+                sem dependências, ver `context_guide.packing.estimate_tokens`)
+            compression_ratio: Fração das frases mantida em cada fonte pela compressão
+                extrativa (padrão: variável de ambiente CONTEXT_GUIDE_PROMPT_COMPRESSION;
+                sem ela, a compressão só é aplicada quando solicitada, mantendo 30%)
+            cache_size: Quantidade de prompts mantidos em cache; 0 desativa (padrão:
+                variável de ambiente CONTEXT_GUIDE_PROMPT_CACHE_SIZE ou 256). O tamanho
+                total é limitado por CONTEXT_GUIDE_PROMPT_CACHE_MB (padrão: 32)
         """
         self.context_manager = context_manager
+        if max_tokens is None and os.environ.get("CONTEXT_GUIDE_MAX_PROMPT_TOKENS"):
+            max_tokens = int(os.environ["CONTEXT_GUIDE_MAX_PROMPT_TOKENS"])
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter or estimate_tokens
+        
+        if compression_ratio is None and os.environ.get("CONTEXT_GUIDE_PROMPT_COMPRESSION"):
+            compression_ratio = float(os.environ["CONTEXT_GUIDE_PROMPT_COMPRESSION"])
+        self.compress_by_default = compression_ratio is not None
+        embed_model = getattr(context_manager, "embed_model", None)
+        self.compressor = SentenceCompressor(
+            embed_batch=getattr(embed_model, "get_text_embedding_batch", None),
+            **({"keep_ratio": compression_ratio} if compression_ratio is not None else {}),
+        )
+        
+        if cache_size is None:
+            cache_size = int(os.environ.get("CONTEXT_GUIDE_PROMPT_CACHE_SIZE", DEFAULT_PROMPT_CACHE_SIZE))
+        cache_mb = float(os.environ.get("CONTEXT_GUIDE_PROMPT_CACHE_MB", DEFAULT_PROMPT_CACHE_MB))
+        # O tamanho de cada entrada é aproximado pelo texto do prompt e das fontes
+        self.cache = LRUCache(
+            max_entries=cache_size,
+            max_bytes=int(cache_mb * 1024 * 1024),
+            sizeof=lambda result: len(result["prompt"]) + sum(len(source["content"]) for source in result["sources"]),
+        )
     
-    def generate_prompt(self, user_request: str) -> str:
+    def generate_prompt(self, user_request: str, timer: Optional[StageTimer] = None,
+                        max_tokens: Optional[int] = None, compress: Optional[bool] = None,
+                        technology: Optional[str] = None, include_best_practices: bool = False,
+                        filters: Optional[Dict[str, str]] = None) -> str:
         """
         Gera um prompt enriquecido com contexto relevante do projeto.
         
         Args:
             user_request: Solicitação do usuário para gerar código
+            timer: Cronômetro opcional que recebe o tempo de cada etapa
+                (retrieval, retrieval.<etapa da consulta>, prompt_assembly)
+            max_tokens: Orçamento de tokens do prompt (padrão: o do gerador)
+            compress: Se deve aplicar a compressão extrativa (padrão: a do gerador)
+            technology: Tecnologia da solicitação (ver `build_prompt`)
+            include_best_practices: Se deve adicionar a seção de melhores práticas
+            filters: Filtros de metadados da busca (ver `ContextManager.get_relevant_context`)
             
         Returns:
             Prompt formatado com contexto para o Cursor IDE
         """
-        logger.info(f"Gerando prompt para: '{user_request}'")
+        return self.build_prompt(user_request, timer=timer, max_tokens=max_tokens, compress=compress,
+                                 technology=technology, include_best_practices=include_best_practices,
+                                 filters=filters)["prompt"]
+    
+    def cache_key(self, user_request: str, max_tokens: Optional[int] = None, compress: Optional[bool] = None,
+                  technology: Optional[str] = None, include_best_practices: bool = False,
+                  filters: Optional[Dict[str, str]] = None) -> tuple:
+        """
+        Chave que identifica um prompt gerado, incluindo a versão atual do índice.
         
-        # Obter contexto relevante
-        context_data = self.context_manager.get_relevant_context(user_request)
-        context_text = context_data["context"]
+        Qualquer alteração do índice muda a chave, de modo que prompts em cache nunca
+        refletem documentos desatualizados. Também usada como base do ETag de `/prompt`.
         
-        # Extrair informações sobre fontes
-        sources = []
-        for source in context_data.get("sources", []):
-            if source.get("metadata") and "file_path" in source["metadata"]:
-                file_name = source["metadata"]["file_path"].split("/")[-1]
-                sources.append(file_name)
+        Args:
+            user_request: Solicitação do usuário
+            max_tokens: Orçamento de tokens (padrão: o do gerador)
+            compress: Se a compressão extrativa é aplicada (padrão: a do gerador)
+            technology: Tecnologia da solicitação
+            include_best_practices: Se a seção de melhores práticas é adicionada
+            filters: Filtros de metadados da busca
+            
+        Returns:
+            Tupla com os parâmetros efetivos e a versão do índice
+            
+        Raises:
+            ValueError: Se houver um filtro desconhecido
+        """
+        return (
+            user_request,
+            technology,
+            bool(include_best_practices),
+            filters_key(normalize_filters(filters)),
+            max_tokens if max_tokens is not None else self.max_tokens,
+            self.compress_by_default if compress is None else bool(compress),
+            getattr(self.context_manager, "index_version", 0),
+        )
+    
+    def build_prompt(self, user_request: str, timer: Optional[StageTimer] = None,
+                     max_tokens: Optional[int] = None, compress: Optional[bool] = None,
+                     technology: Optional[str] = None, include_best_practices: bool = False,
+                     use_cache: bool = True, filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Gera o prompt e informa as fontes usadas e o resultado do orçamento de tokens.
+        
+        Com compressão, cada fonte é reduzida às frases mais similares à consulta (ver
+        `context_guide.compression`). Com um orçamento, as fontes mais relevantes são
+        incluídas enquanto couberem (ver `context_guide.packing.pack_sources`),
+        descontadas as partes fixas do prompt. O resultado é mantido em cache até a
+        próxima alteração do índice (ver `cache_key`).
+        
+        Args:
+            user_request: Solicitação do usuário para gerar código
+            timer: Cronômetro opcional que recebe o tempo de cada etapa
+            max_tokens: Orçamento de tokens do prompt (padrão: o do gerador)
+            compress: Se deve aplicar a compressão extrativa (padrão: a do gerador)
+            technology: Tecnologia da solicitação: a busca dá preferência aos chunks
+                que a mencionam e a seção da tecnologia é adicionada ao prompt
+            include_best_practices: Se deve adicionar a seção de melhores práticas
+            use_cache: Se deve consultar e preencher o cache de prompts
+            filters: Filtros de metadados da busca (ver `ContextManager.get_relevant_context`)
+            
+        Returns:
+            Dicionário com "prompt", "sources" (fontes incluídas), "packing" (relatório
+            do orçamento), "compression" (relatório da compressão) e "cached"; os
+            relatórios são None quando a etapa não é aplicada
+        """
+        timer = timer if timer is not None else StageTimer()
+        key = self.cache_key(user_request, max_tokens, compress, technology, include_best_practices, filters)
+        if use_cache and self.cache.enabled:
+            with timer.stage("cache_lookup"):
+                cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"Prompt para '{user_request}' servido do cache")
+                return {**cached, "cached": True}
         
-        sources_text = ", ".join(set(sources)) if sources else "Nenhuma fonte específica"
+        logger.info(f"Gerando prompt para: '{user_request}'" + (f" (tecnologia: {technology})" if technology else ""))
         
-        # Formatar o prompt
-        prompt = self._format_prompt(user_request, context_text, sources_text)
+        suffix = technology_context(technology) + (BEST_PRACTICES_SECTION if include_best_practices else "")
+        context_data = self._retrieve(user_request, timer, compress, _with_technology(filters, technology))
+        sources, context_text, packing, compression = self._select_context(
+            user_request, context_data, max_tokens, timer, suffix
+        )
+        
+        with timer.stage("prompt_assembly"):
+            # Extrair informações sobre fontes
+            sources_text = self._format_sources(sources)
+            
+            # Formatar o prompt
+            prompt = self._format_prompt(user_request, context_text, sources_text) + suffix
         
         logger.info(f"Prompt gerado com {len(prompt)} caracteres, baseado em {sources_text}")
-        return prompt
+        if packing and packing["sources_dropped"]:
+            logger.info(f"Orçamento de {packing['max_tokens']} tokens: {packing['sources_dropped']} fonte(s) "
+                        f"e {packing['tokens_dropped']} tokens descartados")
+        result = {"prompt": prompt, "sources": sources, "packing": packing, "compression": compression}
+        if context_data.get("error"):
+            # Consultas com erro não são armazenadas, para serem refeitas na próxima solicitação
+            return {**result, "cached": False, "error": context_data["error"]}
+        if use_cache:
+            self.cache.put(key, result)
+        return {**result, "cached": False}
+    
+    def _retrieve(self, user_request: str, timer: StageTimer, compress: Optional[bool],
+                  filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Consulta o índice, marcando no resultado se a compressão deve ser aplicada."""
+        compress = self.compress_by_default if compress is None else compress
+        # Sem filtros, a chamada não muda (gerenciadores de contexto sem suporte a filtros continuam válidos)
+        options = {"filters": filters} if filters else {}
+        with timer.stage("retrieval"):
+            if compress:
+                # O embedding da consulta é reaproveitado para pontuar as frases
+                context_data = self.context_manager.get_relevant_context(user_request, include_query_embedding=True,
+                                                                         **options)
+            else:
+                context_data = self.context_manager.get_relevant_context(user_request, **options)
+        timer.merge(context_data.get("timings"), prefix="retrieval.")
+        return {**context_data, "compress": bool(compress)}
+    
+    def _select_context(self, user_request: str, context_data: Dict[str, Any],
+                        max_tokens: Optional[int], timer: StageTimer, suffix: str = "") -> tuple:
+        """
+        Aplica a compressão extrativa e o orçamento de tokens às fontes recuperadas.
+        
+        Args:
+            user_request: Solicitação do usuário
+            context_data: Retorno de `_retrieve`
+            max_tokens: Orçamento de tokens do prompt (None usa o do gerador)
+            timer: Cronômetro que recebe o tempo das etapas compression e packing
+            suffix: Texto adicionado após o prompt, descontado do orçamento
+            
+        Returns:
+            Tupla (fontes, texto do contexto, relatório do orçamento ou None,
+            relatório da compressão ou None)
+        """
+        sources = context_data.get("sources", [])
+        context_text = context_data["context"]
+        compression = None
+        if context_data.get("compress") and sources:
+            with timer.stage("compression"):
+                sources, compression = self.compressor.compress(
+                    user_request, sources, context_data.get("query_embedding")
+                )
+            context_text = SOURCE_SEPARATOR.join(source["content"] for source in sources)
+        
+        max_tokens = max_tokens if max_tokens is not None else self.max_tokens
+        if max_tokens is None:
+            return sources, context_text, None, compression
+        
+        with timer.stage("packing"):
+            # O rodapé é medido com todas as fontes, um limite superior do que será usado
+            budget = context_budget(
+                max_tokens,
+                self._format_header(user_request),
+                self._format_footer(user_request, self._format_sources(sources)),
+                suffix,
+                count_tokens=self.token_counter,
+            )
+            packed, packing = pack_sources(sources, budget, count_tokens=self.token_counter)
+        packing["max_tokens"] = max_tokens
+        return packed, SOURCE_SEPARATOR.join(source["content"] for source in packed), packing, compression
+    
+    def stream_prompt(self, user_request: str, timer: Optional[StageTimer] = None,
+                      max_tokens: Optional[int] = None, compress: Optional[bool] = None,
+                      filters: Optional[Dict[str, str]] = None,
+                      technology: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Gera o prompt em partes, na ordem em que podem ser enviadas ao cliente.
+        
+        O cabeçalho com a solicitação é produzido antes da consulta ao índice; em seguida
+        vem uma seção por fonte recuperada, o rodapé com fontes e instruções e, com uma
+        tecnologia, a seção da tecnologia. A concatenação dos textos é idêntica ao
+        retorno de `generate_prompt` sem melhores práticas.
+        
+        Args:
+            user_request: Solicitação do usuário para gerar código
+            timer: Cronômetro opcional que recebe o tempo de cada etapa
+            max_tokens: Orçamento de tokens do prompt (padrão: o do gerador)
+            compress: Se deve aplicar a compressão extrativa (padrão: a do gerador)
+            filters: Filtros de metadados da busca (ver `ContextManager.get_relevant_context`)
+            technology: Tecnologia da solicitação (ver `build_prompt`)
+            
+        Yields:
+            Dicionários com "event" (header, section, footer ou technology) e "text";
+            as seções incluem também "source" com o nome do arquivo de origem
+        """
+        logger.info(f"Gerando prompt em partes para: '{user_request}'")
+        timer = timer if timer is not None else StageTimer()
+        
+        yield {"event": "header", "text": self._format_header(user_request)}
+        
+        tech_section = technology_context(technology)
+        context_data = self._retrieve(user_request, timer, compress, _with_technology(filters, technology))
+        sources, context_text, _, _ = self._select_context(user_request, context_data, max_tokens, timer,
+                                                           tech_section)
+        if sources:
+            for i, source in enumerate(sources):
+                metadata = source.get("metadata") or {}
+                yield {
+                    "event": "section",
+                    "text": ("\n\n" if i else "") + source["content"],
+                    "source": metadata.get("file_path", "").split("/")[-1],
+                }
+        elif context_text:
+            yield {"event": "section", "text": context_text, "source": ""}
+        
+        with timer.stage("prompt_assembly"):
+            footer = self._format_footer(user_request, self._format_sources(sources))
+        yield {"event": "footer", "text": footer}
+        if tech_section:
+            yield {"event": "technology", "text": tech_section}
+    
+    def _format_sources(self, sources: List[Dict[str, Any]]) -> str:
+        """
+        Lista os nomes dos arquivos de origem do contexto.
+        
+        Args:
+            sources: Fontes retornadas por `get_relevant_context`
+            
+        Returns:
+            Nomes dos arquivos separados por vírgula
+        """
+        names = []
+        for source in sources:
+            if source.get("metadata") and "file_path" in source["metadata"]:
+                names.append(source["metadata"]["file_path"].split("/")[-1])
+        
+        return ", ".join(set(names)) if names else "Nenhuma fonte específica"
     
     def _format_prompt(self, user_request: str, context: str, sources: str) -> str:
         """
@@ -75,13 +353,20 @@ class PromptGenerator:
         Returns:
             Prompt formatado
         """
-        prompt = f"""
-# Solicitação: {user_request}
+        return self._format_header(user_request) + context + self._format_footer(user_request, sources)
+    
+    def _format_header(self, user_request: str) -> str:
+        """Formata o início do prompt, anterior ao contexto."""
+        return f"""# Solicitação: {user_request}
 
 ## Contexto do Projeto
 O pedido deve ser implementado considerando o contexto atual do projeto:
 
-{context}
+"""
+    
+    def _format_footer(self, user_request: str, sources: str) -> str:
+        """Formata o final do prompt, posterior ao contexto."""
+        return f"""
 
 ## Fontes Consultadas
 Este contexto foi obtido de: {sources}
@@ -93,21 +378,27 @@ Este contexto foi obtido de: {sources}
 - Forneça o código completo e funcional
 - Se necessário, inclua instruções de uso
 
-Por favor, implemente: {user_request}
-"""
-        return prompt.strip()
+Por favor, implemente: {user_request}"""
     
-    def generate_and_copy_to_clipboard(self, user_request: str) -> str:
+    def generate_and_copy_to_clipboard(self, user_request: str, max_tokens: Optional[int] = None,
+                                       compress: Optional[bool] = None,
+                                       filters: Optional[Dict[str, str]] = None,
+                                       technology: Optional[str] = None) -> str:
         """
         Gera um prompt e copia para a área de transferência.
         
         Args:
             user_request: Solicitação do usuário
+            max_tokens: Orçamento de tokens do prompt (padrão: o do gerador)
+            compress: Se deve aplicar a compressão extrativa (padrão: a do gerador)
+            filters: Filtros de metadados da busca (ver `ContextManager.get_relevant_context`)
+            technology: Tecnologia da solicitação (ver `build_prompt`)
             
         Returns:
             Prompt gerado
         """
-        prompt = self.generate_prompt(user_request)
+        prompt = self.generate_prompt(user_request, max_tokens=max_tokens, compress=compress, filters=filters,
+                                      technology=technology)
         
         if PYPERCLIP_AVAILABLE:
             try:
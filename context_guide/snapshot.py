@@ -0,0 +1,390 @@
+"""
+Snapshots somente leitura do índice vetorial, mapeados em memória.
+
+O processo escritor exporta os vetores e textos da coleção do ChromaDB para arquivos
+numpy versionados em `<db_dir>/snapshots/<versão>/` e publica a versão atual de forma
+atômica no arquivo `CURRENT`. Os processos leitores mapeiam os arquivos com mmap, de
+modo que todas as cópias compartilham as mesmas páginas do page cache do sistema
+operacional, e fazem a busca por similaridade de cosseno diretamente sobre o mapa.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from context_guide.cache import LRUCache
+from context_guide.metadata import filters_key, metadata_predicate, normalize_filters, without_technology
+from context_guide.timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIRNAME = "snapshots"
+CURRENT_FILENAME = "CURRENT"
+
+# Quantidade de registros lidos do ChromaDB por página durante a exportação
+EXPORT_PAGE_SIZE = 5000
+
+# Quantidade de conjuntos de candidatos de filtros memorizados por versão do snapshot
+FILTER_CACHE_SIZE = 64
+
+# Chaves internas do LlamaIndex que não fazem parte dos metadados dos documentos
+INTERNAL_METADATA_KEYS = {"doc_id", "document_id", "ref_doc_id"}
+
+
+def _version_name(version: int) -> str:
+    """Nome do diretório de uma versão do snapshot."""
+    return f"{version:06d}"
+
+
+def read_current_version(snapshot_root: Path) -> int:
+    """
+    Lê a versão publicada do snapshot.
+
+    Args:
+        snapshot_root: Diretório raiz dos snapshots
+
+    Returns:
+        Número da versão atual (0 se nenhuma foi publicada)
+    """
+    try:
+        return int((Path(snapshot_root) / CURRENT_FILENAME).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _clean_metadata(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Remove as chaves internas do LlamaIndex dos metadados armazenados no ChromaDB."""
+    return {
+        key: value for key, value in (metadata or {}).items()
+        if not key.startswith("_") and key not in INTERNAL_METADATA_KEYS
+    }
+
+
+def export_snapshot(collection, snapshot_root: Path, info: Optional[Dict[str, Any]] = None,
+                    keep: int = 2) -> int:
+    """
+    Exporta a coleção do ChromaDB para uma nova versão do snapshot e a publica.
+
+    Os vetores são normalizados (norma L2) para que a busca use produto interno.
+    A versão só fica visível aos leitores depois que todos os arquivos foram gravados.
+
+    Args:
+        collection: Coleção do ChromaDB com embeddings, documentos e metadados
+        snapshot_root: Diretório raiz dos snapshots
+        info: Informações adicionais gravadas em info.json (ex: estatísticas da construção)
+        keep: Quantidade de versões mantidas em disco (a atual e as anteriores)
+
+    Returns:
+        Número da versão publicada
+    """
+    if not NUMPY_AVAILABLE:
+        raise ImportError("numpy é necessário para exportar snapshots do índice")
+
+    start_time = time.perf_counter()
+    snapshot_root = Path(snapshot_root)
+    snapshot_root.mkdir(parents=True, exist_ok=True)
+
+    existing = [int(path.name) for path in snapshot_root.iterdir() if path.is_dir() and path.name.isdigit()]
+    version = max(existing + [read_current_version(snapshot_root)]) + 1
+    final_dir = snapshot_root / _version_name(version)
+    work_dir = snapshot_root / f".tmp-{_version_name(version)}"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir()
+
+    total = collection.count()
+    vectors = None
+    text_offsets = np.zeros(total + 1, dtype=np.int64)
+    metadata_offsets = np.zeros(total + 1, dtype=np.int64)
+
+    with open(work_dir / "texts.bin", "wb") as texts, open(work_dir / "metadata.bin", "wb") as metadatas:
+        row = 0
+        for offset in range(0, total, EXPORT_PAGE_SIZE):
+            page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                  limit=EXPORT_PAGE_SIZE, offset=offset)
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(work_dir / "vectors.npy", mode="w+", dtype=np.float32,
+                                                    shape=(total, embeddings.shape[1]))
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            vectors[row:row + len(embeddings)] = embeddings / np.where(norms > 0, norms, 1.0)
+
+            for document, metadata in zip(page["documents"], page["metadatas"]):
+                text_offsets[row + 1] = text_offsets[row] + texts.write((document or "").encode("utf-8"))
+                encoded = json.dumps(_clean_metadata(metadata), ensure_ascii=False).encode("utf-8")
+                metadata_offsets[row + 1] = metadata_offsets[row] + metadatas.write(encoded)
+                row += 1
+
+    if vectors is None:
+        np.save(work_dir / "vectors.npy", np.zeros((0, 0), dtype=np.float32))
+    else:
+        vectors.flush()
+        del vectors
+    np.save(work_dir / "text_offsets.npy", text_offsets)
+    np.save(work_dir / "metadata_offsets.npy", metadata_offsets)
+
+    snapshot_info = dict(info or {})
+    snapshot_info.update({"version": version, "chunks": total, "created": time.time()})
+    (work_dir / "info.json").write_text(json.dumps(snapshot_info), encoding="utf-8")
+
+    os.replace(work_dir, final_dir)
+    pointer = snapshot_root / f".{CURRENT_FILENAME}.tmp"
+    pointer.write_text(_version_name(version))
+    os.replace(pointer, snapshot_root / CURRENT_FILENAME)
+
+    # Leitores que ainda mapeiam uma versão removida continuam válidos até a remapearem
+    for old in sorted(existing + [version])[:-keep] if keep > 0 else []:
+        shutil.rmtree(snapshot_root / _version_name(old), ignore_errors=True)
+
+    logger.info(f"Snapshot {version} do índice exportado com {total} chunks "
+                f"em {time.perf_counter() - start_time:.2f}s")
+    return version
+
+
+class MappedIndex:
+    """Versão do snapshot do índice mapeada em memória (somente leitura)."""
+
+    def __init__(self, path: Path):
+        """
+        Mapeia os arquivos de uma versão do snapshot.
+
+        Args:
+            path: Diretório da versão
+        """
+        self.path = Path(path)
+        self.info = json.loads((self.path / "info.json").read_text(encoding="utf-8"))
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.text_offsets = np.load(self.path / "text_offsets.npy", mmap_mode="r")
+        self.metadata_offsets = np.load(self.path / "metadata_offsets.npy", mmap_mode="r")
+        self._texts = self._map_bytes(self.path / "texts.bin")
+        self._metadatas = self._map_bytes(self.path / "metadata.bin")
+        # Candidatos de cada filtro; o snapshot é imutável, então valem até o remapeamento
+        self._candidates = LRUCache(max_entries=FILTER_CACHE_SIZE)
+
+    @staticmethod
+    def _map_bytes(path: Path):
+        """Mapeia um arquivo de bytes (arquivos vazios não podem ser mapeados)."""
+        if path.stat().st_size == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def size_bytes(self) -> int:
+        """Tamanho em disco da versão."""
+        return sum(path.stat().st_size for path in self.path.iterdir())
+
+    def candidates(self, filters: Dict[str, str]) -> "np.ndarray":
+        """
+        Posições dos chunks que atendem aos filtros (memorizadas por filtro).
+
+        Args:
+            filters: Filtros normalizados (ver `context_guide.metadata.normalize_filters`)
+
+        Returns:
+            Vetor com as posições, em ordem crescente
+        """
+        key = filters_key(filters)
+        rows = self._candidates.get(key)
+        if rows is None:
+            matches = metadata_predicate(filters)
+            rows = np.fromiter((i for i in range(len(self)) if matches(self.metadata(i))), dtype=np.int64)
+            self._candidates.put(key, rows)
+        return rows
+
+    def search(self, query_embedding, k: int, rows: Optional["np.ndarray"] = None) -> List[Tuple[int, float]]:
+        """
+        Busca os chunks mais similares a um embedding de consulta.
+
+        Args:
+            query_embedding: Embedding da consulta
+            k: Quantidade de resultados
+            rows: Posições dos chunks candidatos (padrão: todos)
+
+        Returns:
+            Lista de (posição do chunk, similaridade de cosseno), da maior para a menor
+        """
+        k = min(k, len(self) if rows is None else len(rows))
+        if k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        # Apenas os vetores dos candidatos são lidos e pontuados
+        scores = (self.vectors if rows is None else self.vectors[rows]) @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if rows is None else rows[top]
+        return [(int(i), float(score)) for i, score in zip(positions, scores[top])]
+
+    def text(self, i: int) -> str:
+        """Texto do chunk na posição informada."""
+        return bytes(self._texts[self.text_offsets[i]:self.text_offsets[i + 1]]).decode("utf-8")
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        """Metadados do chunk na posição informada."""
+        return json.loads(bytes(self._metadatas[self.metadata_offsets[i]:self.metadata_offsets[i + 1]]))
+
+
+class SnapshotContextManager:
+    """
+    Consulta o índice a partir do snapshot mapeado em memória.
+
+    Oferece a mesma interface de consulta do ContextManager para os processos que
+    apenas leem o índice; reconstruções são delegadas ao processo escritor.
+    """
+
+    def __init__(self, db_dir: str, embed_model: Any, docs_dir: str = "docs",
+                 version_value: Optional[Any] = None,
+                 request_rebuild: Optional[Callable[[], int]] = None):
+        """
+        Inicializa o leitor e mapeia a versão publicada do snapshot.
+
+        Args:
+            db_dir: Diretório do banco de dados (contém o diretório de snapshots)
+            embed_model: Modelo de embeddings usado nas consultas
+            docs_dir: Diretório de documentos (apenas informativo)
+            version_value: Valor compartilhado (ex: multiprocessing.RawValue) com a
+                versão publicada; quando muda, o snapshot é remapeado na próxima consulta
+            request_rebuild: Função que solicita a reconstrução ao processo escritor e
+                retorna a nova versão
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy é necessário para consultar snapshots do índice")
+
+        self.docs_dir = Path(docs_dir)
+        self.db_dir = Path(db_dir)
+        self.snapshot_root = self.db_dir / SNAPSHOT_DIRNAME
+        self.embed_model = embed_model
+        self.llama_available = True
+        self._mapped_version = 0
+        self._version_value = version_value
+        self._request_rebuild = request_rebuild
+        self._index: Optional[MappedIndex] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Remapeia o snapshot se uma nova versão foi publicada."""
+        version = read_current_version(self.snapshot_root)
+        if version == self._mapped_version and self._index is not None:
+            return
+        with self._lock:
+            if version == self._mapped_version and self._index is not None:
+                return
+            if version == 0:
+                raise FileNotFoundError(f"Nenhum snapshot publicado em '{self.snapshot_root}'")
+            self._index = MappedIndex(self.snapshot_root / _version_name(version))
+            self._mapped_version = version
+        logger.info(f"Snapshot {version} do índice mapeado com {len(self._index)} chunks")
+
+    def _current_index(self) -> MappedIndex:
+        """Retorna o snapshot atual, remapeando-o se a versão compartilhada mudou."""
+        if self._version_value is not None and self._version_value.value != self._mapped_version:
+            self.refresh()
+        return self._index
+
+    @property
+    def index_version(self) -> int:
+        """Versão do snapshot usada nas consultas (remapeia se uma nova foi publicada)."""
+        self._current_index()
+        return self._mapped_version
+
+    def get_relevant_context(self, query: str, num_results: int = 5,
+                             include_query_embedding: bool = False,
+                             filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Consulta o snapshot para obter contexto relevante para uma consulta.
+
+        Args:
+            query: A consulta para buscar contexto relevante
+            num_results: Número máximo de resultados a retornar
+            include_query_embedding: Se deve incluir no resultado o embedding da
+                consulta ("query_embedding"), para reaproveitá-lo após a busca
+            filters: Restringe a busca aos chunks com os metadados informados (ver
+                `ContextManager.get_relevant_context`)
+
+        Returns:
+            Dicionário com o contexto relevante, as fontes e o tempo de cada etapa
+            da consulta (query_embedding, vector_search, result_formatting)
+
+        Raises:
+            ValueError: Se houver um filtro desconhecido
+        """
+        filters = normalize_filters(filters)
+        index = self._current_index()
+        if len(index) == 0:
+            logger.warning("Snapshot do índice vazio. Retornando contexto vazio.")
+            return {"context": "", "sources": [], "timings": {}}
+
+        timer = StageTimer()
+        try:
+            with timer.stage("query_embedding"):
+                query_embedding = self.embed_model.get_query_embedding(query)
+
+            with timer.stage("vector_search"):
+                rows = index.candidates(filters) if filters else None
+                matches = index.search(query_embedding, num_results, rows=rows)
+                if "technology" in filters and len(matches) < num_results:
+                    # A tecnologia é uma preferência: completa com os demais chunks
+                    general = without_technology(filters)
+                    seen = {i for i, _ in matches}
+                    others = index.search(query_embedding, num_results,
+                                          rows=index.candidates(general) if general else None)
+                    matches += [match for match in others if match[0] not in seen][:num_results - len(matches)]
+
+            with timer.stage("result_formatting"):
+                sources = [
+                    {"content": index.text(i), "metadata": index.metadata(i), "score": score}
+                    for i, score in matches
+                ]
+                context = "\n\n".join(source["content"] for source in sources)
+
+            result = {"context": context, "sources": sources, "timings": timer.as_dict()}
+            if include_query_embedding:
+                result["query_embedding"] = query_embedding
+            return result
+        except Exception as e:
+            logger.error(f"Erro ao consultar contexto no snapshot: {e}")
+            return {"context": "", "sources": [], "error": str(e), "timings": timer.as_dict()}
+
+    def update_index(self) -> None:
+        """Solicita a reconstrução do índice ao processo escritor e mapeia a nova versão."""
+        if self._request_rebuild is None:
+            raise RuntimeError("Este processo não pode reconstruir o índice (somente leitura)")
+        logger.info("Solicitando reconstrução do índice ao processo escritor...")
+        self._request_rebuild()
+        self.refresh()
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do snapshot atual para monitoramento.
+
+        Returns:
+            Dicionário com número de chunks, tamanho em disco e dados da última construção
+        """
+        index = self._current_index()
+        info = index.info
+        build_seconds = info.get("last_build_seconds", 0.0)
+        return {
+            "last_build_seconds": build_seconds,
+            "last_build_documents": info.get("last_build_documents", 0),
+            "last_build_chunks": info.get("last_build_chunks", 0),
+            "last_build_timestamp": info.get("last_build_timestamp", 0.0),
+            "chunks_per_second": info.get("last_build_chunks", 0) / build_seconds if build_seconds > 0 else 0.0,
+            "chunks": len(index),
+            "size_bytes": index.size_bytes(),
+            "snapshot_version": self.index_version,
+        }
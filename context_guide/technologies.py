@@ -0,0 +1,172 @@
+"""
+Tecnologias suportadas para contextualização especializada.
+
+Reúne as informações de cada tecnologia usadas para enriquecer prompts e a detecção,
+por palavras-chave, das tecnologias mencionadas em um texto. Na indexação, cada chunk
+recebe uma marcação `tech_<nome>` para cada tecnologia detectada; as consultas com
+tecnologia dão preferência aos chunks marcados por meio de um filtro de metadados,
+em vez de alterar o texto da consulta.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, List, Optional
+
+# Tecnologias suportadas e seus contextos especiais
+TECH_CONTEXTS = {
+    "react": {
+        "description": "Biblioteca JavaScript para construção de interfaces de usuário",
+        "common_patterns": ["componentes funcionais", "hooks", "props", "estado", "contexto"],
+        "best_practices": [
+            "Utilizar componentes funcionais com hooks",
+            "Evitar renderizações desnecessárias",
+            "Separar lógica de UI da lógica de negócios",
+            "Utilizar gerenciamento de estado apropriado para o tamanho da aplicação"
+        ]
+    },
+    "node": {
+        "description": "Ambiente de execução JavaScript do lado do servidor",
+        "common_patterns": ["middleware", "rotas", "controladores", "modelos", "serviços"],
+        "best_practices": [
+            "Organizar o código em camadas (controllers, services, models)",
+            "Usar async/await para operações assíncronas",
+            "Implementar tratamento de erros centralizado",
+            "Validar entradas e sanitizar saídas"
+        ]
+    },
+    "django": {
+        "description": "Framework web Python de alto nível",
+        "common_patterns": ["views", "models", "templates", "forms", "admin"],
+        "best_practices": [
+            "Seguir o padrão MVT (Model-View-Template)",
+            "Utilizar ORM para abstração do banco de dados",
+            "Manter views pequenas e focadas",
+            "Usar Django REST Framework para APIs"
+        ]
+    },
+    "flask": {
+        "description": "Microframework web Python",
+        "common_patterns": ["rotas", "blueprints", "extensões", "contexto"],
+        "best_practices": [
+            "Estruturar aplicação com blueprints para escalabilidade",
+            "Usar extensões para funcionalidades comuns",
+            "Centralizar configuração",
+            "Implementar padrão de fábrica de aplicação"
+        ]
+    },
+    "vue": {
+        "description": "Framework JavaScript progressivo para UIs",
+        "common_patterns": ["componentes", "diretivas", "props", "emits", "composition API"],
+        "best_practices": [
+            "Utilizar Single-File Components",
+            "Preferir Composition API para componentes complexos",
+            "Organizar código por funcionalidade em vez de tipo",
+            "Utilizar Pinia para gerenciamento de estado"
+        ]
+    },
+    "spring": {
+        "description": "Framework Java para desenvolvimento de aplicações",
+        "common_patterns": ["controladores", "serviços", "repositórios", "entidades", "DTOs"],
+        "best_practices": [
+            "Seguir arquitetura em camadas",
+            "Usar injeção de dependências",
+            "Implementar testes de unidade e integração",
+            "Utilizar Spring Data para acesso a dados"
+        ]
+    }
+}
+
+# Palavras-chave (sem distinção de maiúsculas) que indicam cada tecnologia em um texto.
+# Palavras comuns no texto corrido ("node" de uma árvore, "spring", "express") só
+# contam nas formas qualificadas, para não marcar documentos sem relação com a tecnologia
+TECH_KEYWORDS = {
+    "react": ["react", "react.js", "reactjs", "jsx", "tsx", "usestate", "useeffect", "next.js", "nextjs", "redux"],
+    "node": ["node.js", "nodejs", "express.js", "expressjs", "npm", "nestjs", "require(", "package.json"],
+    "django": ["django", "django rest framework", "drf"],
+    "flask": ["flask", "werkzeug", "jinja2"],
+    "vue": ["vue", "vue.js", "vuejs", "nuxt", "pinia", "vuex"],
+    "spring": ["spring boot", "springboot", "spring data", "spring mvc", "spring framework", "@autowired",
+               "@restcontroller", "@springbootapplication"],
+}
+
+# Prefixo das marcações de tecnologia nos metadados dos chunks (valor 1 quando detectada)
+TECH_METADATA_PREFIX = "tech_"
+
+_KEYWORD_TECHNOLOGY = {
+    keyword: name for name, keywords in TECH_KEYWORDS.items() for keyword in keywords
+}
+
+# Uma única expressão com todas as palavras-chave (as mais longas primeiro), delimitadas
+# de modo que "vue" não case com "vues" nem "react" com "reactive"
+_KEYWORD_PATTERN = re.compile(
+    r"(?<![\w@.])(" + "|".join(re.escape(keyword) for keyword in sorted(_KEYWORD_TECHNOLOGY, key=len, reverse=True))
+    + r")(?![\w@]|\.\w)",
+    re.IGNORECASE,
+)
+
+
+def detect_technologies(text: str) -> List[str]:
+    """
+    Detecta as tecnologias mencionadas em um texto.
+
+    Args:
+        text: Texto a analisar
+
+    Returns:
+        Nomes das tecnologias encontradas, na ordem de TECH_CONTEXTS
+    """
+    found = {_KEYWORD_TECHNOLOGY[match.lower()] for match in _KEYWORD_PATTERN.findall(text)}
+    return [name for name in TECH_CONTEXTS if name in found]
+
+
+def technology_metadata_key(technology: str) -> str:
+    """Chave de metadados que marca os chunks de uma tecnologia."""
+    return f"{TECH_METADATA_PREFIX}{technology.lower()}"
+
+
+def normalize_technology(technology: Optional[str]) -> Optional[str]:
+    """Nome da tecnologia em minúsculas, ou None se ela não for suportada."""
+    if not technology:
+        return None
+    technology = technology.strip().lower()
+    return technology if technology in TECH_CONTEXTS else None
+
+
+def tag_technologies(nodes: List[Any]) -> None:
+    """
+    Marca cada chunk com as tecnologias mencionadas no seu texto.
+
+    As marcações ficam fora do texto embutido e do texto enviado ao LLM.
+
+    Args:
+        nodes: Chunks do LlamaIndex
+    """
+    for node in nodes:
+        keys = [technology_metadata_key(name) for name in detect_technologies(node.text)]
+        node.metadata.update(dict.fromkeys(keys, 1))
+        for excluded in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+            excluded.extend(key for key in keys if key not in excluded)
+
+
+@lru_cache(maxsize=64)
+def technology_context(technology: Optional[str]) -> str:
+    """
+    Monta a seção com as informações específicas de uma tecnologia.
+    
+    Args:
+        technology: Nome da tecnologia (ex: "react")
+        
+    Returns:
+        Seção em markdown a ser anexada ao contexto, ou "" se a tecnologia não for
+        conhecida (memorizada por nome: a seção de cada tecnologia é montada uma única vez)
+    """
+    if not technology or technology.lower() not in TECH_CONTEXTS:
+        return ""
+    tech_info = TECH_CONTEXTS[technology.lower()]
+    tech_context = f"\n\n## Contexto Específico: {technology}\n"
+    tech_context += f"- {tech_info['description']}\n"
+    tech_context += "- Padrões comuns: " + ", ".join(tech_info['common_patterns']) + "\n"
+    tech_context += "- Melhores práticas:\n"
+    for practice in tech_info['best_practices']:
+        tech_context += f"  - {practice}\n"
+    return tech_context
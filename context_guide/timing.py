@@ -0,0 +1,94 @@
+"""
+Utilitários para medir o tempo de cada etapa de uma requisição.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+
+
+class StageTimer:
+    """Acumula tempos nomeados por etapa (em segundos)."""
+
+    def __init__(self):
+        """Inicializa o cronômetro sem nenhuma etapa registrada."""
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Mede o tempo gasto no bloco e o acumula na etapa informada.
+
+        Args:
+            name: Nome da etapa
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+        Acumula um tempo já medido em uma etapa.
+
+        Args:
+            name: Nome da etapa
+            seconds: Tempo em segundos
+        """
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def merge(self, timings: Optional[Dict[str, float]], prefix: str = "") -> None:
+        """
+        Incorpora tempos medidos por outro componente.
+
+        Args:
+            timings: Dicionário etapa -> segundos
+            prefix: Prefixo aplicado ao nome de cada etapa incorporada
+        """
+        for name, seconds in (timings or {}).items():
+            self.add(f"{prefix}{name}", seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Retorna uma cópia dos tempos registrados."""
+        return dict(self.timings)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """
+    Calcula um percentil com interpolação linear entre as amostras.
+
+    Args:
+        values: Amostras (não precisam estar ordenadas)
+        pct: Percentil desejado, entre 0 e 100
+
+    Returns:
+        Valor do percentil (0.0 se não houver amostras)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_latencies(values: Sequence[float]) -> Dict[str, float]:
+    """
+    Resume uma série de latências (em segundos) em média e percentis.
+
+    Args:
+        values: Latências observadas
+
+    Returns:
+        Dicionário com count, mean, p50, p90, p99 e max
+    """
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
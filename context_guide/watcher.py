@@ -2,74 +2,369 @@
 Módulo para monitorar alterações em arquivos markdown e atualizar o índice.
 """
 
+import os
 import time
 import logging
+import threading
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Tempo sem novos eventos antes de disparar uma atualização (segundos)
+DEFAULT_QUIET_PERIOD = 2.0
+
+# Atraso máximo entre o primeiro evento de um lote e a atualização (segundos)
+DEFAULT_MAX_DELAY = 30.0
+
+# Fração da duração da última atualização usada como janela de espera mínima
+ADAPTIVE_WINDOW_FACTOR = 1.0
+
+# Eventos do watchdog que não indicam alteração de conteúdo
+IGNORED_EVENT_TYPES = ("opened", "closed_no_write")
+
+# Intervalo padrão entre varreduras do monitoramento por polling (segundos)
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Identidade de um arquivo na varredura: (inode, mtime_ns, tamanho)
+FileSignature = Tuple[int, int, int]
+
+class ChangeCoalescer:
+    """
+    Agrupa eventos de alteração em lotes com debounce na borda de saída.
+    
+    Cada evento reinicia a janela de silêncio; quando nenhum evento chega durante a
+    janela (ou o atraso máximo desde o primeiro evento do lote é atingido), o callback
+    é chamado uma única vez com todos os caminhos alterados. Eventos recebidos durante
+    uma atualização formam o próximo lote. A janela cresce com a duração da última
+    atualização, para que atualizações caras agrupem mais alterações. Se o callback
+    apenas agenda a atualização (ex: em um executor), a duração real é informada por
+    `observe_update`.
+    """
+    
+    def __init__(self, callback: Callable[[List[str]], None], quiet_period: float = DEFAULT_QUIET_PERIOD,
+                 max_delay: float = DEFAULT_MAX_DELAY, adaptive: bool = True, time_callback: bool = True):
+        """
+        Inicializa o agrupador de eventos.
+        
+        Args:
+            callback: Função chamada com a lista ordenada de caminhos alterados
+            quiet_period: Tempo mínimo sem novos eventos antes de disparar a atualização
+            max_delay: Atraso máximo entre o primeiro evento do lote e a atualização
+            adaptive: Se a janela deve se adaptar à duração da última atualização
+            time_callback: Se a duração do callback é a da atualização; False quando o
+                callback só agenda a atualização e a duração vem de `observe_update`
+        """
+        self.callback = callback
+        self.quiet_period = quiet_period
+        self.max_delay = max(max_delay, quiet_period)
+        self.adaptive = adaptive
+        self.time_callback = time_callback
+        self.window = quiet_period
+        self.stats = {"events": 0, "batches": 0, "last_batch_size": 0, "last_update_seconds": 0.0}
+        
+        self._pending: Set[str] = set()
+        self._first_event = 0.0
+        self._last_event = 0.0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="context-guide-coalescer", daemon=True)
+        self._thread.start()
+    
+    def add(self, paths: Iterable[str]) -> None:
+        """
+        Registra caminhos alterados no lote pendente.
+        
+        Args:
+            paths: Caminhos dos arquivos alterados
+        """
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            for path in paths:
+                self._pending.add(str(path))
+                self.stats["events"] += 1
+            self._condition.notify()
+    
+    def _deadline(self) -> float:
+        """Momento em que o lote pendente deve ser emitido."""
+        return min(self._last_event + self.window, self._first_event + self.max_delay)
+    
+    def _run(self) -> None:
+        """Laço da thread que emite os lotes."""
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._pending or time.monotonic() < self._deadline()):
+                    timeout = self._deadline() - time.monotonic() if self._pending else None
+                    self._condition.wait(timeout)
+                if self._stopped and not self._pending:
+                    return
+                batch = sorted(self._pending)
+                self._pending.clear()
+            
+            self._emit(batch)
+    
+    def _emit(self, batch: List[str]) -> None:
+        """Chama o callback com um lote e ajusta a janela de espera."""
+        logger.info(f"Atualizando índice com {len(batch)} arquivo(s) alterado(s)")
+        start_time = time.monotonic()
+        try:
+            self.callback(batch)
+        except Exception as e:
+            logger.error(f"Erro ao processar lote de alterações: {e}")
+        duration = time.monotonic() - start_time
+        
+        self.stats["batches"] += 1
+        self.stats["last_batch_size"] = len(batch)
+        if self.time_callback:
+            self.observe_update(duration)
+    
+    def observe_update(self, seconds: float) -> None:
+        """
+        Registra a duração de uma atualização e ajusta a janela de espera.
+        
+        Args:
+            seconds: Duração da atualização em segundos
+        """
+        self.stats["last_update_seconds"] = seconds
+        if self.adaptive:
+            self.window = min(self.max_delay, max(self.quiet_period, seconds * ADAPTIVE_WINDOW_FACTOR))
+    
+    def flush(self) -> None:
+        """Emite imediatamente o lote pendente, se houver."""
+        with self._condition:
+            self._first_event = self._last_event = float("-inf")
+            self._condition.notify()
+    
+    def stop(self, flush: bool = True) -> None:
+        """
+        Encerra a thread do agrupador.
+        
+        Args:
+            flush: Se o lote pendente deve ser emitido antes de encerrar
+        """
+        with self._condition:
+            if not flush:
+                self._pending.clear()
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+class MarkdownChangeHandler(FileSystemEventHandler):
+    """Encaminha ao agrupador os eventos do watchdog que alteram arquivos markdown."""
+    
+    def __init__(self, coalescer: ChangeCoalescer):
+        self.coalescer = coalescer
+    
+    def on_any_event(self, event):
+        # Leituras (opened/closed_no_write) não alteram o conteúdo
+        if event.is_directory or event.event_type in IGNORED_EVENT_TYPES:
+            return
+        
+        # Movimentações informam a origem e o destino
+        paths = [path for path in (event.src_path, getattr(event, "dest_path", ""))
+                 if path and path.endswith('.md')]
+        if not paths:
+            return
+        
+        logger.debug(f"Detectada alteração em {', '.join(paths)}")
+        self.coalescer.add(paths)
+
+def scan_markdown_files(directory: str) -> Dict[str, FileSignature]:
+    """
+    Lista os arquivos markdown de uma árvore com sua assinatura de stat.
+    
+    Usa os.scandir, que reaproveita as informações do diretório sempre que possível;
+    arquivos e diretórios ocultos são ignorados, como na indexação.
+    
+    Args:
+        directory: Diretório raiz
+        
+    Returns:
+        Dicionário caminho -> (inode, mtime_ns, tamanho)
+    """
+    snapshot: Dict[str, FileSignature] = {}
+    pending = [str(directory)]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.name.endswith(".md") and entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        # Arquivo removido durante a varredura
+                        continue
+        except OSError:
+            continue
+    return snapshot
+
+def diff_snapshots(previous: Dict[str, FileSignature], current: Dict[str, FileSignature]) -> List[str]:
+    """
+    Compara duas varreduras e retorna os caminhos criados, removidos ou alterados.
+    
+    Args:
+        previous: Varredura anterior
+        current: Varredura atual
+        
+    Returns:
+        Lista ordenada de caminhos com alterações
+    """
+    changed = [path for path, signature in current.items() if previous.get(path) != signature]
+    changed.extend(path for path in previous if path not in current)
+    return sorted(changed)
+
+class PollingObserver:
+    """Monitora uma árvore de arquivos markdown por varreduras periódicas."""
+    
+    def __init__(self, directory: str, coalescer: ChangeCoalescer, interval: float = DEFAULT_POLL_INTERVAL):
+        """
+        Inicializa o monitoramento por polling.
+        
+        Args:
+            directory: Diretório a ser monitorado
+            coalescer: Agrupador que recebe os caminhos alterados
+            interval: Intervalo entre varreduras em segundos
+        """
+        self.directory = str(directory)
+        self.coalescer = coalescer
+        self.interval = interval
+        self.snapshot: Dict[str, FileSignature] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """Faz a varredura inicial e inicia a thread de polling."""
+        self.snapshot = scan_markdown_files(self.directory)
+        self._thread = threading.Thread(target=self._run, name="context-guide-polling", daemon=True)
+        self._thread.start()
+    
+    def poll(self) -> List[str]:
+        """
+        Executa uma varredura e encaminha as alterações ao agrupador.
+        
+        Returns:
+            Caminhos alterados desde a varredura anterior
+        """
+        current = scan_markdown_files(self.directory)
+        changed = diff_snapshots(self.snapshot, current)
+        self.snapshot = current
+        if changed:
+            logger.debug(f"Detectadas {len(changed)} alterações por polling")
+            self.coalescer.add(changed)
+        return changed
+    
+    def _run(self) -> None:
+        """Laço da thread de polling."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Erro na varredura de {self.directory}: {e}")
+    
+    def stop(self) -> None:
+        """Encerra a thread de polling."""
+        self._stop_event.set()
+    
+    def join(self) -> None:
+        """Aguarda o encerramento da thread de polling."""
+        if self._thread:
+            self._thread.join()
+
 class FileWatcher:
     """Classe para monitorar alterações em arquivos markdown."""
     
-    def __init__(self, directory: str, callback: Callable[[], None]):
+    def __init__(self, directory: str, callback: Callable[[List[str]], None],
+                 quiet_period: float = DEFAULT_QUIET_PERIOD, max_delay: float = DEFAULT_MAX_DELAY,
+                 poll_interval: Optional[float] = None, force_polling: Optional[bool] = None,
+                 time_callback: bool = True):
         """
         Inicializa o observador de arquivos.
         
         Args:
             directory: Diretório a ser monitorado
-            callback: Função a ser chamada quando uma mudança for detectada
+            callback: Função chamada com a lista de arquivos alterados em cada lote
+            quiet_period: Tempo sem novos eventos antes de disparar a atualização
+            max_delay: Atraso máximo entre a primeira alteração e a atualização
+            poll_interval: Intervalo entre varreduras no modo polling (padrão: variável
+                CONTEXT_GUIDE_WATCH_POLL_INTERVAL ou 2 segundos)
+            force_polling: Usa polling mesmo com o watchdog disponível, para sistemas de
+                arquivos de rede sem eventos do kernel (padrão: variável CONTEXT_GUIDE_WATCH_POLLING)
+            time_callback: Se a duração do callback é a da atualização; False quando o
+                callback só agenda a atualização e a duração vem de `observe_update`
         """
+        if poll_interval is None:
+            poll_interval = float(os.environ.get("CONTEXT_GUIDE_WATCH_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+        if force_polling is None:
+            force_polling = os.environ.get("CONTEXT_GUIDE_WATCH_POLLING", "").lower() in ("1", "true", "yes")
+        
         self.directory = Path(directory)
         self.callback = callback
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.time_callback = time_callback
         self.observer = None
-        self.watchdog_available = False
+        self.coalescer: Optional[ChangeCoalescer] = None
+        self.watchdog_available = WATCHDOG_AVAILABLE
+        self.mode: Optional[str] = None
     
     def start(self) -> None:
-        """Inicia o monitoramento de alterações."""
-        logger.info(f"Iniciado monitoramento simulado em {self.directory}")
-        try:
-            from watchdog.observers import Observer
-            from watchdog.events import FileSystemEventHandler
-            
-            class MarkdownChangeHandler(FileSystemEventHandler):
-                def __init__(self, callback):
-                    self.callback = callback
-                    self._last_event_time = 0
-                    self._debounce_delay = 2.0  # segundos para debounce
-                
-                def on_any_event(self, event):
-                    if event.is_directory or not event.src_path.endswith('.md'):
-                        return
-                        
-                    # Debounce para evitar múltiplas atualizações em sequência
-                    current_time = time.time()
-                    if current_time - self._last_event_time < self._debounce_delay:
-                        return
-                    
-                    self._last_event_time = current_time
-                    
-                    logger.info(f"Detectada alteração em {event.src_path}")
-                    self.callback()
-            
+        """Inicia o monitoramento de alterações (watchdog ou polling)."""
+        self.coalescer = ChangeCoalescer(self.callback, self.quiet_period, self.max_delay,
+                                         time_callback=self.time_callback)
+        
+        if self.watchdog_available and not self.force_polling:
             self.observer = Observer()
-            event_handler = MarkdownChangeHandler(self.callback)
-            self.observer.schedule(event_handler, str(self.directory), recursive=True)
+            self.observer.schedule(MarkdownChangeHandler(self.coalescer), str(self.directory), recursive=True)
             self.observer.start()
-            self.watchdog_available = True
+            self.mode = "watchdog"
             logger.info(f"Monitoramento real iniciado em {self.directory}")
-        except ImportError:
-            logger.warning("Watchdog não encontrado, usando monitoramento simulado")
+            return
+        
+        if not self.watchdog_available:
+            logger.warning("Watchdog não encontrado, usando monitoramento por polling")
+        self.observer = PollingObserver(str(self.directory), self.coalescer, self.poll_interval)
+        self.observer.start()
+        self.mode = "polling"
+        logger.info(f"Monitoramento por polling iniciado em {self.directory} "
+                    f"({len(self.observer.snapshot)} arquivos, intervalo de {self.poll_interval}s)")
+    
+    def observe_update(self, seconds: float) -> None:
+        """Informa a duração de uma atualização agendada pelo callback (ver `ChangeCoalescer`)."""
+        if self.coalescer:
+            self.coalescer.observe_update(seconds)
     
     def stop(self) -> None:
         """Para o monitoramento de alterações."""
-        if self.observer and self.watchdog_available:
+        if self.observer:
             try:
                 self.observer.stop()
                 self.observer.join()
             except Exception as e:
                 logger.error(f"Erro ao parar observador: {e}")
-        logger.info("Monitoramento encerrado") 
\ No newline at end of file
+        if self.coalescer:
+            self.coalescer.stop()
+            self.coalescer = None
+        logger.info("Monitoramento encerrado")
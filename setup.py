@@ -44,6 +44,9 @@ setup(
             "uvicorn>=0.24.0",
             "pydantic>=2.4.0",
             "requests>=2.31.0",
+            "httpx>=0.25.0",
+            "orjson>=3.9.0",
+            "zstandard>=0.22",
         ],
     },
 ) 
\ No newline at end of file
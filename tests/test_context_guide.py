@@ -2,17 +2,33 @@
 Testes unitários para o Context Guide.
 """
 
+import asyncio
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
+from pathlib import Path
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from context_guide import __version__
 from context_guide.context import ContextManager
-from context_guide.prompt_generator import PromptGenerator
-from context_guide.watcher import FileWatcher
+from context_guide.prompt_generator import PromptGenerator, BEST_PRACTICES_SECTION
+from context_guide.watcher import FileWatcher, ChangeCoalescer, PollingObserver
+from context_guide.timing import StageTimer
+from context_guide.corpus import generate_corpus
+from context_guide.embeddings import hash_embedding_vector, LLAMA_INDEX_AVAILABLE
+from context_guide.indexing import IndexingExecutor, IndexingCancelled, BuildThrottle
+from context_guide.packing import pack_sources, estimate_tokens
+from context_guide.compression import SentenceCompressor
+from context_guide.concurrency import SingleFlight
+from context_guide.technologies import detect_technologies
+from context_guide.snapshot import SnapshotContextManager, export_snapshot, SNAPSHOT_DIRNAME
 
 class TestContextGuide(unittest.TestCase):
     """Testes básicos para os componentes principais do Context Guide."""
@@ -41,6 +57,106 @@ class TestContextGuide(unittest.TestCase):
         self.assertIn("Contexto de teste", prompt)
         self.assertIn("test.md", prompt)
         
+    def test_prompt_generator_stage_timings(self):
+        """Testa o registro dos tempos por etapa na geração de prompt."""
+        context_manager = MagicMock()
+        context_manager.get_relevant_context.return_value = {
+            'context': 'Contexto de teste',
+            'sources': [{'content': 'Conteúdo', 'metadata': {'file_path': 'docs/test.md'}}],
+            'timings': {'query_embedding': 0.5}
+        }
+        timer = StageTimer()
+        
+        PromptGenerator(context_manager).generate_prompt("Teste", timer=timer)
+        
+        self.assertEqual(timer.timings['retrieval.query_embedding'], 0.5)
+        self.assertIn('retrieval', timer.timings)
+        self.assertIn('prompt_assembly', timer.timings)
+    
+    def test_prompt_generator_stream_matches_prompt(self):
+        """Testa se as partes do prompt em streaming formam o mesmo prompt completo."""
+        context_manager = MagicMock()
+        context_manager.get_relevant_context.return_value = {
+            'context': 'Primeira seção\n\nSegunda seção',
+            'sources': [
+                {'content': 'Primeira seção', 'metadata': {'file_path': 'docs/a.md'}},
+                {'content': 'Segunda seção', 'metadata': {'file_path': 'docs/b.md'}}
+            ]
+        }
+        generator = PromptGenerator(context_manager)
+        
+        parts = list(generator.stream_prompt("Teste"))
+        
+        self.assertEqual([part['event'] for part in parts], ['header', 'section', 'section', 'footer'])
+        self.assertEqual([part.get('source') for part in parts[1:3]], ['a.md', 'b.md'])
+        self.assertEqual("".join(part['text'] for part in parts), generator.generate_prompt("Teste"))
+    
+    def test_pack_sources_budget_and_overlap(self):
+        """Testa o empacotamento por relevância, a remoção de sobreposição e o descarte."""
+        sentences = [f"Frase {i} descreve o componente {i % 5} da arquitetura." for i in range(40)]
+        first, second = " ".join(sentences[:25]), " ".join(sentences[20:])
+        sources = [
+            {'content': second, 'metadata': {'file_path': 'docs/a.md'}, 'score': 0.8},
+            {'content': first, 'metadata': {'file_path': 'docs/a.md'}, 'score': 0.9},
+            {'content': "Seção irrelevante. " * 200, 'metadata': {'file_path': 'docs/b.md'}, 'score': 0.1},
+        ]
+        
+        packed, report = pack_sources(sources, estimate_tokens(" ".join(sentences)) + 10)
+        
+        self.assertEqual([source['content'] for source in packed], [first, " ".join(sentences[25:])])
+        self.assertEqual((report['sources_packed'], report['sources_dropped']), (2, 1))
+        self.assertGreater(report['overlap_tokens_removed'], 0)
+        self.assertEqual(report['tokens_dropped'], estimate_tokens(sources[2]['content']))
+        
+        context_manager = MagicMock()
+        context_manager.get_relevant_context.return_value = {'context': '', 'sources': sources}
+        result = PromptGenerator(context_manager).build_prompt("Teste", max_tokens=300)
+        self.assertLessEqual(estimate_tokens(result['prompt']), 300)
+        self.assertTrue(result['packing']['truncated'])
+    
+    def test_sentence_compressor_keeps_relevant_sentences(self):
+        """Testa a compressão extrativa por embedding, com cache, e o fallback lexical."""
+        content = ("Este documento segue o template padrão. Preencha as seções abaixo.\n"
+                   "A autenticação usa tokens JWT assinados. Revise antes de publicar.\n"
+                   "Mantenha o documento atualizado.")
+        sources = [{'content': content, 'metadata': {'file_path': 'docs/a.md'}, 'score': 0.7}]
+        embed_batch = MagicMock(side_effect=lambda texts: [hash_embedding_vector(text) for text in texts])
+        compressor = SentenceCompressor(embed_batch=embed_batch, keep_ratio=0.2, min_sentences=1)
+        query = "autenticação com tokens JWT"
+        
+        compressed, report = compressor.compress(query, sources, hash_embedding_vector(query))
+        compressor.compress(query, sources, hash_embedding_vector(query))
+        
+        self.assertEqual(compressed[0]['content'], "A autenticação usa tokens JWT assinados.")
+        self.assertEqual(compressed[0]['metadata'], sources[0]['metadata'])
+        self.assertEqual((report['method'], report['sentences_total'], report['sentences_kept']), ("embedding", 5, 1))
+        self.assertEqual(embed_batch.call_count, 1)
+        
+        lexical, report = SentenceCompressor(keep_ratio=0.2, min_sentences=1).compress(query, sources)
+        self.assertEqual(lexical[0]['content'], compressed[0]['content'])
+        self.assertEqual(report['method'], "lexical")
+    
+    def test_prompt_cache_invalidated_by_index_version(self):
+        """Testa o cache de prompts e sua invalidação quando o índice muda."""
+        context_manager = MagicMock(index_version=1)
+        context_manager.get_relevant_context.return_value = {
+            'context': 'Seção', 'sources': [{'content': 'Seção', 'metadata': {'file_path': 'docs/a.md'}}]
+        }
+        generator = PromptGenerator(context_manager)
+        
+        first = generator.build_prompt("Teste", technology="react", include_best_practices=True)
+        second = generator.build_prompt("Teste", technology="react", include_best_practices=True)
+        context_manager.index_version = 2
+        third = generator.build_prompt("Teste", technology="react", include_best_practices=True)
+        
+        self.assertEqual((first['cached'], second['cached'], third['cached']), (False, True, False))
+        self.assertEqual(second['prompt'], first['prompt'])
+        self.assertIn("## Contexto Específico: react", first['prompt'])
+        self.assertNotIn("(tecnologia: react)", first['prompt'])
+        self.assertEqual(context_manager.get_relevant_context.call_args.kwargs["filters"], {"technology": "react"})
+        self.assertTrue(first['prompt'].endswith(BEST_PRACTICES_SECTION))
+        self.assertEqual(context_manager.get_relevant_context.call_count, 2)
+    
     def test_context_manager_init(self):
         """Testa a inicialização do ContextManager."""
         # Cria uma instância e verifica atributos básicos
@@ -70,6 +186,346 @@ class TestContextGuide(unittest.TestCase):
         watcher.stop()
         mock_observer.return_value.stop.assert_called_once()
         mock_observer.return_value.join.assert_called_once()
+    
+    def test_change_coalescer_batches_burst(self):
+        """Testa o agrupamento de uma rajada de eventos em uma única atualização."""
+        batches = []
+        
+        def slow_update(paths):
+            batches.append(paths)
+            time.sleep(0.2)
+        
+        coalescer = ChangeCoalescer(slow_update, quiet_period=0.05, max_delay=1.0)
+        try:
+            for i in range(50):
+                coalescer.add([f"docs/arquivo-{i % 20}.md"])
+            time.sleep(0.4)
+            
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(len(batches[0]), 20)
+            # A janela passa a acompanhar a duração da última atualização
+            self.assertGreaterEqual(coalescer.window, 0.2)
+            
+            coalescer.add(["docs/ultimo.md"])
+        finally:
+            coalescer.stop()
+        
+        # O último lote pendente é emitido ao encerrar
+        self.assertEqual(batches[-1], ["docs/ultimo.md"])
+    
+    def test_change_coalescer_observes_scheduled_updates(self):
+        """Testa a janela adaptada pela duração informada quando o callback só agenda a atualização."""
+        coalescer = ChangeCoalescer(lambda paths: None, quiet_period=0.05, max_delay=1.0, time_callback=False)
+        try:
+            coalescer.add(["docs/a.md"])
+            time.sleep(0.2)
+            # O tempo de agendamento não altera a janela
+            self.assertEqual(coalescer.window, 0.05)
+            
+            coalescer.observe_update(0.5)
+            self.assertEqual(coalescer.window, 0.5)
+            self.assertEqual(coalescer.stats["last_update_seconds"], 0.5)
+        finally:
+            coalescer.stop()
+    
+    def test_polling_observer_detects_changes(self):
+        """Testa a detecção de criação, alteração e remoção por varredura."""
+        with tempfile.TemporaryDirectory() as docs_dir:
+            os.makedirs(os.path.join(docs_dir, "sub"))
+            os.makedirs(os.path.join(docs_dir, ".oculto"))
+            existing = os.path.join(docs_dir, "sub", "existente.md")
+            with open(existing, "w") as f:
+                f.write("# Existente")
+            coalescer = MagicMock()
+            observer = PollingObserver(docs_dir, coalescer, interval=60)
+            observer.snapshot = {}
+            observer.poll()
+            
+            created = os.path.join(docs_dir, "novo.md")
+            with open(created, "w") as f:
+                f.write("# Novo")
+            with open(existing, "a") as f:
+                f.write("\nMais conteúdo")
+            with open(os.path.join(docs_dir, ".oculto", "ignorado.md"), "w") as f:
+                f.write("# Ignorado")
+            self.assertEqual(observer.poll(), sorted([created, existing]))
+            
+            os.remove(created)
+            self.assertEqual(observer.poll(), [created])
+            self.assertEqual(observer.poll(), [])
+            coalescer.add.assert_called_with([created])
+    
+    def test_indexing_executor_merges_and_preempts(self):
+        """Testa a mescla de solicitações pendentes e a interrupção por reconstrução completa."""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        
+        def update_index(should_stop, progress):
+            calls.append(len(calls))
+            started.set()
+            while True:
+                if should_stop():
+                    raise IndexingCancelled()
+                if release.is_set():
+                    return
+                time.sleep(0.01)
+        
+        def update_documents(paths, should_stop, progress):
+            update_index(should_stop, progress)
+        
+        executor = IndexingExecutor(MagicMock(update_index=update_index, update_documents=update_documents))
+        try:
+            executor.submit_paths(["docs/a.md"])
+            self.assertTrue(started.wait(1))
+            executor.submit_paths(["docs/b.md", "docs/c.md"])
+            executor.submit_paths(["docs/c.md"])
+            self.assertEqual(executor.status()["queue_depth"], 2)
+            
+            job = executor.submit_full_rebuild()
+            release.set()
+            self.assertTrue(executor.wait_idle(2))
+        finally:
+            executor.stop()
+        
+        status = executor.status()
+        self.assertEqual(job.wait(1)["kind"], "full")
+        self.assertEqual(job.result["status"], "success")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(status["cancelled"], 1)
+        self.assertEqual(status["last_run"]["kind"], "full")
+        self.assertEqual(status["last_run"]["status"], "success")
+    
+    def test_build_throttle_yields_to_queries(self):
+        """Testa que a construção espera as consultas em andamento entre os lotes."""
+        throttle = BuildThrottle(batch_size=2, query_wait=2)
+        finished = threading.Event()
+        
+        def build():
+            throttle.checkpoint()
+            finished.set()
+        
+        with throttle.query():
+            builder = threading.Thread(target=build)
+            builder.start()
+            self.assertFalse(finished.wait(0.1))
+        self.assertTrue(finished.wait(1))
+        builder.join(1)
+        
+        self.assertEqual(throttle.stats["yields"], 1)
+        # Sem consultas em andamento, o lote segue imediatamente
+        throttle.checkpoint()
+        self.assertEqual(throttle.status()["checkpoints"], 2)
+        self.assertEqual(throttle.stats["yields"], 1)
+    
+    def test_single_flight_coalesces_concurrent_calls(self):
+        """Testa que chamadas idênticas simultâneas compartilham uma única execução."""
+        flight = SingleFlight()
+        executions = []
+        
+        async def search():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return {"context": "resultado"}
+        
+        async def run():
+            results = await asyncio.gather(*[flight.do(("context", "consulta"), search) for _ in range(5)])
+            self.assertEqual(flight.in_flight(), 0)
+            # Após o término, a mesma chave é executada novamente
+            await flight.do(("context", "consulta"), search)
+            return results
+        
+        results = asyncio.run(run())
+        
+        self.assertEqual(len(executions), 2)
+        self.assertEqual(flight.stats, {"executions": 2, "coalesced": 4})
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertTrue(all(result == {"context": "resultado"} for result, _ in results))
+
+class TestIndexing(unittest.TestCase):
+    """Testes de indexação com corpus sintético e embedder determinístico."""
+    
+    def test_generate_corpus_layout(self):
+        """Testa que o corpus segue a estrutura de diretórios do init e é determinístico."""
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            files = generate_corpus(first, 14, seed=7)
+            generate_corpus(second, 14, seed=7)
+            
+            self.assertEqual(len(files), 14)
+            self.assertTrue(os.path.isdir(os.path.join(first, "tracking")))
+            self.assertTrue(os.path.isdir(os.path.join(first, "development")))
+            relative = os.path.relpath(files[5], first)
+            with open(files[5]) as a, open(os.path.join(second, relative)) as b:
+                self.assertEqual(a.read(), b.read())
+    
+    def test_hash_embedding_is_deterministic(self):
+        """Testa que o embedder determinístico aproxima textos com tokens em comum."""
+        base = hash_embedding_vector("autenticação com tokens JWT")
+        similar = hash_embedding_vector("tokens JWT para autenticação")
+        other = hash_embedding_vector("deploy em containers")
+        
+        self.assertEqual(base, hash_embedding_vector("autenticação com tokens JWT"))
+        self.assertGreater(sum(a * b for a, b in zip(base, similar)), sum(a * b for a, b in zip(base, other)))
+    
+    @unittest.skipIf(not LLAMA_INDEX_AVAILABLE, "LlamaIndex não está instalado")
+    def test_index_and_query_subdirectories(self):
+        """Testa a indexação recursiva e a consulta com tempos por etapa."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            docs_dir = os.path.join(work_dir, "docs")
+            generate_corpus(docs_dir, 14)
+            manager = ContextManager(docs_dir=docs_dir, db_dir=os.path.join(work_dir, "db"), embed_model="fake")
+            
+            result = manager.get_relevant_context("Tarefas e Progresso do Projeto", 3)
+            
+            self.assertEqual(len(result["sources"]), 3)
+            self.assertIn("vector_search", result["timings"])
+            self.assertEqual(manager.get_index_stats()["chunks"], manager.index_stats["last_build_chunks"])
+            indexed_files = {source["metadata"]["file_path"] for source in manager.get_relevant_context(
+                "Status dos Módulos", 14)["sources"]}
+            self.assertTrue(any(os.sep + "tracking" + os.sep in path for path in indexed_files))
+    
+    @unittest.skipIf(not LLAMA_INDEX_AVAILABLE, "LlamaIndex não está instalado")
+    def test_snapshot_matches_index_and_remaps(self):
+        """Testa a consulta pelo snapshot mapeado e o remapeamento após uma nova versão."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            docs_dir = os.path.join(work_dir, "docs")
+            db_dir = os.path.join(work_dir, "db")
+            generate_corpus(docs_dir, 14)
+            manager = ContextManager(docs_dir=docs_dir, db_dir=db_dir, embed_model="fake")
+            snapshot_root = os.path.join(db_dir, SNAPSHOT_DIRNAME)
+            version = MagicMock(value=export_snapshot(manager.chroma_collection, snapshot_root))
+            reader = SnapshotContextManager(db_dir, manager.embed_model, version_value=version)
+            
+            expected = manager.get_relevant_context("Status dos Módulos", 3)["sources"]
+            result = reader.get_relevant_context("Status dos Módulos", 3)["sources"]
+            
+            self.assertEqual([s["content"] for s in result], [s["content"] for s in expected])
+            self.assertEqual(result[0]["metadata"]["file_path"], expected[0]["metadata"]["file_path"])
+            
+            with open(os.path.join(docs_dir, "novo.md"), "w") as f:
+                f.write("# Observabilidade\n\nMétricas exportadas para o Prometheus.")
+            manager.update_index()
+            version.value = export_snapshot(manager.chroma_collection, snapshot_root)
+            
+            self.assertEqual(reader.get_index_stats()["chunks"], manager.get_index_stats()["chunks"])
+            self.assertEqual(reader.index_version, 2)
+    
+    @unittest.skipIf(not LLAMA_INDEX_AVAILABLE, "LlamaIndex não está instalado")
+    def test_metadata_filters_restrict_search(self):
+        """Testa a busca restrita por grupo de templates, caminho e seção, no índice e no snapshot."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            docs_dir = os.path.join(work_dir, "docs")
+            db_dir = os.path.join(work_dir, "db")
+            generate_corpus(docs_dir, 14)
+            manager = ContextManager(docs_dir=docs_dir, db_dir=db_dir, embed_model="fake")
+            
+            tracking = manager.get_relevant_context("Status dos Módulos", 5, filters={"template_group": "tracking"})
+            self.assertEqual(len(tracking["sources"]), 5)
+            self.assertTrue(all(s["metadata"]["doc_path"].startswith("tracking/") for s in tracking["sources"]))
+            
+            development = manager.get_relevant_context("Status dos Módulos", 5,
+                                                       filters={"path_prefix": "./development/"})
+            self.assertTrue(development["sources"])
+            self.assertTrue(all(s["metadata"]["template_group"] == "development" for s in development["sources"]))
+            
+            first = tracking["sources"][0]["metadata"]
+            section = manager.get_relevant_context("Status dos Módulos", 5, filters={
+                "file_name": first["file_name"], "heading": first["heading"]})
+            self.assertTrue(all(s["metadata"]["heading"] == first["heading"] for s in section["sources"]))
+            self.assertEqual(manager.get_relevant_context("Status", 5, filters={"path_prefix": "nada"})["sources"], [])
+            with self.assertRaises(ValueError):
+                manager.get_relevant_context("Status", 5, filters={"autor": "fulano"})
+            
+            version = MagicMock(value=export_snapshot(manager.chroma_collection, os.path.join(db_dir, SNAPSHOT_DIRNAME)))
+            reader = SnapshotContextManager(db_dir, manager.embed_model, version_value=version)
+            result = reader.get_relevant_context("Status dos Módulos", 5, filters={"template_group": "tracking"})
+            self.assertEqual([s["content"] for s in result["sources"]], [s["content"] for s in tracking["sources"]])
+    
+    @unittest.skipIf(not LLAMA_INDEX_AVAILABLE, "LlamaIndex não está instalado")
+    def test_technology_tags_prefer_matching_chunks(self):
+        """Testa a marcação de tecnologias na indexação e a preferência por elas na consulta."""
+        self.assertEqual(detect_technologies("Telas em React (useState) e API em Node.js; nodes do grafo"),
+                         ["react", "node"])
+        self.assertEqual(detect_technologies("Each node in the tree; in spring we express the plan"), [])
+        self.assertEqual(detect_technologies("API com Spring Boot e const x = require('express')"),
+                         ["node", "spring"])
+        with tempfile.TemporaryDirectory() as work_dir:
+            docs_dir = os.path.join(work_dir, "docs")
+            os.makedirs(docs_dir)
+            for name, text in (("frontend.md", "# Frontend\n\nComponentes de formulário escritos em React."),
+                               ("backend.md", "# Backend\n\nViews de formulário e models em Django."),
+                               ("deploy.md", "# Deploy\n\nFormulário de deploy com containers.")):
+                with open(os.path.join(docs_dir, name), "w") as f:
+                    f.write(text)
+            manager = ContextManager(docs_dir=docs_dir, db_dir=os.path.join(work_dir, "db"), embed_model="fake")
+            
+            sources = manager.get_relevant_context("formulário", 3, filters={"technology": "Django"})["sources"]
+            
+            self.assertEqual(len(sources), 3)
+            self.assertEqual(sources[0]["metadata"]["file_name"], "backend.md")
+            self.assertEqual(sources[0]["metadata"].get("tech_django"), 1)
+            self.assertTrue(all("tech_django" not in s["metadata"] for s in sources[1:]))
+    
+    @unittest.skipIf(not LLAMA_INDEX_AVAILABLE, "LlamaIndex não está instalado")
+    def test_reconcile_offline_changes(self):
+        """Testa a detecção e a aplicação incremental de alterações feitas com o índice fechado."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            docs_dir = os.path.join(work_dir, "docs")
+            db_dir = os.path.join(work_dir, "db")
+            files = generate_corpus(docs_dir, 6)
+            ContextManager(docs_dir=docs_dir, db_dir=db_dir, embed_model="fake")
+            
+            edited, removed, touched = files[0], files[1], files[2]
+            with open(edited, "a") as f:
+                f.write("\n\n## Observabilidade\n\nMétricas exportadas para o Prometheus.\n")
+            os.remove(removed)
+            os.utime(touched, ns=(time.time_ns(), time.time_ns()))
+            created = os.path.join(docs_dir, "novo.md")
+            with open(created, "w") as f:
+                f.write("# Filas\n\nMensagens processadas pelo RabbitMQ.")
+            
+            manager = ContextManager(docs_dir=docs_dir, db_dir=db_dir, embed_model="fake")
+            changes = manager.detect_offline_changes()
+            expected = sorted(str(path.resolve()) for path in (edited, removed, Path(created)))
+            self.assertEqual(changes, expected)
+            
+            stats = manager.update_documents(changes)
+            self.assertEqual((stats["updated"], stats["removed"]), (2, 1))
+            self.assertEqual(manager.detect_offline_changes(), [])
+            indexed = {source["metadata"]["file_path"] for source in manager.get_relevant_context(
+                "Mensagens processadas pelo RabbitMQ", 50)["sources"]}
+            self.assertIn(str(Path(created).resolve()), indexed)
+            self.assertNotIn(str(removed.resolve()), indexed)
+    
+    @unittest.skipIf(not LLAMA_INDEX_AVAILABLE or not shutil.which("git"), "LlamaIndex ou git indisponível")
+    def test_update_incremental_with_git(self):
+        """Testa a atualização incremental a partir do último commit indexado."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            def git(*args):
+                subprocess.run(["git", "-C", work_dir, *args], check=True, capture_output=True)
+            
+            git("init", "-q")
+            git("config", "user.email", "docs@example.com")
+            git("config", "user.name", "Docs")
+            docs_dir = os.path.join(work_dir, "docs")
+            files = generate_corpus(docs_dir, 4)
+            git("add", ".")
+            git("commit", "-q", "-m", "docs")
+            manager = ContextManager(docs_dir=docs_dir, db_dir=os.path.join(work_dir, ".db"), embed_model="fake")
+            self.assertEqual(manager.update_incremental()["changed"], 0)
+            
+            with open(files[0], "a") as f:
+                f.write("\n\nSeção adicionada em um commit.\n")
+            git("commit", "-q", "-am", "edição")
+            created = os.path.join(docs_dir, "rascunho.md")
+            with open(created, "w") as f:
+                f.write("# Rascunho\n\nAinda não versionado.")
+            
+            expected = sorted(str(Path(path).resolve()) for path in (files[0], created))
+            self.assertEqual(manager.detect_git_changes(), expected)
+            result = manager.update_incremental()
+            self.assertEqual((result["mode"], result["updated"]), ("incremental", 2))
+            self.assertEqual(manager.detect_git_changes(), [])
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -2,16 +2,25 @@
 Testes para o servidor MCP e integração com Cursor IDE.
 """
 
+import asyncio
 import os
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock, ANY
 import json
 from fastapi.testclient import TestClient
 
 # Importações condicionais para permitir testes mesmo sem as dependências opcionais
 try:
     from context_guide.mcp_server.server import app
-    from context_guide.mcp_server.cursor_integration import CursorIntegration
+    from context_guide.mcp_server.cursor_integration import AsyncCursorIntegration, CursorIntegration
+    from context_guide.mcp_server.metrics import MetricsRegistry
+    from context_guide.mcp_server.profiling import RequestProfiler
+    from context_guide.mcp_server.projects import ProjectPool, parse_projects
+    from context_guide.mcp_server.admission import AdmissionController, AdmissionMiddleware, parse_limits
+    from fastapi import FastAPI
+    from context_guide.mcp_server.loadtest import parse_mix, run_load_test
+    import httpx
     FASTAPI_AVAILABLE = True
 except ImportError:
     FASTAPI_AVAILABLE = False
@@ -44,7 +53,10 @@ class TestMCPServer(unittest.TestCase):
             
             # Configurar retornos para os mocks
             self.mock_context_manager.get_relevant_context.return_value = mock_context_result
-            self.mock_prompt_generator.generate_prompt.return_value = "Prompt de teste gerado"
+            self.mock_prompt_generator.max_tokens = None
+            self.mock_prompt_generator.build_prompt.return_value = {
+                "prompt": "Prompt de teste gerado", "sources": [], "packing": None
+            }
     
     def tearDown(self):
         """Limpar ambiente após testes."""
@@ -86,9 +98,296 @@ class TestMCPServer(unittest.TestCase):
         self.assertEqual(data["prompt"], "Prompt de teste gerado")
         
         # Verificar se o método correto foi chamado
-        self.mock_prompt_generator.generate_prompt.assert_called_once_with(
-            "Criar componente de login"
+        self.mock_prompt_generator.build_prompt.assert_called_once_with(
+            "Criar componente de login", timer=ANY, max_tokens=None, compress=None,
+            technology=None, include_best_practices=True, filters=None
         )
+    
+    def test_prompt_etag_not_modified(self):
+        """Testar a revalidação do prompt com ETag/If-None-Match."""
+        payload = {"request": "Criar componente de login"}
+        first = self.client.post("/prompt", json=payload)
+        etag = first.headers["etag"]
+        
+        second = self.client.post("/prompt", json=payload, headers={"If-None-Match": etag})
+        
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers["etag"], etag)
+        self.mock_prompt_generator.build_prompt.assert_called_once()
+    
+    def test_context_etag_follows_index_version(self):
+        """Testar o ETag de /context, válido enquanto a versão do índice não muda."""
+        self.mock_context_manager.index_version = 1
+        payload = {"query": "Como implementar autenticação?"}
+        etag = self.client.post("/context", json=payload).headers["etag"]
+        
+        unchanged = self.client.post("/context", json=payload, headers={"If-None-Match": etag})
+        self.mock_context_manager.index_version = 2
+        changed = self.client.post("/context", json=payload, headers={"If-None-Match": etag})
+        
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+    
+    def test_prompt_send_forwards_in_background(self):
+        """Testar a geração e o encaminhamento do prompt ao Cursor em uma requisição."""
+        with patch('context_guide.mcp_server.server.cursor_client') as mock_cursor:
+            mock_cursor.token = "test-token-123"
+            mock_cursor.send_context_to_cursor = AsyncMock(return_value=True)
+            payload = {"request": "Criar componente de login", "technology_context": "react",
+                       "conversation_id": "conv-1"}
+            response = self.client.post("/prompt/send", json=payload)
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "scheduled")
+        args, kwargs = mock_cursor.send_context_to_cursor.call_args
+        # A seção da tecnologia faz parte do prompt gerado; o servidor não a repete
+        self.assertEqual(args[0], "Prompt de teste gerado")
+        self.assertEqual(self.mock_prompt_generator.build_prompt.call_args.kwargs["technology"], "react")
+        self.assertEqual(kwargs["conversation_id"], "conv-1")
+    
+    def test_context_endpoint_routes_to_project(self):
+        """Testar o roteamento da consulta para o índice do projeto informado."""
+        project_manager = MagicMock()
+        project_manager.get_relevant_context.return_value = {"context": "Contexto do projeto", "sources": []}
+        pool = ProjectPool({"api": {"docs_dir": "api/docs", "db_dir": "api/db"}}, embed_model="modelo",
+                           manager_factory=lambda docs_dir, db_dir, model: project_manager)
+        
+        with patch('context_guide.mcp_server.server.project_pool', pool):
+            response = self.client.post("/context", json={"query": "Autenticação", "project": "api"})
+            unknown = self.client.post("/context", json={"query": "Autenticação", "project": "web"})
+        
+        self.assertEqual(response.json()["context"], "Contexto do projeto")
+        self.mock_context_manager.get_relevant_context.assert_not_called()
+        self.assertEqual(unknown.status_code, 404)
+    
+    def test_update_index_uses_project_executor(self):
+        """Testar a reconstrução do índice de um projeto pelo seu executor de indexação."""
+        project_manager = MagicMock()
+        pool = ProjectPool({"api": {"docs_dir": "api/docs", "db_dir": "api/db"}}, embed_model="modelo",
+                           manager_factory=lambda docs_dir, db_dir, model: project_manager)
+        
+        try:
+            with patch('context_guide.mcp_server.server.project_pool', pool):
+                response = self.client.post("/update-index", params={"project": "api"})
+            
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(pool.info()["loaded"]["api"]["in_use"], 0)
+            # A reconstrução roda no executor, que permite interrompê-la
+            self.assertIn("should_stop", project_manager.update_index.call_args.kwargs)
+            self.mock_context_manager.update_index.assert_not_called()
+        finally:
+            pool.close()
+    
+    def test_prompt_stream_endpoint(self):
+        """Testar o envio do prompt em partes via Server-Sent Events."""
+        self.mock_prompt_generator.stream_prompt.return_value = iter([
+            {"event": "header", "text": "# Solicitação: Login\n\n"},
+            {"event": "section", "text": "Contexto", "source": "test.md"},
+            {"event": "footer", "text": "\n\nPor favor, implemente: Login"},
+        ])
+        
+        response = self.client.post("/prompt/stream", json={"request": "Login"})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        self.assertEqual([lines[0] for lines in events], [
+            "event: header", "event: section", "event: footer", "event: best_practices", "event: done"
+        ])
+        section = json.loads(events[1][1][len("data: "):])
+        self.assertEqual(section, {"text": "Contexto", "source": "test.md"})
+    
+    def test_response_compression(self):
+        """Testar a compressão negociada das respostas grandes."""
+        self.mock_context_manager.get_relevant_context.return_value = {
+            "context": "Contexto extenso. " * 500,
+            "sources": [{"content": "Conteúdo extenso. " * 200, "metadata": {}, "score": 0.9}]
+        }
+        payload = {"query": "Como implementar autenticação?"}
+        
+        compressed = self.client.post("/context", json=payload, headers={"Accept-Encoding": "gzip"})
+        identity = self.client.post("/context", json=payload, headers={"Accept-Encoding": "identity"})
+        small = self.client.get("/health", headers={"Accept-Encoding": "gzip"})
+        
+        self.assertEqual(compressed.headers["content-encoding"], "gzip")
+        self.assertLess(int(compressed.headers["content-length"]), len(identity.content))
+        self.assertEqual(compressed.json()["context"], identity.json()["context"])
+        self.assertNotIn("content-encoding", identity.headers)
+        self.assertNotIn("content-encoding", small.headers)
+    
+    def test_context_endpoint_timings(self):
+        """Testar o retorno opcional dos tempos por etapa e sua agregação nas estatísticas."""
+        self.mock_context_manager.get_relevant_context.return_value = {
+            "context": "Contexto", "sources": [],
+            "timings": {"query_embedding": 0.01, "vector_search": 0.02}
+        }
+        payload = {"query": "Como implementar autenticação?"}
+        
+        without_timings = self.client.post("/context", json=payload).json()
+        with_timings = self.client.post("/context?timings=1", json=payload).json()
+        stats = self.client.get("/stats").json()
+        
+        self.assertIsNone(without_timings["timings"])
+        self.assertEqual(with_timings["timings"], {"query_embedding": 0.01, "vector_search": 0.02})
+        self.assertGreaterEqual(stats["stage_timings"]["context.vector_search"]["count"], 2)
+    
+    def test_metrics_endpoint(self):
+        """Testar o endpoint de métricas no formato Prometheus."""
+        self.mock_context_manager.get_index_stats.return_value = {
+            "chunks": 42, "size_bytes": 2048, "last_build_seconds": 1.5,
+            "last_build_timestamp": 0, "chunks_per_second": 28.0
+        }
+        self.client.post("/context", json={"query": "autenticação"})
+        
+        response = self.client.get("/metrics")
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        body = response.text
+        self.assertIn('context_guide_http_request_duration_seconds_count{endpoint="/context"}', body)
+        self.assertIn("# TYPE context_guide_http_requests_in_flight gauge", body)
+        self.assertIn("context_guide_index_chunks 42", body)
+        self.assertIn("context_guide_index_size_bytes 2048", body)
+
+    def test_sampling_profiler(self):
+        """Testar a ativação do profiler via endpoint administrativo e a rotação dos arquivos."""
+        with tempfile.TemporaryDirectory() as profile_dir:
+            profiler = RequestProfiler(output_dir=profile_dir, max_files=2)
+            headers = {"X-Admin-Token": "segredo"}
+            with patch('context_guide.mcp_server.server.request_profiler', profiler), \
+                    patch.dict('os.environ', {"CONTEXT_GUIDE_ADMIN_TOKEN": "segredo"}):
+                response = self.client.post("/admin/profiling", json={"sample_rate": 1.0}, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                
+                for _ in range(3):
+                    self.client.post("/context", json={"query": "autenticação"})
+                
+                status = self.client.get("/admin/profiling", headers=headers).json()
+                self.assertEqual(status["profiled_requests"], 3)
+                self.assertEqual(len([f for f in os.listdir(profile_dir) if f.endswith(".pstats")]), 2)
+                
+                response = self.client.post("/admin/profiling", json={"sample_rate": 2.0}, headers=headers)
+                self.assertEqual(response.status_code, 400)
+    
+    def test_admin_token_required(self):
+        """Testar que os endpoints administrativos exigem o token quando configurado."""
+        with patch.dict('os.environ', {"CONTEXT_GUIDE_ADMIN_TOKEN": "segredo"}):
+            self.assertEqual(self.client.get("/admin/profiling").status_code, 403)
+            response = self.client.get("/admin/profiling", headers={"X-Admin-Token": "segredo"})
+            self.assertEqual(response.status_code, 200)
+    
+    def test_admin_disabled_without_token(self):
+        """Testar que os endpoints administrativos ficam desativados sem token configurado."""
+        with patch.dict('os.environ'):
+            os.environ.pop("CONTEXT_GUIDE_ADMIN_TOKEN", None)
+            self.assertEqual(self.client.get("/admin/profiling").status_code, 404)
+            response = self.client.post("/admin/profiling", json={"sample_rate": 1.0})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(self.client.post("/admin/tracemalloc/start").status_code, 404)
+
+    def test_load_test_harness(self):
+        """Testar o gerador de carga contra a aplicação em processo."""
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                return await run_load_test("http://testserver", duration=0.3, concurrency=3,
+                                           mix=parse_mix("context=3,prompt=1"), rebuild_at=0.1, client=client)
+        
+        report = asyncio.run(run())
+        
+        self.assertGreater(report["overall"]["requests"], 0)
+        self.assertEqual(report["overall"]["errors"], 0)
+        self.assertIn("context", report["endpoints"])
+        self.assertEqual(report["rebuilds"]["count"], 1)
+        with self.assertRaises(ValueError):
+            parse_mix("context=1,search=2")
+
+@unittest.skipIf(not FASTAPI_AVAILABLE, "Dependências do MCP não estão instaladas")
+class TestMetricsRegistry(unittest.TestCase):
+    """Testes para o registro de métricas."""
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Testar que os buckets do histograma são acumulados na renderização."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latência", ("endpoint",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.labels("/context").observe(value)
+        
+        body = registry.render()
+        
+        self.assertIn('latency_seconds_bucket{endpoint="/context",le="0.1"} 1', body)
+        self.assertIn('latency_seconds_bucket{endpoint="/context",le="1"} 2', body)
+        self.assertIn('latency_seconds_bucket{endpoint="/context",le="+Inf"} 3', body)
+        self.assertIn('latency_seconds_count{endpoint="/context"} 3', body)
+
+@unittest.skipIf(not FASTAPI_AVAILABLE, "Dependências do MCP não estão instaladas")
+class TestAdmissionControl(unittest.TestCase):
+    """Testes para o controle de admissão."""
+    
+    def test_queue_and_reject_when_saturated(self):
+        """Testar a fila limitada e a rejeição com 429 e Retry-After ao saturar."""
+        controller = AdmissionController(parse_limits("/context=1:1"), queue_timeout=2.0)
+        slow_app = FastAPI()
+        
+        @slow_app.post("/context")
+        async def context():
+            await asyncio.sleep(0.2)
+            return {"context": "ok"}
+        
+        slow_app.add_middleware(AdmissionMiddleware, controller=controller)
+        
+        async def run():
+            transport = httpx.ASGITransport(app=slow_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                return await asyncio.gather(*(client.post("/context") for _ in range(3)))
+        
+        responses = asyncio.run(run())
+        
+        self.assertEqual(sorted(response.status_code for response in responses), [200, 200, 429])
+        rejected = next(response for response in responses if response.status_code == 429)
+        self.assertGreaterEqual(int(rejected.headers["retry-after"]), 1)
+        status = controller.status()["/context"]
+        self.assertEqual((status["admitted"], status["queued"], status["rejected_queue_full"]), (2, 1, 1))
+        self.assertEqual((status["active"], status["queue_depth"]), (0, 0))
+        self.assertEqual(parse_limits("off"), {})
+
+@unittest.skipIf(not FASTAPI_AVAILABLE, "Dependências do MCP não estão instaladas")
+class TestProjectPool(unittest.TestCase):
+    """Testes para o pool de projetos."""
+    
+    def test_evicts_least_recently_used_within_budget(self):
+        """Testar o carregamento sob demanda e o descarte LRU respeitando projetos em uso."""
+        created = []
+        
+        def factory(docs_dir, db_dir, model):
+            manager = MagicMock()
+            manager.get_index_stats.return_value = {"size_bytes": 40}
+            created.append((docs_dir, model, manager))
+            return manager
+        
+        projects = parse_projects("a=/srv/a,b=/srv/b,c=/srv/c")
+        pool = ProjectPool(projects, embed_model="modelo compartilhado", max_bytes=100, manager_factory=factory)
+        
+        with pool.acquire("a") as project_a:
+            with pool.acquire("b"):
+                pass
+            with pool.acquire("a"):
+                pass
+            # "b" é o menos usado recentemente; "a" continua carregado
+            with pool.acquire("c"):
+                pass
+            self.assertEqual(sorted(pool.info()["loaded"]), ["a", "c"])
+            with pool.acquire("b"):
+                pass
+            # "a" sai do pool, mas só é fechado quando a requisição em andamento terminar
+            project_a.context_manager.close.assert_not_called()
+        
+        project_a.context_manager.close.assert_called_once()
+        self.assertEqual(projects["a"]["docs_dir"], os.path.join("/srv/a", "docs"))
+        self.assertEqual({model for _, model, _ in created}, {"modelo compartilhado"})
+        self.assertEqual(pool.stats["loads"], 4)
+        self.assertEqual(pool.stats["evictions"], 2)
 
 @unittest.skipIf(not FASTAPI_AVAILABLE, "Dependências do MCP não estão instaladas")
 class TestCursorIntegration(unittest.TestCase):
@@ -154,5 +453,56 @@ class TestCursorIntegration(unittest.TestCase):
         # Verificar se foram feitas duas chamadas (uma para /prompt e outra para o Cursor)
         self.assertEqual(self.mock_requests.post.call_count, 2)
 
+    def test_get_context_revalidates_cached_response(self):
+        """Testar a revalidação da resposta local com If-None-Match."""
+        downloaded = MagicMock(status_code=200, headers={"ETag": 'W/"v1"'})
+        downloaded.json.return_value = {"context": "Contexto de teste", "sources": []}
+        not_modified = MagicMock(status_code=304, headers={"ETag": 'W/"v1"'})
+        self.cursor_integration.session.post.side_effect = [downloaded, not_modified]
+        
+        first = self.cursor_integration.get_context_for_query("Como implementar autenticação?")
+        second = self.cursor_integration.get_context_for_query("Como implementar autenticação?")
+        
+        self.assertEqual(second, first)
+        _, kwargs = self.cursor_integration.session.post.call_args
+        self.assertEqual(kwargs["headers"], {"If-None-Match": 'W/"v1"'})
+        self.assertEqual(self.cursor_integration.cache_stats, {"not_modified": 1, "downloaded": 1})
+
+@unittest.skipIf(not FASTAPI_AVAILABLE, "Dependências do MCP não estão instaladas")
+class TestAsyncCursorIntegration(unittest.TestCase):
+    """Testes para o cliente assíncrono da integração com o Cursor IDE."""
+    
+    def test_retries_temporary_failures_within_concurrency_limit(self):
+        """Testar novas tentativas após 503 e erro de rede, respeitando o limite de concorrência."""
+        state = {"calls": 0, "active": 0, "max_active": 0}
+        
+        async def handler(request):
+            state["calls"] += 1
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            if state["calls"] == 1:
+                return httpx.Response(503, headers={"Retry-After": "0"})
+            if state["calls"] == 2:
+                raise httpx.ConnectError("conexão recusada", request=request)
+            query = json.loads(request.content)["query"]
+            return httpx.Response(200, json={"context": query, "sources": []})
+        
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with AsyncCursorIntegration(mcp_url="http://testserver", max_concurrency=2,
+                                              backoff=0, client=client) as cursor:
+                results = await asyncio.gather(*(cursor.get_context_for_query(f"consulta {i}", timeout=1.0)
+                                                 for i in range(6)))
+                return results, cursor.stats
+        
+        results, stats = asyncio.run(run())
+        
+        self.assertEqual([result["context"] for result in results], [f"consulta {i}" for i in range(6)])
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["failures"], 0)
+        self.assertLessEqual(state["max_active"], 2)
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file